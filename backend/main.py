@@ -1,41 +1,58 @@
 import os
 import sys
-import shutil
 import glob
 import subprocess
 import json
 import base64
 import hashlib
+import time
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from pathlib import Path
 from dotenv import load_dotenv
-from authlib.integrations.starlette_client import OAuth
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.requests import Request
-from jose import jwt, JWTError
 from datetime import datetime, timedelta
+import asyncio
+import importlib
 import httpx
-from fastapi.staticfiles import StaticFiles
-import xml.etree.ElementTree as ET
-from pytrends.request import TrendReq
-from cryptography.fernet import Fernet
+# pytrends(pandas), authlib, cryptography, jose 는 무거우므로 첫 사용 시점에 import (콜드 스타트 단축)
 
 # 부모 디렉토리를 Python 경로에 추가
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from execution.research_topic import research_topic
-from execution.generate_html_from_text import generate_html
-
-
-# 환경변수로 pytrends 사용 여부 제어 (기본은 RSS 사용)
-USE_PYTREND = os.getenv("USE_PYTREND", "false").lower() == "true"
-from typing import Optional
-
+# execution 모듈들은 설정을 import 시점에 읽으므로(metrics 의 PROMETHEUS_MULTIPROC_DIR 판단 포함) 그보다 먼저 .env 로드
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'), override=True)
 
+from execution.research_topic import research_topic
+from execution.generate_html_from_text import GENERATION_MODES, PROVIDERS, generate_html, local_available, provider_order
+from execution import deck_templates
+from execution.refine_html import refine_slides, refine_with_rules
+from execution.admission import MAX_INFLIGHT_PER_USER, llm_pool, render_pool, AdmissionRejected
+from execution.filestore import read_json, update_json
+from execution.job_registry import JOB_STALE_SECONDS, JobRegistry
+from execution.render_pool import browser_pool
+from execution.text_fit import strip_fit
+from execution.trends_cache import trends_refresher
+from execution.trend_interest import analyze_keywords
+from execution import generate_html_from_text
+from execution import generation_cache
+from execution.pregenerate import PregenerateScheduler
+from execution import image_ingest
+from execution.image_ingest import UploadRejected
+from execution.disk_gc import default_gc, touch
+from execution.http_cache import SelectiveGZipMiddleware, cached_file_response, content_addressed
+from execution.metrics import MetricsMiddleware, record_cache, render_latest, span
+from execution.tracing import TracingMiddleware, log, log_config, subprocess_env
+from execution.batch import BATCH_MAX_ITEMS, BATCH_PARALLELISM, BatchRun, admitted, build_zip
+from execution.generate_instagram_caption_and_tags import caption_source, generate_caption
+from execution.hashtag_index import HASHTAG_LIMIT, hashtag_index, history_weights
+from execution import progress
+from execution.progress import emit
+from typing import List, Optional
+
 app = FastAPI(title="Card News to Instagram Engine")
 
 # JWT & OAuth Settings
@@ -46,25 +63,38 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 1 Day
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
 BACKEND_URL = os.environ.get("BACKEND_URL", "").rstrip("/")
+# 관리자 API(/api/admin/*) 접근 허용 이메일 (쉼표 구분)
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
+# 생성 작업 SSE: 이벤트 폴링 간격 / keep-alive 주석 간격 (초)
+JOB_EVENTS_POLL_SECONDS = float(os.environ.get("JOB_EVENTS_POLL_SECONDS", "0.5"))
+JOB_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("JOB_EVENTS_HEARTBEAT_SECONDS", "15"))
+JOB_ORPHANED_MESSAGE = "작업을 처리하던 서버가 중단되었습니다. 다시 시도해주세요."
 
 # ── API 키 암호화 (Fernet 대칭키) ──────────────────────────────────────────
 # ENCRYPTION_KEY 환경변수가 없으면 SECRET_KEY를 32바이트 해시로 변환해 사용
 _raw_enc_key = os.environ.get("ENCRYPTION_KEY", SECRET_KEY)
 _fernet_key = base64.urlsafe_b64encode(hashlib.sha256(_raw_enc_key.encode()).digest())
-_fernet = Fernet(_fernet_key)
+_fernet = None
+
+def get_fernet():
+    global _fernet
+    if _fernet is None:
+        from cryptography.fernet import Fernet
+        _fernet = Fernet(_fernet_key)
+    return _fernet
 
 def encrypt_key(plain: str) -> str:
     """API 키를 Fernet으로 암호화해 문자열 반환"""
     if not plain:
         return ""
-    return _fernet.encrypt(plain.encode()).decode()
+    return get_fernet().encrypt(plain.encode()).decode()
 
 def decrypt_key(token: str) -> str:
     """Fernet으로 암호화된 토큰을 복호화"""
     if not token:
         return ""
     try:
-        return _fernet.decrypt(token.encode()).decode()
+        return get_fernet().decrypt(token.encode()).decode()
     except Exception:
         # Fernet 토큰 형식("gAAAAA"로 시작)이면 복호화 실패 → 빈 문자열 반환
         # (쓰레기 암호화 토큰이 API 키로 사용되는 것 방지)
@@ -74,16 +104,25 @@ def decrypt_key(token: str) -> str:
         return token
 # ──────────────────────────────────────────────────────────────────────────
 
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=GOOGLE_CLIENT_ID,
-    client_secret=GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile'
-    }
-)
+_oauth = None
+
+def get_oauth():
+    """Google OAuth 클라이언트 — 로그인 요청이 처음 들어올 때 등록"""
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+        oauth = OAuth()
+        oauth.register(
+            name='google',
+            client_id=GOOGLE_CLIENT_ID,
+            client_secret=GOOGLE_CLIENT_SECRET,
+            server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+            client_kwargs={
+                'scope': 'openid email profile'
+            }
+        )
+        _oauth = oauth
+    return _oauth
 
 IS_PRODUCTION = bool(BACKEND_URL and BACKEND_URL.startswith("https"))
 app.add_middleware(
@@ -101,6 +140,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 큰 JSON/HTML 응답(히스토리, 생성 결과) gzip 압축 — 이미지 경로와 SSE 스트림은 제외
+app.add_middleware(SelectiveGZipMiddleware, exclude_prefixes=("/api/slides/", "/api/uploads/", "/api/jobs/"))
+# 엔드포인트별 요청 수/지연시간 → /metrics
+app.add_middleware(MetricsMiddleware)
+# 요청별 correlation ID + span 트리 (가장 바깥에서 감싸 다른 미들웨어 시간까지 포함)
+app.add_middleware(TracingMiddleware)
+
+# 서버가 요청을 받기 시작한 뒤 백그라운드에서 무거운 리소스를 미리 준비
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+async def warmup():
+    try:
+        # 인증/암호화 모듈 선로딩 (첫 로그인 요청 지연 제거)
+        await asyncio.to_thread(get_fernet)
+        for module in ("jose.jwt", "authlib.integrations.starlette_client"):
+            await asyncio.to_thread(importlib.import_module, module)
+        await asyncio.to_thread(generate_html_from_text.warmup)
+        await browser_pool.warmup()
+    except Exception as e:
+        log("WARN", f"warmup failed: {e}")
+
+# 생성/수정 직후 브라우저에서 글자 넘침을 재고 글자 크기를 줄여 맞춤 (text_fit)
+TEXT_FIT_ON_GENERATE = os.getenv("TEXT_FIT_ON_GENERATE", "true").lower() == "true"
+
+# 유휴 시간에 트렌드 상위 주제 덱을 미리 생성 (PREGENERATE_ENABLED=true 일 때만)
+pregenerate_scheduler = PregenerateScheduler(
+    topics_fn=lambda: trends_refresher.snapshot()["trends"],
+    load_fn=lambda: llm_pool.busy() or render_pool.busy() or job_registry.active() > 0,
+)
+
+@app.on_event("startup")
+async def on_startup():
+    app.state.trends_task = asyncio.create_task(trends_refresher.run())
+    app.state.pregenerate_task = asyncio.create_task(pregenerate_scheduler.run())
+    app.state.disk_gc_task = asyncio.create_task(disk_gc.run())
+    if WARMUP_ON_STARTUP:
+        # await 하지 않음 → startup 즉시 완료, 헬스체크는 바로 응답
+        app.state.warmup_task = asyncio.create_task(warmup())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await browser_pool.close()
+    image_ingest.shutdown()
+
 # Auth Routes
 @app.get('/debug-oauth')
 async def debug_oauth(request: Request):
@@ -121,12 +204,12 @@ async def login(request: Request):
     else:
         redirect_uri = str(request.url_for('auth')).replace("127.0.0.1", "localhost")
 
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await get_oauth().google.authorize_redirect(request, redirect_uri)
 
 @app.get('/auth')
 async def auth(request: Request):
     try:
-        token = await oauth.google.authorize_access_token(request)
+        token = await get_oauth().google.authorize_access_token(request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"OAuth failed: {str(e)}")
         
@@ -149,6 +232,7 @@ async def get_me(request: Request):
     if not auth_header or not auth_header.startswith("Bearer "):
         return JSONResponse({"authenticated": False})
     
+    from jose import jwt, JWTError
     token = auth_header.split(" ")[1]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -161,14 +245,44 @@ async def get_current_user(request: Request):
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    from jose import jwt, JWTError
     token = auth_header.split(" ")[1]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # 토큰에는 이메일이 "sub" 로 담김 → 핸들러들이 쓰는 user["email"] 로도 노출
+        payload.setdefault("email", payload.get("sub"))
         return payload
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def client_key(request: Request) -> str:
+    """동시 실행 제한용 요청자 식별 — 로그인 유저는 이메일, 아니면 클라이언트 IP"""
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        from jose import jwt, JWTError
+        try:
+            payload = jwt.decode(auth_header.split(" ")[1], SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("sub"):
+                return payload["sub"]
+        except JWTError:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={
+            "detail": str(exc),
+            "pool": exc.pool,
+            "queue_position": exc.queue_position,
+            "retry_after": exc.retry_after,
+        },
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -182,15 +296,21 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TMP_DIR = os.path.join(WORKSPACE, ".tmp")
 os.makedirs(TMP_DIR, exist_ok=True)
-SLIDES_DIR = os.path.join(TMP_DIR, "slides")
-os.makedirs(SLIDES_DIR, exist_ok=True)
+# 렌더 결과는 작업별 디렉토리(.tmp/jobs/<job_id>)에 저장 — worker 간 공유 레지스트리로 관리
+job_registry = JobRegistry()
 UPLOADS_DIR = os.path.join(WORKSPACE, "uploads")
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
-# Serve static files
-app.mount("/api/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads")
+@app.get("/api/uploads/{filename}")
+async def get_upload(request: Request, filename: str):
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="File not found")
+    file_path = os.path.join(UPLOADS_DIR, filename)
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    touch(file_path)  # 디스크 GC 의 LRU 기준
+    return cached_file_response(request, file_path)
 
-pytrend = TrendReq(hl='ko-KR', tz=540)
 # 히스토리는 유저별로 user_settings.json 내 "history" 키에 저장 (전역 파일 사용 안 함)
 
 def load_user_history(email: str) -> list:
@@ -200,46 +320,43 @@ def load_user_history(email: str) -> list:
 
 def save_user_history(email: str, entry: dict):
     """특정 유저의 히스토리에 항목 추가 (최대 20개)"""
-    all_settings = load_settings()
-    user_data = all_settings.get(email, {})
-    history = user_data.get("history", [])
     entry["id"] = datetime.now().strftime("%Y%m%d%H%M%S")
     entry["timestamp"] = datetime.now().isoformat()
-    history.insert(0, entry)
-    history = history[:20]  # 최대 20개 유지
-    user_data["history"] = history
-    all_settings[email] = user_data
+
+    def add_entry(all_settings):
+        user_data = all_settings.get(email, {})
+        history = user_data.get("history", [])
+        history.insert(0, entry)
+        user_data["history"] = history[:20]  # 최대 20개 유지
+        all_settings[email] = user_data
+
     try:
-        with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_settings, f, ensure_ascii=False, indent=2)
+        # 여러 worker 가 동시에 쓰더라도 다른 유저의 변경이 유실되지 않도록 락 + 원자적 교체
+        update_json(SETTINGS_FILE, add_entry)
     except Exception as e:
-        print(f"History save error: {e}")
+        log("ERROR", f"History save error: {e}")
 
 SETTINGS_FILE = os.path.join(TMP_DIR, "user_settings.json")
+# 렌더 결과/업로드/생성 캐시 영역별 쿼터 관리 (히스토리가 참조하는 업로드는 보호)
+disk_gc = default_gc(job_registry, SETTINGS_FILE)
 
 def load_settings():
-    try:
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"Settings load error: {e}")
-    return {}
+    return read_json(SETTINGS_FILE, {}) or {}
 
 def save_user_settings(email, settings: dict):
     """API 키를 암호화해서 저장 (history 등 기존 데이터는 보존)"""
-    all_settings = load_settings()
-    # 기존 유저 데이터 로드 (history 등 보존)
-    user_data = all_settings.get(email, {})
-    # API 키만 업데이트 (history 등 다른 필드는 건드리지 않음)
-    for k, v in settings.items():
-        if v:
-            user_data[k] = encrypt_key(v)
-        else:
-            user_data[k] = ""
-    all_settings[email] = user_data
-    with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump(all_settings, f, ensure_ascii=False, indent=2)
+    def apply(all_settings):
+        # 기존 유저 데이터 로드 (history 등 보존)
+        user_data = all_settings.get(email, {})
+        # API 키만 업데이트 (history 등 다른 필드는 건드리지 않음)
+        for k, v in settings.items():
+            if v:
+                user_data[k] = encrypt_key(v)
+            else:
+                user_data[k] = ""
+        all_settings[email] = user_data
+
+    update_json(SETTINGS_FILE, apply)
 
 def get_decrypted_settings(email: str) -> dict:
     """저장된 암호화 키를 복호화해서 반환"""
@@ -283,45 +400,58 @@ async def save_user_settings_endpoint(settings: UserSettings, user: dict = Depen
 
 @app.get("/api/trends")
 async def get_trends():
+    # 항상 마지막 성공 스냅샷을 즉시 반환 — 갱신은 백그라운드 refresher 가 담당
+    return trends_refresher.snapshot()
+
+class TrendInterestRequest(BaseModel):
+    keywords: list[str]
+    timeframe: Optional[str] = "today 3-m"
+    geo: Optional[str] = "KR"
+    anchor: Optional[str] = None
+
+@app.post("/api/trends/interest")
+async def trend_interest(request: TrendInterestRequest, user: dict = Depends(get_current_user)):
+    """여러 키워드의 관심도 변화 지표를 계산해 주제 후보 순위 반환 (LLM 쿼터 사용 전 후보 선별용)"""
     try:
-        # 1️⃣ 기존 옵션: USE_PYTREND 플래그가 true이면 일일 트렌드 직접 pytrends 사용
-        if USE_PYTREND:
-            df = pytrend.trending_searches(pn='south_korea')
-            trends = df[0].tolist()[:15]
-            return {"trends": trends, "source": "google_trends_pytrend"}
-
-        # 3️⃣ RSS 피드 시도 (기본)
-        rss_url = "https://trends.google.co.kr/trends/trendingsearches/daily/rss?geo=KR"
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(rss_url, timeout=10.0)
-            if resp.status_code == 200:
-                root = ET.fromstring(resp.text)
-                trends = []
-                for item in root.findall(".//item"):
-                    title = item.find("title").text
-                    trends.append(title)
-                if trends:
-                    return {"trends": trends[:15], "source": "google_trends_rss"}
-
-        # 4️⃣ RSS 실패 시 pytrends 일일 트렌드 fallback
-        df = pytrend.trending_searches(pn='south_korea')
-        trends = df[0].tolist()[:15]
-        return {"trends": trends, "source": "google_trends_daily"}
+        # pytrends 는 동기 + rate-limited 큐 대기 → 스레드에서 실행
+        return await asyncio.to_thread(
+            analyze_keywords, request.keywords, request.timeframe, request.geo, request.anchor
+        )
     except Exception as e:
-        print(f"Trend Error: {e}")
-        return {
-            "trends": [
-                "비트코인 신고가", "2026 부동산 전망", "AI 자동화 트렌드", 
-                "자기계발 루프", "재테크 시작하기", "나스닥 지수 현황",
-                "건강한 식단 관리", "봄 여행지 추천", "인기 카페 투어",
-                "넷플릭스 화제작", "애플 신기술", "전기차 시장 전망"
-            ], 
-            "source": "popular_topics_fallback"
-        }
+        log("ERROR", f"Trend Interest Error: {e}")
+        raise HTTPException(status_code=502, detail=f"Google Trends 조회 실패: {e}")
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "ok", "backend_url": "http://localhost:8899"}
+    return {
+        "status": "ok",
+        "backend_url": "http://localhost:8899",
+        "pools": {"llm": llm_pool.stats(), "render": render_pool.stats()},
+        "pregenerate": pregenerate_scheduler.stats(),
+    }
+
+async def get_admin_user(user: dict = Depends(get_current_user)):
+    # 토큰 payload 의 이메일은 "sub" 에 담김
+    email = (user.get("email") or user.get("sub") or "").lower()
+    if email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return user
+
+@app.get("/api/admin/disk")
+async def disk_stats(user: dict = Depends(get_admin_user)):
+    """영역별 디스크 사용량 + 마지막 GC 결과"""
+    return await asyncio.to_thread(disk_gc.stats)
+
+@app.post("/api/admin/disk/gc")
+async def run_disk_gc(user: dict = Depends(get_admin_user)):
+    """GC 즉시 실행"""
+    return await asyncio.to_thread(disk_gc.run_once)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 스크레이프 엔드포인트"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/api/history")
 async def get_history(user: dict = Depends(get_current_user)):
@@ -332,20 +462,20 @@ async def get_history(user: dict = Depends(get_current_user)):
     return {"history": summary}
 
 @app.post("/api/upload")
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(request: Request, file: UploadFile = File(...)):
     try:
-        file_extension = Path(file.filename).suffix
-        file_name = f"bg_{datetime.now().strftime('%Y%m%d%H%M%S')}{file_extension}"
-        file_path = os.path.join(UPLOADS_DIR, file_name)
-        
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-            
-        # Return the public URL
-        # Assuming the backend runs on port 8899
-        return {"url": f"http://localhost:8899/api/uploads/{file_name}"}
+        # 스트리밍 저장(용량 제한) + 해시 중복 제거 + 1080×1350 정규화
+        result = await image_ingest.ingest_upload(file)
+        base_url = BACKEND_URL or str(request.base_url).rstrip("/")
+        return {
+            "url": f"{base_url}/api/uploads/{result['file_name']}",
+            "hash": result["hash"],
+            "deduplicated": result["deduplicated"],
+        }
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
-        print(f"Upload Error: {e}")
+        log("ERROR", f"Upload Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # API Models
@@ -354,6 +484,9 @@ class GenerateHtmlRequest(BaseModel):
     text: str
     slide_count: Optional[int] = 5
     bg_image_url: Optional[str] = None
+    provider: Optional[str] = None  # gemini | claude | openai | ollama — 먼저 시도할 provider (나머지는 폴백)
+    mode: Optional[str] = None  # html | structured — 비우면 GENERATION_MODE
+    template: Optional[str] = None  # structured 모드의 디자인 템플릿 (execution/templates)
     gemini_api_key: Optional[str] = None
     claude_api_key: Optional[str] = None
     openai_api_key: Optional[str] = None
@@ -382,170 +515,680 @@ async def test_api_keys(request: TestKeyRequest, request_raw: Request):
 
     results = {}
 
-    # Gemini 테스트
-    if gemini_key:
-        try:
-            from google import genai
-            client = genai.Client(
-                api_key=gemini_key,
-                http_options={"api_version": "v1"},
-            )
-            resp = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents="Say 'ok' in one word.",
-            )
-            results["gemini"] = {"status": "ok", "response": resp.text[:50] if resp.text else "empty"}
-        except Exception as e:
-            results["gemini"] = {"status": "error", "error": str(e)}
-    else:
-        results["gemini"] = {"status": "no_key"}
+    # SDK import 없이 REST 로 직접 호출 (google-genai import 비용 제거, 이벤트 루프 블로킹 방지)
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        # Gemini 테스트
+        if gemini_key:
+            try:
+                r = await client.post(
+                    "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
+                    params={"key": gemini_key},
+                    json={"contents": [{"parts": [{"text": "Say 'ok' in one word."}]}]},
+                )
+                if r.status_code == 200:
+                    parts = r.json().get("candidates", [{}])[0].get("content", {}).get("parts", [{}])
+                    text = parts[0].get("text", "") if parts else ""
+                    results["gemini"] = {"status": "ok", "response": text[:50] if text else "empty"}
+                else:
+                    results["gemini"] = {"status": "error", "error": r.text[:200]}
+            except Exception as e:
+                results["gemini"] = {"status": "error", "error": str(e)}
+        else:
+            results["gemini"] = {"status": "no_key"}
 
-    # Claude 테스트
-    if claude_key:
-        try:
-            import httpx as _httpx
-            r = _httpx.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={"x-api-key": claude_key, "anthropic-version": "2023-06-01", "content-type": "application/json"},
-                json={"model": "claude-3-haiku-20240307", "max_tokens": 10, "messages": [{"role": "user", "content": "Say ok"}]},
-                timeout=10.0
-            )
-            if r.status_code == 200:
-                results["claude"] = {"status": "ok"}
-            else:
-                results["claude"] = {"status": "error", "error": r.text[:200]}
-        except Exception as e:
-            results["claude"] = {"status": "error", "error": str(e)}
+        # Claude 테스트
+        if claude_key:
+            try:
+                r = await client.post(
+                    "https://api.anthropic.com/v1/messages",
+                    headers={"x-api-key": claude_key, "anthropic-version": "2023-06-01", "content-type": "application/json"},
+                    json={"model": "claude-3-haiku-20240307", "max_tokens": 10, "messages": [{"role": "user", "content": "Say ok"}]},
+                )
+                if r.status_code == 200:
+                    results["claude"] = {"status": "ok"}
+                else:
+                    results["claude"] = {"status": "error", "error": r.text[:200]}
+            except Exception as e:
+                results["claude"] = {"status": "error", "error": str(e)}
+        else:
+            results["claude"] = {"status": "no_key"}
+
+        # OpenAI 테스트
+        if openai_key:
+            try:
+                r = await client.post(
+                    "https://api.openai.com/v1/chat/completions",
+                    headers={"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"},
+                    json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Say ok"}], "max_tokens": 5},
+                )
+                if r.status_code == 200:
+                    results["openai"] = {"status": "ok"}
+                else:
+                    results["openai"] = {"status": "error", "error": r.text[:200]}
+            except Exception as e:
+                results["openai"] = {"status": "error", "error": str(e)}
+        else:
+            results["openai"] = {"status": "no_key"}
+
+    return results
+
+def research_with_cache(text: str, gemini_key: Optional[str]) -> str:
+    """주제 리서치 (공유 캐시 우선) — 풀 스레드에서 호출"""
+    started = time.perf_counter()
+    emit("research_started")
+    expanded_text = generation_cache.get_research(text)
+    record_cache("research", expanded_text is not None)
+    cached = expanded_text is not None
+    if expanded_text is None:
+        log("INFO", f"1. Researching: {text[:50]}...")
+        with span("research"):
+            expanded_text = research_topic(text, api_key=gemini_key)
+        generation_cache.put_research(text, expanded_text)
     else:
-        results["claude"] = {"status": "no_key"}
+        log("INFO", f"1. Research cache hit: {text[:50]}")
+    emit("research_finished", cached=cached, duration_ms=round((time.perf_counter() - started) * 1000))
+    return expanded_text
+
+def generation_error_message(e: Exception) -> str:
+    """생성 실패 예외 → 사용자에게 보여줄 메시지"""
+    error_msg = str(e)
+    if hasattr(e, 'stderr') and e.stderr:
+        log("ERROR", f"Subprocess Error: {e.stderr}")
+        # 만약 에러 내용 중에 특정 키워드가 있다면 사용자 친화적으로 변경
+        if "RESOURCE_EXHAUSTED" in e.stderr:
+            error_msg = "AI 서비스 할당량이 초과되었습니다. 1분 후 다시 시도해주세요."
+        elif "timed out" in e.stderr:
+            error_msg = "서버 응답이 지연되고 있습니다. 잠시 후 다시 시도해주세요."
+        else:
+            # stderr의 마지막 몇 줄을 에러 메시지에 포함
+            error_msg = e.stderr.strip().split("\n")[-1]
+    return error_msg
 
-    # OpenAI 테스트
-    if openai_key:
+async def resolve_api_keys(request, request_raw: Request) -> tuple:
+    """(gemini, claude, openai) 키 — 서버에 저장된 키(복호화) 우선, 없으면 요청에 포함된 키(localStorage fallback)"""
+    stored_keys = {"gemini_api_key": "", "claude_api_key": "", "openai_api_key": ""}
+    if request_raw.headers.get("Authorization"):
         try:
-            import httpx as _httpx
-            r = _httpx.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"},
-                json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Say ok"}], "max_tokens": 5},
-                timeout=10.0
+            user = await get_current_user(request_raw)
+            stored_keys = get_decrypted_settings(user["email"])
+        except:
+            pass
+
+    gemini_key = stored_keys.get("gemini_api_key") or request.gemini_api_key
+    claude_key = stored_keys.get("claude_api_key") or getattr(request, "claude_api_key", None)
+    openai_key = stored_keys.get("openai_api_key") or getattr(request, "openai_api_key", None)
+
+    # 진단 로깅: 어떤 키가 어디서 왔는지 확인 (키 값 자체는 노출 안 함)
+    log("INFO", "api_key_sources",
+        gemini="stored" if stored_keys.get("gemini_api_key") else ("request" if request.gemini_api_key else "NONE"),
+        claude="stored" if stored_keys.get("claude_api_key") else ("request" if claude_key else "NONE"),
+        openai="stored" if stored_keys.get("openai_api_key") else ("request" if openai_key else "NONE"),
+        key_lengths={"gemini": len(gemini_key or ""), "claude": len(claude_key or ""), "openai": len(openai_key or "")})
+    return gemini_key, claude_key, openai_key
+
+def check_provider(provider: Optional[str]):
+    if provider and provider not in PROVIDERS:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 provider: {provider} (사용 가능: {', '.join(PROVIDERS)})")
+
+def check_mode(mode: Optional[str], template: Optional[str]):
+    if mode and mode not in GENERATION_MODES:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 생성 모드: {mode} (사용 가능: {', '.join(GENERATION_MODES)})")
+    if template and template not in deck_templates.list_templates():
+        raise HTTPException(status_code=400, detail=f"알 수 없는 템플릿: {template} (사용 가능: {', '.join(deck_templates.list_templates())})")
+
+async def run_generate(request: GenerateHtmlRequest, request_raw: Request) -> str:
+    """키 결정 → 선생성 덱 확인 → 리서치/생성 → 히스토리 저장. 생성된 HTML 반환
+
+    동기 엔드포인트와 작업(job) 엔드포인트가 함께 사용. 진행 상황은 progress.emit 으로 알린다.
+    """
+    gemini_key, claude_key, openai_key = await resolve_api_keys(request, request_raw)
+    auth_header = request_raw.headers.get("Authorization")
+
+    pregenerate_scheduler.note_user_activity()
+
+    # 선생성된 덱이 있으면 LLM 호출 없이 바로 사용 (배경 이미지/모드/템플릿 지정 시에는 새로 생성)
+    pregenerated = not (request.bg_image_url or request.mode or request.template)
+    cached = generation_cache.take_deck(request.text, request.slide_count) if pregenerated else None
+    if pregenerated:
+        record_cache("deck", bool(cached))
+
+    def run_generation():
+        emit("started")  # LLM 풀 슬롯 획득
+        expanded_text = research_with_cache(request.text, gemini_key)
+
+        log("INFO", "2. Generating HTML with researched context...")
+        with span("generate"):
+            return generate_html(
+                text=expanded_text,
+                slides=request.slide_count,
+                bg_image=request.bg_image_url,
+                gemini_key=gemini_key,
+                claude_key=claude_key,
+                openai_key=openai_key,
+                provider=request.provider,
+                mode=request.mode,
+                template=request.template,
             )
-            if r.status_code == 200:
-                results["openai"] = {"status": "ok"}
-            else:
-                results["openai"] = {"status": "error", "error": r.text[:200]}
-        except Exception as e:
-            results["openai"] = {"status": "error", "error": str(e)}
-    else:
-        results["openai"] = {"status": "no_key"}
 
-    return results
+    if cached:
+        log("INFO", f"선생성 덱 사용: {request.text[:50]}")
+        emit("cache_hit", source=cached.get("source"))
+        html_content = cached["html"]
+    else:
+        # LLM 풀에서 실행 (동시 실행 수 제한 + 이벤트 루프 블로킹 방지)
+        html_content = await llm_pool.run(client_key(request_raw), run_generation)
+    html_content = await auto_fit(client_key(request_raw), html_content)
 
-@app.post("/api/generate_html")
-async def generate_html_endpoint(request: GenerateHtmlRequest, request_raw: Request):
-    try:
-        # 저장된 키(복호화)를 우선 사용, 요청에 포함된 키는 fallback
-        stored_keys = {"gemini_api_key": "", "claude_api_key": "", "openai_api_key": ""}
-        auth_header = request_raw.headers.get("Authorization")
-        if auth_header:
-            try:
-                user = await get_current_user(request_raw)
-                stored_keys = get_decrypted_settings(user["email"])
-            except:
-                pass
-
-        # 서버에 저장된 키 우선, 없으면 요청에 포함된 키(localStorage fallback) 사용
-        gemini_key = stored_keys.get("gemini_api_key") or request.gemini_api_key
-        claude_key = stored_keys.get("claude_api_key") or request.claude_api_key
-        openai_key = stored_keys.get("openai_api_key") or request.openai_api_key
-
-        # 진단 로깅: 어떤 키가 어디서 왔는지 확인 (키 값 자체는 노출 안 함)
-        print(f"[KEY_DEBUG] gemini={'stored' if stored_keys.get('gemini_api_key') else ('request' if request.gemini_api_key else 'NONE')}"
-              f" claude={'stored' if stored_keys.get('claude_api_key') else ('request' if request.claude_api_key else 'NONE')}"
-              f" openai={'stored' if stored_keys.get('openai_api_key') else ('request' if request.openai_api_key else 'NONE')}")
-        print(f"[KEY_DEBUG] key lengths: gemini={len(gemini_key) if gemini_key else 0}"
-              f" claude={len(claude_key) if claude_key else 0}"
-              f" openai={len(openai_key) if openai_key else 0}")
-
-        print(f"1. Researching: {request.text[:50]}...")
-        expanded_text = research_topic(request.text, api_key=gemini_key)
-
-        print(f"2. Generating HTML with researched context...")
-        html_content = generate_html(
-            text=expanded_text,
-            slides=request.slide_count,
-            bg_image=request.bg_image_url,
-            gemini_key=gemini_key,
-            claude_key=claude_key,
-            openai_key=openai_key,
-        )
-        
-        # 유저별 히스토리 저장 (인증된 경우만)
-        if auth_header:
-            try:
-                hist_user = await get_current_user(request_raw)
+    # 유저별 히스토리 저장 (인증된 경우만)
+    if auth_header:
+        try:
+            hist_user = await get_current_user(request_raw)
+            with span("history_save"):
                 save_user_history(hist_user["email"], {
                     "text": request.text,
                     "slide_count": request.slide_count,
                     "html": html_content
                 })
-            except Exception as he:
-                print(f"History save skipped: {he}")
-        
-        return {"html": html_content}
+            emit("saved")
+        except Exception as he:
+            log("WARN", f"History save skipped: {he}")
+    return html_content
+
+@app.get("/api/providers")
+async def list_providers():
+    """생성 provider 시도 순서와 로컬 Ollama 사용 가능 여부 (요청의 provider 선택지)"""
+    return {"order": provider_order(), "ollama": await asyncio.to_thread(local_available)}
+
+@app.get("/api/templates")
+async def list_deck_templates():
+    """structured 모드에서 고를 수 있는 디자인 템플릿"""
+    return {"templates": deck_templates.list_templates(), "default": deck_templates.DECK_TEMPLATE,
+            "mode": generate_html_from_text.GENERATION_MODE}
+
+class RethemeRequest(BaseModel):
+    html: Optional[str] = None  # structured 모드로 생성된 덱 (콘텐츠 JSON 포함)
+    content: Optional[dict] = None  # 또는 콘텐츠 JSON 자체
+    template: str
+
+@app.post("/api/retheme")
+async def retheme_deck(request: RethemeRequest):
+    """같은 문구를 다른 템플릿으로 다시 렌더 — LLM 호출 없음"""
+    check_mode(None, request.template)
+    try:
+        with span("render_template"):
+            return {"html": deck_templates.retheme(request.html, request.content, request.template),
+                    "template": request.template}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/generate_html")
+async def generate_html_endpoint(request: GenerateHtmlRequest, request_raw: Request):
+    check_provider(request.provider)
+    check_mode(request.mode, request.template)
+    try:
+        return {"html": await run_generate(request, request_raw)}
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        error_msg = str(e)
-        if hasattr(e, 'stderr') and e.stderr:
-            print(f"Subprocess Error: {e.stderr}")
-            # 만약 에러 내용 중에 특정 키워드가 있다면 사용자 친화적으로 변경
-            if "RESOURCE_EXHAUSTED" in e.stderr:
-                error_msg = "AI 서비스 할당량이 초과되었습니다. 1분 후 다시 시도해주세요."
-            elif "timed out" in e.stderr:
-                error_msg = "서버 응답이 지연되고 있습니다. 잠시 후 다시 시도해주세요."
-            else:
-                # stderr의 마지막 몇 줄을 에러 메시지에 포함
-                error_msg = e.stderr.strip().split("\n")[-1]
-                
-        print(f"Final Error: {error_msg}")
+        error_msg = generation_error_message(e)
+        log("ERROR", f"Final Error: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
-@app.post("/api/convert")
-async def convert_html_to_png(html_content: str = Form(...)):
+@app.post("/api/generate_html/jobs")
+async def create_generate_job(request: GenerateHtmlRequest, request_raw: Request):
+    """생성을 작업으로 시작하고 job_id 를 바로 반환 — 진행은 /api/jobs/{id}/events (SSE) 로 구독"""
+    check_provider(request.provider)
+    check_mode(request.mode, request.template)
+    owner = client_key(request_raw)
+    # 동기 경로와 같은 한도로 생성 시점에 거절 (429) — 다른 worker 에서 진행 중인 작업도 레지스트리로 셈
+    active = await asyncio.to_thread(job_registry.active, ("generate",), owner)
+    llm_pool.check(owner, active)
+    job_id = await asyncio.to_thread(job_registry.create, "generate", owner=owner,
+                                     meta={"text": request.text[:200], "slide_count": request.slide_count})
+    started = time.perf_counter()
+
+    def sink(event, data):
+        # 작업 시작 기준 경과 시간(ms)을 붙여 저장 → 재연결한 클라이언트도 같은 타임라인을 받음
+        job_registry.add_event(job_id, event, dict(data, t_ms=round((time.perf_counter() - started) * 1000)))
+
+    async def heartbeat():
+        # 진행 중임을 레지스트리에 남김 → 이 worker 가 죽으면 갱신이 끊겨 job_events 가 고아 작업으로 정리
+        while True:
+            await asyncio.sleep(JOB_STALE_SECONDS / 5)
+            await asyncio.to_thread(job_registry.update, job_id)
+
+    async def run():
+        token = progress.bind(sink)
+        beat = asyncio.create_task(heartbeat())
+        try:
+            job_registry.update(job_id, status="running")
+            html_content = await run_generate(request, request_raw)
+            # 종료 이벤트를 먼저 기록하고 상태를 바꿈 (SSE 스트림은 상태가 끝났으면 남은 이벤트까지만 보냄)
+            emit("done", html=html_content)
+            job_registry.update(job_id, status="done", result={"html": html_content})
+        except Exception as e:
+            error_msg = generation_error_message(e)
+            log("ERROR", f"Final Error: {error_msg}")
+            emit("error", message=error_msg)
+            job_registry.update(job_id, status="error", error=error_msg)
+        finally:
+            beat.cancel()
+            progress.unbind(token)
+
+    await asyncio.to_thread(sink, "queued", {})
+    app.state.generate_tasks = getattr(app.state, "generate_tasks", set())
+    task = asyncio.create_task(run())
+    app.state.generate_tasks.add(task)  # 태스크가 GC 되지 않도록 참조 유지
+    task.add_done_callback(app.state.generate_tasks.discard)
+    return {"job_id": job_id}
+
+def get_owned_job(job_id: str, request: Request) -> dict:
+    job = job_registry.get(job_id)
+    if not job or job["kind"] != "generate" or job["owner"] != client_key(request):
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    if job_registry.fail_if_stale(job_id, JOB_ORPHANED_MESSAGE):
+        job = job_registry.get(job_id)
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """생성 작업 상태/결과 조회 (SSE 를 쓸 수 없는 클라이언트용)"""
+    job = get_owned_job(job_id, request)
+    return {"job_id": job_id, "status": job["status"], "error": job["error"], **(job["result"] or {})}
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, after: int = 0):
+    """작업 진행 이벤트 SSE 스트림 — Last-Event-ID(또는 ?after=) 이후 이벤트부터 이어서 전송"""
+    get_owned_job(job_id, request)
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+
+    async def stream():
+        cursor, idle = after, 0.0
+        yield "retry: 2000\n\n"
+        while not await request.is_disconnected():
+            events = await asyncio.to_thread(job_registry.events, job_id, cursor)
+            for event in events:
+                cursor = event["seq"]
+                payload = json.dumps(event["data"], ensure_ascii=False)
+                yield f"id: {cursor}\nevent: {event['type']}\ndata: {payload}\n\n"
+                if event["type"] in ("done", "error"):
+                    return
+            if events:
+                idle = 0.0
+            else:
+                job = await asyncio.to_thread(job_registry.get, job_id)
+                if not job or job["status"] in ("done", "error"):
+                    return
+                # heartbeat 가 끊긴 작업(처리하던 worker 종료) → error 로 바꾸면 다음 폴링에서 error 이벤트를 보내고 끝남
+                await asyncio.to_thread(job_registry.fail_if_stale, job_id, JOB_ORPHANED_MESSAGE)
+                idle += JOB_EVENTS_POLL_SECONDS
+                if idle >= JOB_EVENTS_HEARTBEAT_SECONDS:  # 프록시 idle timeout 방지
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # nginx 버퍼링 끄기
+    })
+
+class RefineRequest(BaseModel):
+    html: str
+    request: str
+    slides: Optional[List[int]] = None  # 수정할 슬라이드 번호(1부터). 없으면 요청 문장에서 추출
+    gemini_api_key: Optional[str] = None
+
+@app.post("/api/refine")
+async def refine_endpoint(request: RefineRequest, request_raw: Request):
+    """덱을 슬라이드 단위로 나눠 대상 슬라이드만 수정 — 리서치/전체 재생성 없음"""
+    if not request.request.strip() or not request.html.strip():
+        raise HTTPException(status_code=400, detail="수정 요청과 HTML 이 필요합니다.")
+    # 이전 글자 맞춤을 되돌린 원래 크기 기준으로 수정하고, 수정 결과를 다시 맞춤
+    # (맞춘 !important 값이 남아 있으면 "제목 더 크게" 같은 수정이 되돌려지거나 덮임)
+    html = strip_fit(request.html) if TEXT_FIT_ON_GENERATE else request.html
+    # 색상/크기/폰트/정렬/여백 같은 단순 요청은 LLM 풀 슬롯을 쓰지 않고 규칙으로 바로 처리
+    fast = await asyncio.to_thread(refine_with_rules, html, request.request, request.slides)
+    if fast:
+        fast["html"] = await auto_fit(client_key(request_raw), fast["html"])
+        return fast
+    gemini_key, _, _ = await resolve_api_keys(request, request_raw)
     try:
-        # 1. Save HTML to temporary file
-        html_path = os.path.join(TMP_DIR, "temp_slides.html")
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-            
-        # 2. Run capture script
+        with span("refine"):
+            result = await llm_pool.run(client_key(request_raw), refine_slides,
+                                        html, request.request, request.slides, gemini_key, False)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        log("ERROR", f"Refine Error: {e}")
+        raise HTTPException(status_code=500, detail="수정 실패. 다시 시도해주세요.")
+    result["html"] = await auto_fit(client_key(request_raw), result["html"])
+    return result
+
+async def fit_deck(owner: str, html_content: str):
+    """렌더 풀 슬롯 안에서 글자 넘침 맞춤 → (HTML, 보고서). 브라우저를 쓸 수 없으면 (원본, None)"""
+    try:
+        async with render_pool.slot(owner):
+            with span("text_fit"):
+                return await browser_pool.fit(html_content)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        log("WARN", f"글자 맞춤 건너뜀: {e}")
+        return html_content, None
+
+async def auto_fit(owner: str, html_content: str) -> str:
+    """생성/수정 직후 단계 — 렌더 풀이 가득 찼거나 브라우저가 없으면 원본 그대로 (결과 전달을 막지 않음)"""
+    if not TEXT_FIT_ON_GENERATE or not html_content:
+        return html_content
+    try:
+        fitted, report = await fit_deck(owner, html_content)
+    except AdmissionRejected:
+        return html_content
+    if report:
+        emit("fitted", adjusted=report["adjusted"])
+    return fitted
+
+class FitRequest(BaseModel):
+    html: str
+
+@app.post("/api/fit")
+async def fit_endpoint(request: FitRequest, request_raw: Request):
+    """글자가 슬라이드 밖으로 넘치는 블록의 글자 크기를 줄여 맞춤 — LLM 호출 없음"""
+    if not request.html.strip():
+        raise HTTPException(status_code=400, detail="HTML 이 필요합니다.")
+    html_content, report = await fit_deck(client_key(request_raw), request.html)
+    if report is None:
+        raise HTTPException(status_code=503, detail="브라우저를 사용할 수 없어 글자 맞춤을 하지 못했습니다.")
+    return {"html": html_content, **report}
+
+def prepare_render(job_id: str, html_content: str) -> str:
+    """작업을 running 으로 표시하고 HTML 을 작업 디렉토리에 저장 → HTML 경로 (블로킹 I/O, 스레드에서 호출)"""
+    job_registry.update(job_id, status="running")
+    html_path = os.path.join(job_registry.job_dir(job_id), "slides.html")
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+    return html_path
+
+def collect_rendered(job_dir: str) -> list:
+    """생성된 PNG 를 내용 해시 파일명으로 바꾼 목록 (블로킹 I/O, 스레드에서 호출)"""
+    files = sorted(glob.glob(os.path.join(job_dir, "*.png")))
+    return [content_addressed(f) for f in files]
+
+async def render_slides(job_id: str, html_content: str) -> list:
+    """HTML → PNG 캡처 후 생성된 파일명 목록 반환 (렌더 풀 슬롯 안에서 실행)
+
+    SQLite/파일 I/O 는 asyncio.to_thread 로 넘겨 이벤트 루프를 막지 않음
+    """
+    job_dir = job_registry.job_dir(job_id)
+
+    # 1. Save HTML to the job directory
+    html_path = await asyncio.to_thread(prepare_render, job_id, html_content)
+
+    # 2. Capture with the shared browser; fall back to the standalone script
+    try:
+        await browser_pool.capture(html_path, job_dir)
+    except Exception as e:
+        log("WARN", f"브라우저 풀 렌더링 실패, 서브프로세스로 재시도: {e}")
         # Note: We use absolute path to ensure the script is found
         capture_script = os.path.join(WORKSPACE, "execution", "export_slides_to_png.py")
-        
-        # Clear previous slides
-        if os.path.exists(SLIDES_DIR):
-            shutil.rmtree(SLIDES_DIR)
-        os.makedirs(SLIDES_DIR, exist_ok=True)
-        
-        subprocess.run(
-            [sys.executable, capture_script, "--input", html_path],
-            check=True
+        await asyncio.to_thread(
+            subprocess.run,
+            [sys.executable, capture_script, "--input", html_path, "--output", job_dir],
+            check=True,
+            env=subprocess_env(),  # request_id 전달 → 서브프로세스 로그도 같은 요청으로 묶임
         )
-        
-        # 3. Get generated files
-        files = sorted(glob.glob(os.path.join(SLIDES_DIR, "*.png")))
-        file_names = [os.path.basename(f) for f in files]
-        
-        return {"slides": file_names}
+
+    # 3. Get generated files — 내용 해시를 파일명에 넣어 immutable URL 로 제공
+    with span("render_list"):
+        return await asyncio.to_thread(collect_rendered, job_dir)
+
+async def render_to_job(owner: str, html_content: str) -> dict:
+    """render 작업을 만들고 렌더 풀 슬롯 안에서 PNG 생성. {"job_id", "slides"} 반환"""
+    job_id = await asyncio.to_thread(job_registry.create, "render", owner=owner)
+    try:
+        # 렌더 풀 슬롯 안에서 실행 (동시에 열리는 Chromium 페이지 수 제한)
+        async with render_pool.slot(owner):
+            with span("render"):
+                file_names = await render_slides(job_id, html_content)
+        slides = [f"{job_id}/{name}" for name in file_names]
+        await asyncio.to_thread(job_registry.update, job_id, status="done", result={"slides": slides})
+        return {"job_id": job_id, "slides": slides}
+    except AdmissionRejected:
+        await asyncio.to_thread(job_registry.delete, job_id)
+        raise
+    except Exception as e:
+        await asyncio.to_thread(job_registry.update, job_id, status="error", error=str(e))
+        raise
+
+@app.post("/api/convert")
+async def convert_html_to_png(request_raw: Request, html_content: str = Form(...)):
+    try:
+        rendered = await render_to_job(client_key(request_raw), html_content)
+        return {"slides": rendered["slides"], "job_id": rendered["job_id"]}
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"Conversion Error: {e}")
+        log("ERROR", f"Conversion Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/slides/{filename}")
-async def get_slide(filename: str):
-    file_path = os.path.join(SLIDES_DIR, filename)
+# ── 캡션/해시태그 ─────────────────────────────────────────────────────────
+def hashtag_sources():
+    """공용 해시태그 인덱스 재료: 실시간 트렌드, 생성된 캡션 캐시 (유저 히스토리는 넣지 않음)"""
+    return trends_refresher.snapshot()["trends"], generation_cache.CACHE_DIR
+
+def local_hashtags(source: str, limit: int = None, personal: dict = None) -> list:
+    """로컬 인덱스로 해시태그 순위 계산 (TTL 이 지났으면 먼저 인덱스 재구성) — LLM 호출 없음
+
+    personal: 요청한 유저 본인 히스토리의 키워드 가중치 (history_weights)
+    """
+    hashtag_index.refresh_if_stale(hashtag_sources)
+    with span("hashtags_local"):
+        return hashtag_index.suggest(source, limit or HASHTAG_LIMIT, personal)
+
+def tag_string(ranked: list) -> str:
+    return " ".join(f"#{tag}" for tag, _ in ranked)
+
+_caption_inflight = {}  # 캐시 키 -> 진행 중인 생성 Future (같은 덱 동시 요청은 한 번만 생성)
+
+async def caption_for_deck(owner: str, html_content: str, gemini_key: Optional[str], llm: bool = True) -> dict:
+    """덱 본문 텍스트 기준으로 캐시된 캡션 반환, 없으면 LLM 풀에서 생성 후 저장
+
+    로컬 해시태그 엔진의 추천을 LLM 프롬프트 후보로 넘기고, llm=False 거나 LLM 이 실패하면
+    로컬 해시태그만 반환한다 (source="local", 캐시하지 않음).
+    """
+    source = await asyncio.to_thread(caption_source, html_content)
+    key = generation_cache.caption_key(source)
+    cached = generation_cache.get_caption(key)
+    record_cache("caption", cached is not None)
+    if cached:
+        return dict(cached, cached=True, source="llm")
+
+    local = tag_string(await asyncio.to_thread(local_hashtags, source))
+    if not llm:
+        return {"caption": "", "hashtags": local, "cached": False, "source": "local"}
+
+    pending = _caption_inflight.get(key)
+    if pending:
+        try:
+            return dict(await asyncio.shield(pending), cached=True, source="llm")
+        except AdmissionRejected:
+            raise
+        except Exception:
+            return {"caption": "", "hashtags": local, "cached": False, "source": "local"}
+    future = asyncio.get_running_loop().create_future()
+    _caption_inflight[key] = future
+    try:
+        with span("caption"):
+            result = await llm_pool.run(owner, generate_caption, html_content, gemini_key, local)
+        result = {"caption": result.get("caption", ""), "hashtags": result.get("hashtags", "") or local}
+        generation_cache.put_caption(key, result)
+        future.set_result(result)
+        return dict(result, cached=False, source="llm")
+    except AdmissionRejected as e:
+        future.set_exception(e)
+        future.exception()  # 기다리는 쪽이 없어도 "never retrieved" 경고가 나지 않게
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()
+        log("WARN", f"캡션 LLM 실패, 로컬 해시태그로 대체: {e}")
+        return {"caption": "", "hashtags": local, "cached": False, "source": "local"}
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()
+        raise
+    finally:
+        _caption_inflight.pop(key, None)
+
+class CaptionRequest(BaseModel):
+    html: str
+    llm: bool = True  # False 면 로컬 해시태그만 즉시 반환
+    gemini_api_key: Optional[str] = None
+
+@app.post("/api/caption")
+async def caption_endpoint(request: CaptionRequest, request_raw: Request):
+    """캡션 + 해시태그 생성 — /api/convert 와 동시에 호출해 PNG 와 함께 받도록 설계"""
+    gemini_key, _, _ = await resolve_api_keys(request, request_raw)
+    try:
+        return await caption_for_deck(client_key(request_raw), request.html, gemini_key, llm=request.llm)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        log("ERROR", f"Caption Error: {e}")
+        raise HTTPException(status_code=500, detail="캡션 생성 실패. 다시 시도해주세요.")
+
+class HashtagRequest(BaseModel):
+    html: Optional[str] = None
+    text: Optional[str] = None
+    limit: Optional[int] = None
+
+@app.post("/api/hashtags")
+async def hashtags_endpoint(request: HashtagRequest, user: dict = Depends(get_current_user)):
+    """덱(html) 또는 텍스트에서 로컬 해시태그 추천 — LLM 없이 수 ms (본인 히스토리 키워드 반영)"""
+    if not (request.html or request.text):
+        raise HTTPException(status_code=400, detail="html 또는 text 가 필요합니다")
+    limit = max(1, min(request.limit or HASHTAG_LIMIT, 60))
+    def rank():
+        source = caption_source(request.html) if request.html else request.text
+        return local_hashtags(source, limit, history_weights(load_user_history(user["email"])))
+    ranked = await asyncio.to_thread(rank)
+    return {
+        "hashtags": tag_string(ranked),
+        "ranked": [{"tag": tag, "score": score} for tag, score in ranked],
+    }
+
+@app.get("/api/hashtags/complete")
+async def hashtags_complete(q: str, limit: int = 10, user: dict = Depends(get_current_user)):
+    """해시태그 접두사 자동완성 (인기순, 본인 히스토리 키워드 포함)"""
+    def complete():
+        hashtag_index.refresh_if_stale(hashtag_sources)
+        personal = history_weights(load_user_history(user["email"]))
+        return hashtag_index.complete(q, max(1, min(limit, 30)), personal)
+    return {"tags": await asyncio.to_thread(complete)}
+
+@app.get("/api/slides/{job_id}/{filename}")
+async def get_slide(request: Request, job_id: str, filename: str):
+    # 경로 조작 방지: 작업 ID/파일명에 디렉토리 구분자 불허
+    if os.path.basename(job_id) != job_id or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=404, detail="File not found")
+    file_path = os.path.join(job_registry.job_dir(job_id), filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path)
+    touch(job_registry.job_dir(job_id))  # 디스크 GC 의 LRU 기준 (작업 디렉토리 단위)
+    return cached_file_response(request, file_path)
+
+# ── 배치 생성 (콘텐츠 캘린더) ─────────────────────────────────────────────
+class BatchRequest(BaseModel):
+    topics: List[str]
+    slide_count: Optional[int] = 5
+    provider: Optional[str] = None
+    mode: Optional[str] = None
+    template: Optional[str] = None
+    render: bool = True
+    caption: bool = True
+    parallelism: Optional[int] = None
+    gemini_api_key: Optional[str] = None
+    claude_api_key: Optional[str] = None
+    openai_api_key: Optional[str] = None
+
+@app.post("/api/batch")
+async def create_batch(request: BatchRequest, user: dict = Depends(get_current_user)):
+    """주제 목록을 한 번에 생성 — job_id 를 즉시 반환하고 백그라운드에서 진행"""
+    topics = [t.strip() for t in request.topics if t and t.strip()]
+    if not topics:
+        raise HTTPException(status_code=400, detail="주제를 하나 이상 입력해주세요")
+    if len(topics) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {BATCH_MAX_ITEMS}개 주제까지 생성할 수 있습니다")
+
+    stored_keys = get_decrypted_settings(user["email"])
+    gemini_key = stored_keys.get("gemini_api_key") or request.gemini_api_key
+    claude_key = stored_keys.get("claude_api_key") or request.claude_api_key
+    openai_key = stored_keys.get("openai_api_key") or request.openai_api_key
+    check_provider(request.provider)
+    check_mode(request.mode, request.template)
+    if not any([gemini_key, claude_key, openai_key]) and not await asyncio.to_thread(local_available):
+        raise HTTPException(status_code=400, detail="설정된 AI API 키가 없습니다. 설정 탭에서 API 키를 입력해주세요.")
+
+    owner = user["email"]
+    # 배치도 유저 본인 이름으로 풀에 들어감 → 대화형 요청과 합쳐 MAX_INFLIGHT_PER_USER 를 넘지 않음
+    # (한도에 걸린 단계는 admitted() 가 기다렸다 다시 시도)
+    parallelism = max(1, min(request.parallelism or BATCH_PARALLELISM, BATCH_PARALLELISM, MAX_INFLIGHT_PER_USER))
+    batch_id = job_registry.create("batch", owner=owner, meta={"topics": topics, "slide_count": request.slide_count})
+
+    def generate(text):
+        return generate_html(
+            text=text, slides=request.slide_count,
+            gemini_key=gemini_key, claude_key=claude_key, openai_key=openai_key, provider=request.provider,
+            mode=request.mode, template=request.template,
+        )
+
+    async def generate_and_fit(text):
+        html_content = await admitted(lambda: llm_pool.run(owner, generate, text))
+        if not TEXT_FIT_ON_GENERATE:
+            return html_content
+        # 대화형 auto_fit 과 달리 한도에 걸리면 건너뛰지 않고 기다렸다 맞춤
+        fitted, report = await admitted(lambda: fit_deck(owner, html_content))
+        return fitted
+
+    stages = {
+        "research": lambda topic: admitted(lambda: llm_pool.run(owner, research_with_cache, topic, gemini_key)),
+        "generate": generate_and_fit,
+        "render": lambda html: admitted(lambda: render_to_job(owner, html)),
+        "caption": lambda html: admitted(lambda: caption_for_deck(owner, html, gemini_key)),
+    }
+    run = BatchRun(job_registry, batch_id, topics, stages, render=request.render, caption=request.caption, parallelism=parallelism)
+    app.state.batch_tasks = getattr(app.state, "batch_tasks", set())
+    task = asyncio.create_task(run.run())
+    app.state.batch_tasks.add(task)  # 태스크가 GC 되지 않도록 참조 유지
+    task.add_done_callback(app.state.batch_tasks.discard)
+    return {"job_id": batch_id, "total": len(topics)}
+
+def get_owned_batch(batch_id: str, user: dict) -> dict:
+    job = job_registry.get(batch_id)
+    if not job or job["kind"] != "batch" or job["owner"] != user["email"]:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return job
+
+@app.get("/api/batch/{batch_id}")
+async def get_batch(batch_id: str, user: dict = Depends(get_current_user)):
+    """배치 진행 상황 (주제별 단계/결과)"""
+    job = get_owned_batch(batch_id, user)
+    return {"job_id": batch_id, "status": job["status"], **(job["result"] or {"items": []})}
+
+@app.get("/api/batch/{batch_id}/download")
+async def download_batch(request: Request, batch_id: str, user: dict = Depends(get_current_user)):
+    """완료된 덱 묶음(zip) — 주제별 HTML, 캡션, 슬라이드 PNG"""
+    job = get_owned_batch(batch_id, user)
+    if job["status"] not in ("done", "error"):
+        raise HTTPException(status_code=409, detail="배치가 아직 진행 중입니다")
+    zip_path = await asyncio.to_thread(build_zip, job_registry, batch_id)
+    response = cached_file_response(request, zip_path, media_type="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="cardnews_batch_{batch_id[:8]}.zip"'
+    return response
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8899)
+    # uvicorn/앱 로그 → request_id 가 붙은 JSON 라인 (LOG_FORMAT=text 면 텍스트)
+    uvicorn.run(app, host="127.0.0.1", port=8899, log_config=log_config())
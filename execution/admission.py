@@ -0,0 +1,191 @@
+"""
+생성/렌더 작업 동시 실행 제한 (admission control)
+
+- LLM 작업(리서치 + HTML 생성)과 렌더 작업(Chromium 캡처)을 별도의 bounded pool 에서 실행
+- 유저별 동시 요청 수(실행 중 + 대기 중) 제한 → 더블클릭/스크립트 호출이 리소스를 독점하지 못함
+- 대기열은 유저 간 라운드로빈으로 배분 → 한 유저의 요청이 몰려도 다른 유저가 밀리지 않음
+- 한도 초과 시 AdmissionRejected 발생 → 백엔드에서 429 + 대기 순번으로 변환
+- low_priority 작업(선생성 등)은 빈 슬롯이 있고 대기 중인 요청이 없을 때만 실행, 아니면 바로 거절 (대기열에 서지 않음)
+
+풀 크기는 프로세스(uvicorn worker) 단위로 적용된다.
+"""
+import os
+import time
+import asyncio
+import functools
+import contextvars
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "4"))
+RENDER_POOL_SIZE = int(os.environ.get("RENDER_POOL_SIZE", "2"))
+MAX_INFLIGHT_PER_USER = int(os.environ.get("MAX_INFLIGHT_PER_USER", "2"))
+ADMISSION_QUEUE_MAX = int(os.environ.get("ADMISSION_QUEUE_MAX", "20"))
+
+
+class AdmissionRejected(Exception):
+    """동시 실행/대기열 한도 초과 — 429 로 응답해야 하는 경우"""
+
+    def __init__(self, message, pool, queue_position, retry_after):
+        super().__init__(message)
+        self.pool = pool
+        self.queue_position = queue_position
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """유저별 공정 대기열을 가진 bounded 실행 풀 (이벤트 루프 단일 스레드에서만 조작)"""
+
+    def __init__(self, name, size, max_queue=ADMISSION_QUEUE_MAX, per_user_limit=MAX_INFLIGHT_PER_USER):
+        self.name = name
+        self.size = max(1, size)
+        self.max_queue = max_queue
+        self.per_user_limit = per_user_limit
+        self.executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=f"{name}-pool")
+        self._running = 0
+        self._waiting = OrderedDict()   # user -> deque[Future], 순서 = 라운드로빈 차례
+        self._inflight = Counter()      # user -> 실행 중 + 대기 중 요청 수
+        self._avg_duration = 30.0       # 작업 소요 시간 이동 평균 (Retry-After 추정용)
+
+    # ── 상태 조회 ──────────────────────────────────────────────────────────
+    def queued(self):
+        return sum(len(q) for q in self._waiting.values())
+
+    def busy(self):
+        return self._running > 0 or bool(self._waiting)
+
+    def _fair_order(self):
+        """현재 대기열을 실제 배정 순서(유저 간 라운드로빈)로 펼친 목록"""
+        queues = [(user, list(q)) for user, q in self._waiting.items()]
+        order = []
+        depth = 0
+        while True:
+            row = [(user, q[depth]) for user, q in queues if depth < len(q)]
+            if not row:
+                return order
+            order.extend(row)
+            depth += 1
+
+    def queue_position(self, user):
+        """유저의 가장 앞선 대기 요청 순번 (1부터). 대기 중인 요청이 없으면 0"""
+        for i, (u, _) in enumerate(self._fair_order(), 1):
+            if u == user:
+                return i
+        return 0
+
+    def _retry_after(self, position):
+        waves = max(1, position) / self.size
+        return max(1, int(self._avg_duration * waves))
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "running": self._running,
+            "queued": self.queued(),
+            "users": len(self._inflight),
+        }
+
+    # ── 슬롯 획득/반납 ─────────────────────────────────────────────────────
+    def check(self, user, inflight=0):
+        """슬롯을 잡지 않고 지금 들어오면 받아들여질지만 확인 — 거절될 요청이면 AdmissionRejected
+
+        백그라운드 작업을 만들기 전에 호출 (동기 경로와 같은 429). inflight: 풀 밖에서 센 유저의 진행 중 요청 수
+        """
+        count = max(self._inflight[user], inflight)
+        if count >= self.per_user_limit:
+            position = self.queue_position(user)
+            raise AdmissionRejected(
+                f"이미 진행 중인 요청이 {count}건 있습니다. 완료 후 다시 시도해주세요.",
+                self.name, position, self._retry_after(position),
+            )
+        if self._running >= self.size and self.queued() >= self.max_queue:
+            position = self.queued() + 1
+            raise AdmissionRejected(
+                "요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요.",
+                self.name, position, self._retry_after(position),
+            )
+
+    async def acquire(self, user, user_limit=None, low_priority=False):
+        """user_limit: 이 호출에만 적용할 유저별 한도, low_priority: 유저 요청에 슬롯을 양보하는 백그라운드 작업"""
+        if low_priority and (self._running >= self.size or self._waiting):
+            raise AdmissionRejected("빈 슬롯이 없어 백그라운드 작업을 미룹니다.", self.name, 0, self._retry_after(1))
+        if self._inflight[user] >= (user_limit or self.per_user_limit):
+            position = self.queue_position(user)
+            raise AdmissionRejected(
+                f"이미 진행 중인 요청이 {self._inflight[user]}건 있습니다. 완료 후 다시 시도해주세요.",
+                self.name, position, self._retry_after(position),
+            )
+
+        if self._running < self.size and not self._waiting:
+            self._running += 1
+            self._inflight[user] += 1
+            return
+
+        if self.queued() >= self.max_queue:
+            position = self.queued() + 1
+            raise AdmissionRejected(
+                "요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요.",
+                self.name, position, self._retry_after(position),
+            )
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user, deque()).append(fut)
+        self._inflight[user] += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 슬롯을 넘겨받은 직후 취소됨 → 다음 대기자에게 다시 넘김
+                self.release(user)
+            else:
+                q = self._waiting.get(user)
+                if q is not None and fut in q:
+                    q.remove(fut)
+                    if not q:
+                        del self._waiting[user]
+                self._forget(user)
+            raise
+
+    def release(self, user):
+        self._forget(user)
+        while self._waiting:
+            next_user, q = next(iter(self._waiting.items()))
+            fut = q.popleft()
+            if q:
+                self._waiting.move_to_end(next_user)
+            else:
+                del self._waiting[next_user]
+            if not fut.done():
+                fut.set_result(None)  # 실행 슬롯을 그대로 넘김 (_running 유지)
+                return
+        self._running -= 1
+
+    def _forget(self, user):
+        self._inflight[user] -= 1
+        if self._inflight[user] <= 0:
+            del self._inflight[user]
+
+    # ── 실행 ────────────────────────────────────────────────────────────────
+    @asynccontextmanager
+    async def slot(self, user, user_limit=None, low_priority=False):
+        """슬롯을 점유한 동안 이벤트 루프에서 직접 실행하는 비동기 작업용"""
+        await self.acquire(user, user_limit, low_priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+            self.release(user)
+
+    async def run(self, user, fn, *args, user_limit=None, low_priority=False, **kwargs):
+        """슬롯을 얻은 뒤 fn(*args, **kwargs) 을 풀 스레드에서 실행"""
+        async with self.slot(user, user_limit, low_priority):
+            loop = asyncio.get_running_loop()
+            # 요청 컨텍스트(request_id, span 트리)를 풀 스레드까지 전달
+            ctx = contextvars.copy_context()
+            return await loop.run_in_executor(self.executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+llm_pool = WorkerPool("llm", LLM_POOL_SIZE)
+render_pool = WorkerPool("render", RENDER_POOL_SIZE)
@@ -0,0 +1,143 @@
+"""
+콘텐츠 캘린더용 배치 덱 생성
+
+주제 목록을 받아 주제마다 리서치 → 생성 → (렌더 + 캡션 동시) 파이프라인을 실행한다.
+- 동시에 진행하는 주제 수는 parallelism 으로 제한, 실제 provider 호출 속도는 rate_limit 이 조절
+- 진행 상황은 작업 레지스트리(kind="batch")의 result 에 주제별로 기록 → 어느 worker 에서든 조회 가능
+- 결과 HTML/캡션은 배치 작업 디렉토리에 저장, 슬라이드는 주제별 render 작업으로 생성
+- 다 끝나면 build_zip() 으로 덱 묶음(zip) 제공
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import zipfile
+
+from execution.admission import AdmissionRejected
+from execution.tracing import log
+
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "20"))
+BATCH_PARALLELISM = int(os.environ.get("BATCH_PARALLELISM", "3"))
+ADMISSION_RETRY_LIMIT = 600  # 풀 대기열이 가득 찼을 때 재시도하며 기다리는 최대 시간(초)
+
+
+async def admitted(call):
+    """풀 대기열이 가득 차 거절되면 Retry-After 만큼 기다렸다 다시 시도 (배치는 실패보다 대기)"""
+    waited = 0
+    while True:
+        try:
+            return await call()
+        except AdmissionRejected as e:
+            if waited >= ADMISSION_RETRY_LIMIT:
+                raise
+            await asyncio.sleep(e.retry_after)
+            waited += e.retry_after
+
+
+def _slug(text, limit=30):
+    slug = re.sub(r"[^\w가-힣]+", "_", text).strip("_")
+    return slug[:limit] or "deck"
+
+
+class BatchRun:
+    """배치 1건 실행. stages 는 async 함수들: research(topic), generate(text), render(html), caption(html)"""
+
+    def __init__(self, registry, batch_id, topics, stages, render=True, caption=True, parallelism=BATCH_PARALLELISM):
+        self.registry = registry
+        self.batch_id = batch_id
+        self.stages = stages
+        self.render = render
+        self.caption = caption
+        self.parallelism = max(1, parallelism)
+        self.dir = registry.job_dir(batch_id)
+        self.items = [{"index": i, "topic": t, "status": "queued"} for i, t in enumerate(topics)]
+        self.started = time.time()
+
+    def _save(self, status="running"):
+        done = sum(1 for it in self.items if it["status"] in ("done", "error"))
+        self.registry.update(self.batch_id, status=status, result={
+            "items": self.items,
+            "total": len(self.items),
+            "completed": done,
+            "failed": sum(1 for it in self.items if it["status"] == "error"),
+            "elapsed": round(time.time() - self.started, 1),
+        })
+
+    def _stage(self, item, status):
+        item["status"] = status
+        self._save()
+
+    async def _run_item(self, item, semaphore):
+        async with semaphore:
+            try:
+                self._stage(item, "researching")
+                text = await self.stages["research"](item["topic"])
+
+                self._stage(item, "generating")
+                html = await self.stages["generate"](text)
+                name = f"{item['index'] + 1:02d}_{_slug(item['topic'])}"
+                with open(os.path.join(self.dir, f"{name}.html"), "w", encoding="utf-8") as f:
+                    f.write(html)
+                item["name"] = name
+
+                # 렌더와 캡션은 서로 독립 → 동시에 진행
+                self._stage(item, "rendering" if self.render else "captioning")
+                tasks = {}
+                if self.render:
+                    tasks["render"] = self.stages["render"](html)
+                if self.caption:
+                    tasks["caption"] = self.stages["caption"](html)
+                results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+
+                if "render" in results:
+                    if isinstance(results["render"], Exception):
+                        item["render_error"] = str(results["render"])
+                    else:
+                        item.update(results["render"])  # render_job_id, slides
+                if "caption" in results:
+                    if isinstance(results["caption"], Exception):
+                        item["caption_error"] = str(results["caption"])
+                    else:
+                        item["caption"] = results["caption"]
+                        with open(os.path.join(self.dir, f"{name}.caption.json"), "w", encoding="utf-8") as f:
+                            json.dump(results["caption"], f, ensure_ascii=False, indent=2)
+                self._stage(item, "done")
+            except Exception as e:
+                log("WARN", f"배치 {self.batch_id} #{item['index']} 실패: {e}")
+                item["error"] = str(e)
+                self._stage(item, "error")
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.parallelism)
+        self._save()
+        await asyncio.gather(*(self._run_item(item, semaphore) for item in self.items))
+        failed = all(it["status"] == "error" for it in self.items)
+        self._save(status="error" if failed else "done")
+        log("INFO", f"배치 {self.batch_id} 완료: {len(self.items)}건 ({time.time() - self.started:.0f}s)")
+
+
+def build_zip(registry, batch_id):
+    """배치 결과를 zip 으로 묶어 경로 반환 — 주제별 폴더에 HTML, 캡션, 슬라이드 PNG"""
+    job = registry.get(batch_id)
+    batch_dir = registry.job_dir(batch_id)
+    zip_path = os.path.join(batch_dir, "decks.zip")
+    if os.path.exists(zip_path):  # 완료된 배치는 내용이 바뀌지 않음
+        return zip_path
+    tmp_path = zip_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for item in (job.get("result") or {}).get("items", []):
+            name = item.get("name")
+            if not name:
+                continue
+            for suffix in (".html", ".caption.json"):
+                path = os.path.join(batch_dir, name + suffix)
+                if os.path.exists(path):
+                    zf.write(path, f"{name}/{'deck' + suffix}")
+            for slide in item.get("slides", []):
+                path = os.path.join(registry.jobs_dir, slide)
+                if os.path.exists(path):
+                    # PNG 는 이미 압축돼 있으므로 그대로 저장
+                    zf.write(path, f"{name}/{os.path.basename(slide)}", compress_type=zipfile.ZIP_STORED)
+    os.replace(tmp_path, zip_path)
+    return zip_path
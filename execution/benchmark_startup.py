@@ -0,0 +1,82 @@
+"""
+백엔드 콜드 스타트 측정 — `python -X importtime` 으로 backend/main.py import 비용 분석
+
+사용 예:
+    python execution/benchmark_startup.py              # 상위 15개 모듈 + 전체 import 시간
+    python execution/benchmark_startup.py --runs 5     # 5회 측정 후 중앙값
+    python execution/benchmark_startup.py --max-ms 1500  # 기준 초과 시 exit 1 (CI 용)
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+# 기동 직후 확인하고 싶은 무거운 의존성 — 이 목록이 import 되면 lazy import 가 깨진 것
+HEAVY_MODULES = ["pandas", "pytrends", "authlib", "cryptography", "jose", "google.genai", "playwright"]
+
+
+def measure_once():
+    env = dict(os.environ, WARMUP_ON_STARTUP="false", PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, rest = line.split(":", 1)
+        self_us, cumulative_us, name = rest.split("|", 2)
+        name = name[1:]  # 구분자 뒤 공백 한 칸 제거 → 남은 들여쓰기 = 중첩 깊이
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": depth})
+    return modules
+
+
+def summarize(modules, top):
+    total_us = sum(m["cumulative_us"] for m in modules if m["depth"] == 0)
+    loaded = {m["module"] for m in modules}
+    heavy = [name for name in HEAVY_MODULES if name in loaded]
+    ranked = sorted(modules, key=lambda m: m["cumulative_us"], reverse=True)
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "module_count": len(modules),
+        "heavy_loaded": heavy,
+        "top": [{"module": m["module"], "cumulative_ms": round(m["cumulative_us"] / 1000, 1)} for m in ranked[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=None, help="전체 import 시간 허용치 (초과 시 exit 1)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    summaries = [summarize(measure_once(), args.top) for _ in range(max(1, args.runs))]
+    median_ms = statistics.median(s["total_ms"] for s in summaries)
+    report = dict(summaries[-1], total_ms=median_ms, runs=[s["total_ms"] for s in summaries])
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"backend/main.py import: {median_ms:.1f} ms (median of {len(summaries)} runs, {report['module_count']} modules)")
+        print(f"heavy modules loaded at startup: {', '.join(report['heavy_loaded']) or 'none'}")
+        for m in report["top"]:
+            print(f"  {m['cumulative_ms']:>8.1f} ms  {m['module']}")
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"[ERROR] startup import {median_ms:.1f} ms > {args.max_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+카드뉴스 HTML 을 슬라이드 단위로 나눠 다루기
+
+생성된 덱은 class="slide" 요소(또는 id="slideN", 최상위 1080px div)가 슬라이드 1장이고,
+<style> 블록이 모든 슬라이드가 공유하는 스타일이다.
+parse_deck() 은 원본 문자열에서 각 슬라이드/스타일 블록의 위치(offset)만 기록하므로
+수정한 조각을 그 자리에 그대로 끼워 넣을 수 있다 (나머지 부분은 한 글자도 바뀌지 않음).
+"""
+import re
+from html.parser import HTMLParser
+
+_SLIDE_TARGET_RE = re.compile(r"(\d{1,2})\s*(?:번째|번|장|페이지|p\b|쪽)|(?:슬라이드|slide|카드)\s*#?\s*(\d{1,2})", re.IGNORECASE)
+_RANGE_RE = re.compile(r"(\d{1,2})\s*[~\-]\s*(\d{1,2})\s*(?:번째|번|장|페이지|p\b|쪽)?")
+
+
+class _SlideLocator(HTMLParser):
+    """슬라이드 후보 요소와 <style> 블록의 (시작, 끝) offset 수집
+
+    렌더러(export_slides_to_png)와 같은 기준으로 슬라이드를 찾는다:
+    class 에 'slide' 토큰 → id="slideN" → (둘 다 없으면) 최상위 1080px div (프론트 injectStyles 와 동일)
+    """
+
+    KINDS = ("class", "id", "top")
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=False)
+        self.html = html
+        self.line_starts = [0]
+        for match in re.finditer("\n", html):
+            self.line_starts.append(match.end())
+        self.found = {kind: [] for kind in self.KINDS}
+        self.styles = []
+        self._open = {}  # kind -> [tag, 시작 offset, 같은 태그 중첩 깊이]
+        self._div_depth = 0
+        self._style_start = None
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self.line_starts[line - 1] + col
+
+    def _tag_end(self, start):
+        end = self.html.find(">", start)
+        return len(self.html) if end == -1 else end + 1
+
+    def _kind(self, tag, attrs):
+        attrs = dict(attrs)
+        if "slide" in (attrs.get("class") or "").split():
+            return "class"
+        if re.match(r"^slide-?\d+$", attrs.get("id") or ""):
+            return "id"
+        if tag == "div" and self._div_depth == 0 and "1080px" in (attrs.get("style") or ""):
+            return "top"
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "style":
+            self._style_start = self._tag_end(self._offset())
+            return
+        for state in self._open.values():
+            if state[0] == tag:
+                state[2] += 1
+        kind = self._kind(tag, attrs)
+        if kind and kind not in self._open:
+            self._open[kind] = [tag, self._offset(), 1]
+        if tag == "div":
+            self._div_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "style" and self._style_start is not None:
+            self.styles.append((self._style_start, self._offset()))
+            self._style_start = None
+            return
+        if tag == "div":
+            self._div_depth = max(0, self._div_depth - 1)
+        for kind, state in list(self._open.items()):
+            if state[0] != tag:
+                continue
+            state[2] -= 1
+            if state[2] == 0:
+                self.found[kind].append((state[1], self._tag_end(self._offset())))
+                del self._open[kind]
+
+    @property
+    def slides(self):
+        return next((self.found[kind] for kind in self.KINDS if self.found[kind]), [])
+
+
+class Deck:
+    """파싱된 덱. slides 는 원본에서의 (start, end) 목록 — 슬라이드 번호는 1부터"""
+
+    def __init__(self, html):
+        locator = _SlideLocator(html)
+        locator.feed(html)
+        locator.close()
+        self.html = html
+        self.spans = locator.slides
+        self.style_spans = locator.styles
+
+    def __len__(self):
+        return len(self.spans)
+
+    def slide(self, number):
+        start, end = self.spans[number - 1]
+        return self.html[start:end]
+
+    @property
+    def style(self):
+        """공유 스타일 (모든 <style> 블록 내용)"""
+        return "\n".join(self.html[s:e].strip() for s, e in self.style_spans)
+
+    def splice(self, slides=None, extra_css="", styles=None, head_html=""):
+        """{슬라이드 번호: 새 HTML} 로 교체하고 extra_css 를 마지막 <style> 끝에 덧붙인 새 HTML 반환
+
+        styles 는 {<style> 블록 순번: 새 내용}, head_html 은 </head> 앞에 넣을 태그(폰트 <link> 등)
+        """
+        edits = [(self.spans[n - 1], fragment) for n, fragment in (slides or {}).items()]
+        edits += [(self.style_spans[i], css) for i, css in (styles or {}).items()]
+        if head_html:
+            head = self.html.find("</head>")
+            pos = head if head != -1 else 0
+            edits.append(((pos, pos), head_html))
+        if extra_css.strip():
+            if self.style_spans:
+                pos = self.style_spans[-1][1]
+                edits.append(((pos, pos), "\n" + extra_css.strip() + "\n"))
+            else:
+                head = self.html.find("</head>")
+                pos = head if head != -1 else 0
+                edits.append(((pos, pos), f"<style>\n{extra_css.strip()}\n</style>\n"))
+        html = self.html
+        # 뒤쪽부터 바꿔야 앞쪽 offset 이 유지됨
+        for (start, end), fragment in sorted(edits, key=lambda e: e[0][0], reverse=True):
+            html = html[:start] + fragment + html[end:]
+        return html
+
+
+def parse_deck(html):
+    return Deck(html)
+
+
+def is_single_slide(fragment):
+    """조각이 slide 요소 1개로만 이루어졌는지 (LLM 이 돌려준 조각 검증용)"""
+    deck = Deck(fragment)
+    if len(deck) != 1:
+        return False
+    start, end = deck.spans[0]
+    return not fragment[:start].strip() and not fragment[end:].strip()
+
+
+def target_slides(request, count):
+    """수정 요청 문장에서 대상 슬라이드 번호 추출 ("3번 슬라이드", "2~4장", "표지", "마지막")
+
+    특정 슬라이드를 가리키지 않으면 빈 목록 (= 덱 전체 대상)
+    """
+    targets = set()
+    for match in _RANGE_RE.finditer(request):
+        first, last = int(match.group(1)), int(match.group(2))
+        if first < last:
+            targets.update(range(first, last + 1))
+    for match in _SLIDE_TARGET_RE.finditer(request):
+        targets.add(int(match.group(1) or match.group(2)))
+    if re.search(r"표지|커버|첫\s*(?:번째\s*)?(?:장|슬라이드|페이지)|cover", request, re.IGNORECASE):
+        targets.add(1)
+    if re.search(r"마지막|끝\s*(?:장|슬라이드|페이지)|last", request, re.IGNORECASE):
+        targets.add(count)
+    return sorted(n for n in targets if 1 <= n <= count)
+
+
+class _TextCollector(HTMLParser):
+    """태그/스타일/스크립트를 걷어내고 보이는 텍스트만 모음 (블록 경계는 줄바꿈)"""
+
+    BLOCK_TAGS = {"div", "p", "br", "h1", "h2", "h3", "h4", "h5", "h6", "li", "section", "article", "tr"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("style", "script", "head", "title"):
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("style", "script", "head", "title"):
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in "".join(self.parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+
+def html_text(html):
+    collector = _TextCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.text()
+
+
+def slide_texts(html):
+    """슬라이드별 본문 텍스트 목록. 슬라이드를 못 찾으면 문서 전체 텍스트 1개"""
+    deck = Deck(html)
+    if not len(deck):
+        text = html_text(html)
+        return [text] if text else []
+    return [html_text(deck.slide(n)) for n in range(1, len(deck) + 1)]
@@ -0,0 +1,213 @@
+"""
+구조화 콘텐츠(JSON) → 카드뉴스 HTML 로컬 렌더러
+
+LLM 은 슬라이드별 문구만 짧은 JSON 으로 돌려주고(출력 토큰 ~1/10), 디자인은 templates/*.html 이 맡는다.
+
+    {"hook": "커버 배지", "title": "커버 제목", "emphasis": "제목 중 강조 단어", "subtitle": "...",
+     "slides": [{"title", "emphasis", "body", "points": [...], "stat": {"value", "label"}}],
+     "cta": {"title", "items": [...], "action"}, "brand": "..."}
+
+- 템플릿은 {{SLIDES}} 자리표시자가 있는 HTML. 처음 쓸 때 앞/뒤 조각으로 나눠 캐시하고(파일 mtime 이 바뀌면 다시 읽음)
+  슬라이드 조각은 미리 만들어 둔 format 문자열에 이스케이프한 값만 끼워 넣는다
+- 렌더 결과에 콘텐츠 JSON 을 <script type="application/json" id="deck-content"> 로 함께 넣어 두어
+  나중에 LLM 호출 없이 다른 템플릿으로 다시 렌더(re-theme)할 수 있다
+- 템플릿이 쓰는 클래스: slide-cover / slide-body / slide-cta 와 그 안의 cover-*, body-*, cta-*, slide-footer
+"""
+import os
+import re
+import json
+import threading
+from html import escape
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+DECK_TEMPLATE = os.environ.get("DECK_TEMPLATE", "default")
+PLACEHOLDER = "{{SLIDES}}"
+CONTENT_SCRIPT_ID = "deck-content"
+MAX_POINTS = 5
+
+_CONTENT_RE = re.compile(
+    r'<script type="application/json" id="' + CONTENT_SCRIPT_ID + r'">(.*?)</script>', re.DOTALL)
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# ── 슬라이드 조각 (미리 컴파일된 format 문자열) ──────────────────────────
+_FOOTER = ('<div class="slide-footer"><span class="brand">{brand}</span>'
+           '<span class="counter">{number} / {total}</span></div>')
+_COVER = ('<div class="slide slide-cover"{style}>\n'
+          '{badge}<h1 class="cover-title">{title}</h1>\n'
+          '<div class="cover-deco-line"></div>\n'
+          '{subtitle}{footer}\n</div>')
+_BODY = ('<div class="slide slide-body">\n'
+         '<div class="body-step-label">{label}</div>\n'
+         '<h2 class="body-title">{title}</h2>\n'
+         '{body}{stat}{points}{footer}\n</div>')
+_STAT = '<div class="body-highlight-box"><div class="number">{value}</div><div class="label">{label}</div></div>\n'
+_CTA = ('<div class="slide slide-cta">\n'
+        '<div class="cta-emoji">{emoji}</div>\n'
+        '<h2 class="cta-title">{title}</h2>\n'
+        '{items}<div class="cta-action">{action}</div>{footer}\n</div>')
+_COVER_BG = (' style="background-image: linear-gradient(rgba(0,0,0,0.5), rgba(0,0,0,0.7) 70%, #000 100%), '
+             'url(\'{url}\'); background-size: cover; background-position: center;"')
+
+
+class CompiledTemplate:
+    def __init__(self, name, path):
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        if PLACEHOLDER not in source:
+            raise ValueError(f"템플릿 {name} 에 {PLACEHOLDER} 자리표시자가 없습니다")
+        self.name = name
+        self.mtime = os.stat(path).st_mtime
+        self.head, self.tail = source.split(PLACEHOLDER, 1)
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def template_path(name):
+    if not _NAME_RE.match(name or ""):
+        raise ValueError(f"잘못된 템플릿 이름: {name}")
+    return os.path.join(TEMPLATES_DIR, f"{name}.html")
+
+
+def load_template(name=None):
+    name = name or DECK_TEMPLATE
+    path = template_path(name)
+    if not os.path.exists(path):
+        raise ValueError(f"템플릿 {name} 이 없습니다 (사용 가능: {', '.join(list_templates())})")
+    with _compiled_lock:
+        compiled = _compiled.get(name)
+        if compiled is None or compiled.mtime != os.stat(path).st_mtime:
+            compiled = _compiled[name] = CompiledTemplate(name, path)
+        return compiled
+
+
+def list_templates():
+    if not os.path.isdir(TEMPLATES_DIR):
+        return []
+    return sorted(n[:-5] for n in os.listdir(TEMPLATES_DIR) if n.endswith(".html") and _NAME_RE.match(n[:-5]))
+
+
+# ── 콘텐츠 검증 ───────────────────────────────────────────────────────────
+def _str(value):
+    return value.strip() if isinstance(value, str) else ("" if value is None else str(value).strip())
+
+
+def _strings(values, limit=MAX_POINTS):
+    return [s for s in (_str(v) for v in (values if isinstance(values, list) else [])) if s][:limit]
+
+
+def normalize_content(data):
+    """LLM 이 돌려준 JSON 을 렌더 가능한 형태로 정리. 필수 항목이 없으면 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("콘텐츠가 JSON 객체가 아닙니다")
+    slides = []
+    for item in data.get("slides") or []:
+        if not isinstance(item, dict) or not _str(item.get("title")):
+            continue
+        stat = item.get("stat") if isinstance(item.get("stat"), dict) else {}
+        slides.append({
+            "title": _str(item.get("title")),
+            "emphasis": _str(item.get("emphasis")),
+            "body": _str(item.get("body")),
+            "points": _strings(item.get("points")),
+            "stat": {"value": _str(stat.get("value")), "label": _str(stat.get("label"))} if _str(stat.get("value")) else None,
+        })
+    if not _str(data.get("title")) or not slides:
+        raise ValueError("콘텐츠에 커버 제목(title) 또는 본문 슬라이드(slides)가 없습니다")
+    cta = data.get("cta") if isinstance(data.get("cta"), dict) else {}
+    return {
+        "hook": _str(data.get("hook")),
+        "title": _str(data.get("title")),
+        "emphasis": _str(data.get("emphasis")),
+        "subtitle": _str(data.get("subtitle")),
+        "slides": slides,
+        "cta": {
+            "title": _str(cta.get("title")) or "도움이 되셨다면 저장해두세요",
+            "items": _strings(cta.get("items")),
+            "action": _str(cta.get("action")) or "저장하고 다시 보기",
+            "emoji": _str(cta.get("emoji")) or "📌",
+        },
+        "brand": _str(data.get("brand")),
+    }
+
+
+# ── 렌더 ─────────────────────────────────────────────────────────────────
+def _emphasize(text, emphasis):
+    """escape 후 강조 단어 첫 등장을 <em> 으로 (제목 안에 없으면 그대로)"""
+    text = escape(text)
+    emphasis = escape(emphasis)
+    if emphasis and emphasis in text:
+        text = text.replace(emphasis, f"<em>{emphasis}</em>", 1)
+    return text.replace("\n", "<br>")
+
+
+def _paragraphs(text, cls):
+    return "".join(f'<p class="{cls}">{escape(line)}</p>\n' for line in text.split("\n") if line.strip())
+
+
+def render_slides(content, bg_image=None):
+    total = len(content["slides"]) + 2
+    brand = escape(content["brand"])
+
+    def footer(number):
+        return _FOOTER.format(brand=brand, number=number, total=total)
+
+    parts = [_COVER.format(
+        style=_COVER_BG.format(url=escape(bg_image, quote=True)) if bg_image else "",
+        badge=f'<div class="cover-badge">{escape(content["hook"])}</div>\n' if content["hook"] else "",
+        title=_emphasize(content["title"], content["emphasis"]),
+        subtitle=_paragraphs(content["subtitle"], "cover-subtitle"),
+        footer=footer(1),
+    )]
+    for i, slide in enumerate(content["slides"], 1):
+        stat = slide["stat"]
+        points = "".join(f"<li>{escape(p)}</li>" for p in slide["points"])
+        parts.append(_BODY.format(
+            label=f"POINT {i:02d}",
+            title=_emphasize(slide["title"], slide["emphasis"]),
+            body=_paragraphs(slide["body"], "body-text"),
+            stat=_STAT.format(value=escape(stat["value"]), label=escape(stat["label"])) if stat else "",
+            points=f'<ul class="body-bullet-list">{points}</ul>\n' if points else "",
+            footer=footer(i + 1),
+        ))
+    cta = content["cta"]
+    items = "".join(f'<li><span class="check">✓</span>{escape(item)}</li>' for item in cta["items"])
+    parts.append(_CTA.format(
+        emoji=escape(cta["emoji"]),
+        title=escape(cta["title"]),
+        items=f'<ul class="cta-list">{items}</ul>\n' if items else "",
+        action=escape(cta["action"]),
+        footer=footer(total),
+    ))
+    return "\n".join(parts)
+
+
+def render(content, template=None, bg_image=None):
+    """콘텐츠 → 완성된 덱 HTML (콘텐츠 JSON 포함)"""
+    content = normalize_content(content)
+    compiled = load_template(template)
+    # "</" 를 이스케이프해야 문구 안의 </script> 가 태그를 닫지 않음
+    embedded = json.dumps(dict(content, template=compiled.name, bg_image=bg_image), ensure_ascii=False)
+    embedded = embedded.replace("</", "<\\/")
+    script = f'<script type="application/json" id="{CONTENT_SCRIPT_ID}">{embedded}</script>'
+    return compiled.head + render_slides(content, bg_image) + "\n" + script + compiled.tail
+
+
+def content_from_html(html):
+    """render() 가 만든 HTML 에서 콘텐츠 JSON 을 꺼냄. 구조화 모드 덱이 아니면 None"""
+    match = _CONTENT_RE.search(html or "")
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return None
+
+
+def retheme(html=None, content=None, template=None):
+    """같은 콘텐츠를 다른 템플릿으로 다시 렌더 (LLM 호출 없음)"""
+    content = content or content_from_html(html)
+    if not content:
+        raise ValueError("구조화 모드로 생성된 덱이 아니어서 템플릿을 바꿀 수 없습니다")
+    return render(content, template, content.get("bg_image"))
@@ -0,0 +1,224 @@
+"""
+디스크 용량 관리 — uploads/ 와 .tmp 하위 영역별 쿼터 + LRU 정리
+
+- 영역(area)마다 쿼터(MB)를 두고, 초과하면 마지막 접근이 가장 오래된 항목부터 삭제
+  - renders: 렌더 작업 디렉토리 (.tmp/jobs/<id>) — 작업 단위로 삭제 (레지스트리 행도 함께)
+    진행 중인 작업과, 진행 중인 배치가 참조하는 렌더 작업(zip 에 묶일 슬라이드)은 보호
+  - uploads: 업로드 배경 이미지 — 히스토리가 참조 중인 파일은 보호, 업로드 직후 유예 시간 동안 보호
+  - cache: 생성 결과 캐시 (.tmp/cache/generations)
+- 접근 시각은 touch() 로 mtime 을 갱신해 기록 (Railway 볼륨 등은 noatime/relatime 이라 atime 을 믿을 수 없음)
+- 업로드 임시 파일(uploads/.incoming)은 쿼터와 무관하게 오래되면 삭제 (중단된 업로드 잔여물)
+- worker 가 여러 개면 락을 잡은 한 프로세스만 정리, 마지막 실행 결과는 파일로 공유
+"""
+import os
+import re
+import time
+import shutil
+import asyncio
+
+from execution.filestore import atomic_write_json, read_json, try_lock
+from execution.tracing import log
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = os.path.join(WORKSPACE, ".tmp")
+UPLOADS_DIR = os.path.join(WORKSPACE, "uploads")
+STATS_PATH = os.path.join(TMP_DIR, "cache", "disk_gc.json")
+
+DISK_GC_INTERVAL = int(os.environ.get("DISK_GC_INTERVAL", "600"))
+RENDER_QUOTA_MB = int(os.environ.get("RENDER_QUOTA_MB", "500"))
+UPLOAD_QUOTA_MB = int(os.environ.get("UPLOAD_QUOTA_MB", "1000"))
+CACHE_QUOTA_MB = int(os.environ.get("CACHE_QUOTA_MB", "200"))
+# 이 시간 안에 접근/생성된 항목은 쿼터를 넘어도 삭제하지 않음 (진행 중인 렌더, 방금 올린 업로드)
+DISK_GC_GRACE_SECONDS = int(os.environ.get("DISK_GC_GRACE_SECONDS", "600"))
+INCOMING_MAX_AGE = 3600
+
+UPLOAD_REF_RE = re.compile(r"/api/uploads/([A-Za-z0-9_.-]+)")
+
+
+def touch(path):
+    """마지막 접근 시각 기록 — GC 의 LRU 기준"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _dir_usage(path):
+    """(총 바이트, 가장 최근 mtime) — 디렉토리 자체와 하위 파일 기준"""
+    total, latest = 0, os.stat(path).st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            total += st.st_size
+            latest = max(latest, st.st_mtime)
+    return total, latest
+
+
+class Area:
+    """쿼터 관리 대상 영역. entries() 는 (이름, 경로, 바이트, 마지막 접근) 목록"""
+
+    def __init__(self, name, path, quota_mb, dirs=False, protected_fn=None, on_evict=None):
+        self.name = name
+        self.path = path
+        self.quota_bytes = quota_mb * 1024 * 1024
+        self.dirs = dirs
+        self.protected_fn = protected_fn
+        self.on_evict = on_evict
+
+    def entries(self):
+        if not os.path.isdir(self.path):
+            return []
+        result = []
+        for entry in os.scandir(self.path):
+            if entry.name.startswith("."):
+                continue
+            try:
+                if self.dirs and entry.is_dir():
+                    size, last_access = _dir_usage(entry.path)
+                elif not self.dirs and entry.is_file():
+                    st = entry.stat()
+                    size, last_access = st.st_size, st.st_mtime
+                else:
+                    continue
+            except FileNotFoundError:
+                continue
+            result.append((entry.name, entry.path, size, last_access))
+        return result
+
+    def evict(self, name, path):
+        if self.on_evict:
+            self.on_evict(name)
+        elif self.dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.unlink(path)
+
+    def collect(self, now=None):
+        """쿼터를 넘는 만큼 LRU 순으로 삭제하고 영역 통계 반환"""
+        now = now or time.time()
+        entries = self.entries()
+        total = sum(e[2] for e in entries)
+        protected = self.protected_fn() if self.protected_fn else set()
+
+        evicted, freed = 0, 0
+        if total > self.quota_bytes:
+            for name, path, size, last_access in sorted(entries, key=lambda e: e[3]):
+                if total <= self.quota_bytes:
+                    break
+                if name in protected or now - last_access < DISK_GC_GRACE_SECONDS:
+                    continue
+                try:
+                    self.evict(name, path)
+                except OSError as e:
+                    log("WARN", f"GC 삭제 실패 {path}: {e}")
+                    continue
+                total -= size
+                freed += size
+                evicted += 1
+
+        return {
+            "bytes": total,
+            "items": len(entries) - evicted,
+            "quota_bytes": self.quota_bytes,
+            "protected": len(protected),
+            "evicted": evicted,
+            "freed_bytes": freed,
+        }
+
+
+def sweep_incoming(now=None):
+    """중단된 업로드가 남긴 임시 파일 정리"""
+    now = now or time.time()
+    incoming = os.path.join(UPLOADS_DIR, ".incoming")
+    removed = 0
+    if os.path.isdir(incoming):
+        for entry in os.scandir(incoming):
+            try:
+                if now - entry.stat().st_mtime > INCOMING_MAX_AGE:
+                    os.unlink(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
+
+
+def active_job_dirs(job_registry):
+    """진행 중인 작업 ID + 진행 중인 배치의 주제별 렌더 작업 ID (배치가 끝나야 zip 으로 묶이므로 그 전에 지우면 안 됨)"""
+    protected = set()
+    for job in job_registry.in_progress():
+        protected.add(job["id"])
+        for item in (job.get("result") or {}).get("items", []):
+            if item.get("job_id"):
+                protected.add(item["job_id"])
+            protected.update(slide.split("/", 1)[0] for slide in item.get("slides", []))
+    return protected
+
+
+def referenced_uploads(settings_path):
+    """히스토리 HTML 이 참조하는 업로드 파일명 집합"""
+    try:
+        with open(settings_path, "r", encoding="utf-8") as f:
+            return set(UPLOAD_REF_RE.findall(f.read()))
+    except FileNotFoundError:
+        return set()
+
+
+class DiskGC:
+    def __init__(self, areas, interval=DISK_GC_INTERVAL, stats_path=STATS_PATH):
+        self.areas = areas
+        self.interval = interval
+        self.stats_path = stats_path
+        self._lock_file = None
+
+    def run_once(self):
+        now = time.time()
+        started = time.monotonic()
+        report = {
+            "ran_at": now,
+            "areas": {area.name: area.collect(now) for area in self.areas},
+            "incoming_removed": sweep_incoming(now),
+        }
+        report["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        atomic_write_json(self.stats_path, report)
+        freed = sum(a["freed_bytes"] for a in report["areas"].values())
+        if freed:
+            log("INFO", f"디스크 정리: {freed / 1024 / 1024:.1f}MB 확보")
+        return report
+
+    def usage(self):
+        """현재 영역별 사용량 (삭제 없이 조회만)"""
+        result = {}
+        for area in self.areas:
+            entries = area.entries()
+            result[area.name] = {
+                "bytes": sum(e[2] for e in entries),
+                "items": len(entries),
+                "quota_bytes": area.quota_bytes,
+            }
+        return result
+
+    def stats(self):
+        return {"usage": self.usage(), "last_run": read_json(self.stats_path)}
+
+    async def run(self):
+        while True:
+            if self._lock_file is None:
+                self._lock_file = try_lock(self.stats_path)
+            if self._lock_file is not None:
+                try:
+                    await asyncio.to_thread(self.run_once)
+                except Exception as e:
+                    log("WARN", f"디스크 정리 실패: {e}")
+            await asyncio.sleep(self.interval)
+
+
+def default_gc(job_registry, settings_path):
+    return DiskGC([
+        Area("renders", job_registry.jobs_dir, RENDER_QUOTA_MB, dirs=True, on_evict=job_registry.delete,
+             protected_fn=lambda: active_job_dirs(job_registry)),
+        Area("uploads", UPLOADS_DIR, UPLOAD_QUOTA_MB, protected_fn=lambda: referenced_uploads(settings_path)),
+        Area("cache", os.path.join(TMP_DIR, "cache", "generations"), CACHE_QUOTA_MB),
+    ])
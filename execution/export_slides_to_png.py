@@ -4,60 +4,88 @@ import os
 import argparse
 import sys
 
-async def capture_slides(html_path):
-    output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".tmp", "slides")
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.metrics import span
+from execution.tracing import init_subprocess, log
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".tmp", "slides")
+
+async def capture_slides(html_path, output_dir=DEFAULT_OUTPUT_DIR, browser=None):
+    """슬라이드별 PNG 캡처. browser 를 넘기면 (서버의 브라우저 풀) 재사용하고, 없으면 새로 띄운다."""
     os.makedirs(output_dir, exist_ok=True)
     
     if not html_path.startswith("http://") and not html_path.startswith("https://") and not html_path.startswith("file://"):
         html_path = f"file://{os.path.abspath(html_path)}"
 
-    print(f"Opening: {html_path}")
+    log("INFO", f"Opening: {html_path}")
+
+    if browser is not None:
+        return await _capture_with_browser(browser, html_path, output_dir)
 
     async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        # Viewport for Instagram portrait format
+        with span("render_launch"):
+            browser = await p.chromium.launch()
+        try:
+            return await _capture_with_browser(browser, html_path, output_dir)
+        finally:
+            await browser.close()
+
+async def _capture_with_browser(browser, html_path, output_dir):
+    # Viewport for Instagram portrait format
+    with span("render_page"):
         page = await browser.new_page(viewport={"width": 1080, "height": 1350})
-        await page.goto(html_path, wait_until="networkidle")
-        await asyncio.sleep(2)
+    try:
+        with span("render_load"):
+            await page.goto(html_path, wait_until="networkidle")
+        with span("render_wait"):
+            await asyncio.sleep(2)
 
         # Find slides
         slides = await page.query_selector_all(".slide")
         count = 0
         
         if slides:
-            print(f"Found {len(slides)} slides.")
+            log("INFO", f"Found {len(slides)} slides.")
             for i, slide in enumerate(slides, 1):
                 out_path = os.path.join(output_dir, f"slide_{i:02d}.png")
-                await slide.screenshot(path=out_path)
-                print(f"Saved: {out_path}")
+                with span("render_screenshot"):
+                    await slide.screenshot(path=out_path)
+                log("INFO", f"Saved: {out_path}")
                 count += 1
         else:
-            print("No slides found with .slide class. Trying to find by ID...")
+            log("INFO", "No slides found with .slide class. Trying to find by ID...")
             for i in range(1, 11): # Try up to 10 slides
                 slide = await page.query_selector(f"#slide{i}")
                 if slide:
                     out_path = os.path.join(output_dir, f"slide_{i:02d}.png")
-                    await slide.screenshot(path=out_path)
-                    print(f"Saved: {out_path}")
+                    with span("render_screenshot"):
+                        await slide.screenshot(path=out_path)
+                    log("INFO", f"Saved: {out_path}")
                     count += 1
             
             if count == 0:
-                print("No slides found. Taking full page screenshot...", file=sys.stderr)
+                log("WARN", "No slides found. Taking full page screenshot...")
                 out_path = os.path.join(output_dir, "slide_page.png")
-                await page.screenshot(path=out_path, full_page=True)
+                with span("render_screenshot"):
+                    await page.screenshot(path=out_path, full_page=True)
                 count = 1
-
-        await browser.close()
+    finally:
+        await page.close()
     
-    print(f"Successfully processed {count} slides.")
+    log("INFO", f"Successfully processed {count} slides.")
+    return count
 
 if __name__ == "__main__":
+    init_subprocess()
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", required=True)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="PNG output directory")
     args = parser.parse_args()
     
     if not os.path.exists(args.input) and not args.input.startswith("http"):
-        print(f"Error: Input file '{args.input}' not found.", file=sys.stderr)
+        log("ERROR", f"Input file '{args.input}' not found.")
         sys.exit(1)
         
-    asyncio.run(capture_slides(args.input))
+    asyncio.run(capture_slides(args.input, args.output))
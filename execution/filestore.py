@@ -0,0 +1,97 @@
+"""
+여러 worker 프로세스가 공유하는 파일 상태를 안전하게 읽고 쓰기 위한 헬퍼
+
+- 쓰기: 같은 디렉토리의 임시 파일에 쓴 뒤 os.replace 로 교체 (읽는 쪽은 항상 완전한 파일만 봄)
+- 갱신: <path>.lock 에 대한 advisory lock (fcntl.flock) 으로 read-modify-write 직렬화
+- try_lock: 논블로킹 락 — 여러 worker 중 하나만 백그라운드 작업을 돌릴 때 사용
+"""
+import os
+import copy
+import json
+import tempfile
+from contextlib import contextmanager
+
+from execution.tracing import log
+
+try:
+    import fcntl
+except ImportError:  # Windows 로컬 개발 환경 — 단일 프로세스로만 실행된다고 가정
+    fcntl = None
+
+
+def _lock_path(path):
+    return path + ".lock"
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """path 에 대한 프로세스 간 advisory lock (블로킹)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(_lock_path(path), "a+") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def try_lock(path):
+    """논블로킹 배타 락. 획득하면 열린 파일 객체(보유 중 락 유지), 실패하면 None"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    lock_file = open(_lock_path(path), "a+")
+    if not fcntl:
+        return lock_file
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except OSError:
+        lock_file.close()
+        return None
+
+
+def atomic_write_text(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_json(path, data):
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except json.JSONDecodeError as e:
+        log("WARN", f"JSON 파싱 실패 ({path}): {e}")
+        return default
+
+
+def update_json(path, fn, default=None):
+    """락을 잡은 상태에서 JSON 을 읽고 fn(data) 로 수정한 뒤 원자적으로 저장.
+    fn 이 값을 반환하면 그 값을, None 이면 수정된 data 를 저장한다.
+    파일이 없으면 default 의 사본에서 시작 (fn 이 호출자의 default 객체를 바꾸지 않게)"""
+    with file_lock(path):
+        data = read_json(path)
+        if data is None:
+            data = {} if default is None else copy.deepcopy(default)
+        result = fn(data)
+        if result is not None:
+            data = result
+        atomic_write_json(path, data)
+        return data
@@ -2,16 +2,79 @@ import os
 import sys
 import argparse
 import json
-import re
+import time
+import threading
 import httpx
 from dotenv import load_dotenv
 
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution import deck_templates, html_extract, ollama_client
+from execution.metrics import record_provider_error, record_tokens, span
+from execution.rate_limit import PROVIDER_RETRY_DEADLINE, call_with_retry, estimate_tokens
+from execution.progress import emit
+from execution.tracing import log
+
 load_dotenv()
 
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "qwen2.5-coder:14b")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
+# provider 시도 순서 (쉼표 구분). 요청에서 provider 를 지정하면 그 provider 를 맨 앞으로
+PROVIDERS = ("gemini", "claude", "openai", "ollama")
+PROVIDER_ORDER = [p.strip() for p in os.environ.get("PROVIDER_ORDER", "gemini,claude,openai,ollama").split(",")
+                  if p.strip() in PROVIDERS]
+PROVIDER_LABELS = {"gemini": "Gemini", "claude": "Claude", "openai": "OpenAI", "ollama": "Ollama"}
+
+# html: LLM 이 덱 전체 HTML 을 작성 / structured: LLM 은 문구 JSON 만, 디자인은 로컬 템플릿(deck_templates)이 렌더
+GENERATION_MODES = ("html", "structured")
+GENERATION_MODE = os.environ.get("GENERATION_MODE", "html")
+# 잘린 응답에서 살린 덱에 모자란 슬라이드를 이어서 요청하는 최대 횟수 (0 이면 이어쓰기 안 함)
+HTML_CONTINUATION_ROUNDS = int(os.environ.get("HTML_CONTINUATION_ROUNDS", "2"))
+
+# provider 호출용 공유 HTTP 클라이언트 (keep-alive 로 요청마다 TLS 핸드셰이크 반복 방지)
+PROVIDER_HOSTS = [
+    "https://generativelanguage.googleapis.com",
+    "https://api.anthropic.com",
+    "https://api.openai.com",
+]
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def http_client():
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=120.0, limits=httpx.Limits(max_keepalive_connections=20))
+        return _http_client
+
+
+def warmup():
+    """서버 기동 직후 provider 호스트에 미리 연결해 두고 로컬 모델을 메모리에 올려 둠 (첫 생성 요청의 지연 제거)"""
+    client = http_client()
+    for host in PROVIDER_HOSTS:
+        try:
+            client.head(host, timeout=5.0)
+        except Exception as e:
+            log("WARN", f"warmup {host}: {e}")
+    if "ollama" in PROVIDER_ORDER:
+        ollama_client.warmup([OLLAMA_MODEL])
+
+
+def local_available():
+    """로컬 Ollama 생성 모델을 쓸 수 있는지 (API 키 없이도 생성 가능한지)"""
+    return ollama_client.available(OLLAMA_MODEL)
+
+
+def provider_order(preferred=None):
+    order = list(PROVIDER_ORDER)
+    if preferred in PROVIDERS:
+        order = [preferred] + [p for p in order if p != preferred]
+    return order
+
 # 예시 및 학습된 디자인 로드
 EXAMPLE_PATH = os.path.join(os.path.dirname(__file__), "examples", "sample_5slides.html")
 LEARNED_PATH = os.path.join(os.path.dirname(__file__), "learned_design.json")
@@ -24,12 +87,12 @@ DESIGN_SPECS = ""
 if os.path.exists(EXAMPLE_PATH):
     with open(EXAMPLE_PATH, "r", encoding="utf-8") as f:
         EXAMPLE_HTML = f.read()
-    print("[INFO] ✅ 예시 HTML 로드 완료", file=sys.stderr)
+    log("INFO", "✅ 예시 HTML 로드 완료")
 
 if os.path.exists(LEARNED_PATH):
     with open(LEARNED_PATH, "r", encoding="utf-8") as f:
         LEARNED_DESIGN = json.load(f)
-    print("[INFO] ✅ 학습된 디자인 노하우 로드 완료", file=sys.stderr)
+    log("INFO", "✅ 학습된 디자인 노하우 로드 완료")
 
 # 디렉티브 파일 로드 (바이럴 공식 + 디자인 스펙)
 viral_path = os.path.join(DIRECTIVES_DIR, "viral_card_news_formula.md")
@@ -38,12 +101,25 @@ design_path = os.path.join(DIRECTIVES_DIR, "design_specs.md")
 if os.path.exists(viral_path):
     with open(viral_path, "r", encoding="utf-8") as f:
         VIRAL_FORMULA = f.read()
-    print("[INFO] ✅ 바이럴 카드뉴스 공식 로드 완료", file=sys.stderr)
+    log("INFO", "✅ 바이럴 카드뉴스 공식 로드 완료")
 
 if os.path.exists(design_path):
     with open(design_path, "r", encoding="utf-8") as f:
         DESIGN_SPECS = f.read()
-    print("[INFO] ✅ 디자인 스펙 로드 완료", file=sys.stderr)
+    log("INFO", "✅ 디자인 스펙 로드 완료")
+
+
+# 바이럴 공식 요약 (핵심만)
+VIRAL_RULES = """
+=== 바이럴 카드뉴스 7가지 공식 (MUST APPLY) ===
+1. 커버 슬라이드: 3초 안에 시선 고정 → 숫자("N가지"), 질문형("왜 ~할까?"), 강한 키워드 사용. 호기심/두려움/욕망 중 하나 자극 필수.
+2. 한 장 = 하나의 메시지: 슬라이드당 하나의 핵심 포인트만. 텍스트 3줄 이내.
+3. 저장하고 싶은 실용 정보: 가이드, 체크리스트, HOW TO 형식. "완벽정리", "가이드" 키워드.
+4. 공감 구조: 문제 상황 → 해결책 구조. "내 얘기 같다" 감정 유발.
+5. 공유 요소: 친구에게 보내고 싶은 콘텐츠. 욕망 카테고리(건강/부/사랑/재미) 활용.
+6. 직관적 디자인: 핵심 키워드 중심, 깔끔한 레이아웃. 화려함보다 한눈에 이해 가능하게.
+7. CTA 필수: 마지막 슬라이드에 "저장해두세요", "팔로우하면 더 볼 수 있어요" 등 행동 유도 문구 포함.
+"""
 
 
 def build_prompt(text, slides=5, bg_image=None):
@@ -57,17 +133,7 @@ EXTRA DESIGN RULE (Priority 1):
 - CRITICAL: Use a sophisticated gradient overlay: `linear-gradient(rgba(0,0,0,0.5), rgba(0,0,0,0.7) 70%, #000 100%)` to ensure text blends perfectly.
 """
 
-    # 바이럴 공식 요약 (핵심만)
-    viral_rules = """
-=== 바이럴 카드뉴스 7가지 공식 (MUST APPLY) ===
-1. 커버 슬라이드: 3초 안에 시선 고정 → 숫자("N가지"), 질문형("왜 ~할까?"), 강한 키워드 사용. 호기심/두려움/욕망 중 하나 자극 필수.
-2. 한 장 = 하나의 메시지: 슬라이드당 하나의 핵심 포인트만. 텍스트 3줄 이내.
-3. 저장하고 싶은 실용 정보: 가이드, 체크리스트, HOW TO 형식. "완벽정리", "가이드" 키워드.
-4. 공감 구조: 문제 상황 → 해결책 구조. "내 얘기 같다" 감정 유발.
-5. 공유 요소: 친구에게 보내고 싶은 콘텐츠. 욕망 카테고리(건강/부/사랑/재미) 활용.
-6. 직관적 디자인: 핵심 키워드 중심, 깔끔한 레이아웃. 화려함보다 한눈에 이해 가능하게.
-7. CTA 필수: 마지막 슬라이드에 "저장해두세요", "팔로우하면 더 볼 수 있어요" 등 행동 유도 문구 포함.
-""" if VIRAL_FORMULA else ""
+    viral_rules = VIRAL_RULES if VIRAL_FORMULA else ""
 
     # 디자인 스펙 요약
     design_rules = """
@@ -143,38 +209,59 @@ CRITICAL: The user is seeing raw `**` symbols in the output. Replace them with p
 """
 
 
-def generate_with_ollama(text, slides=5, bg_image=None):
-    prompt = build_prompt(text, slides, bg_image)
+def build_content_prompt(text, slides=5):
+    """구조화 모드 프롬프트 — 예시 HTML/CSS 규칙 없이 문구만 요청 (출력은 수백 토큰의 JSON)"""
+    viral_rules = VIRAL_RULES if VIRAL_FORMULA else ""
+    body_slides = max(slides - 2, 1)
+    return f"""You are a top Korean Instagram card-news copywriter.
+Write ONLY the copy for a {slides}-slide card news deck: 1 cover slide, {body_slides} body slides, 1 CTA slide.
+Design and HTML are handled elsewhere — do NOT write HTML, CSS or markdown.
+{viral_rules}
+=== content source ===
+RESEARCH DATA: "{text}"
+
+=== output ===
+Return ONLY JSON in Korean:
+{{"hook": "cover badge keyword (max 12 chars)",
+  "title": "cover title with a hook (number/question/strong keyword)",
+  "emphasis": "word from the title to highlight",
+  "subtitle": "one line",
+  "slides": [{{"title": "one message", "emphasis": "word from the title",
+               "body": "max 3 short lines separated by \\n",
+               "points": ["optional, max 4"], "stat": {{"value": "optional key number", "label": "what it means"}}}}],
+  "cta": {{"title": "save/follow call to action", "items": ["recap, max 4"], "action": "short button text"}},
+  "brand": "short source/brand name or empty"}}
+- "slides" MUST contain exactly {body_slides} items.
+- Omit "points" or "stat" when they do not fit the slide.
+"""
+
+
+def generate_with_ollama(text, slides=5, bg_image=None, prompt=None, parse=None):
+    prompt = prompt or build_prompt(text, slides, bg_image)
+    parse = parse or extract_html
     try:
-        print(f"[INFO] Generating with {OLLAMA_MODEL}...", file=sys.stderr)
-        response = httpx.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json",
-                "options": {
-                    "temperature": 0.3,
-                    "num_predict": 16000,
-                }
-            },
-            timeout=300.0
-        )
-        response.raise_for_status()
-        raw = response.json().get("response", "").strip()
-        return extract_html(raw)
+        log("INFO", f"Generating with {OLLAMA_MODEL}...")
+        emit("provider_attempt", provider="ollama", model=OLLAMA_MODEL)
+        with span("llm_call", provider="ollama", model=OLLAMA_MODEL):
+            data = ollama_client.generate(
+                prompt, OLLAMA_MODEL,
+                options={"temperature": 0.3, "num_predict": 16000},
+            )
+        return parse(data.get("response", "").strip())
+    except ollama_client.OllamaBusy:
+        raise
     except Exception as e:
-        print(f"[ERROR] Ollama: {e}", file=sys.stderr)
+        log("ERROR", f"Ollama: {e}")
         return None
 
 
-def generate_with_gemini(text, slides=5, bg_image=None, api_key=None):
+def generate_with_gemini(text, slides=5, bg_image=None, api_key=None, prompt=None, parse=None):
     key = api_key or GEMINI_API_KEY
     if not key:
         return None
 
-    prompt = build_prompt(text, slides, bg_image)
+    prompt = prompt or build_prompt(text, slides, bg_image)
+    parse = parse or extract_html
 
     # SDK 버전 호환성 문제를 완전히 제거하기 위해 Gemini REST API 직접 호출
     # gemini-2.0-flash / gemini-2.0-flash-lite 는 v1beta 에서만 제공됨 (v1 미지원)
@@ -188,9 +275,13 @@ def generate_with_gemini(text, slides=5, bg_image=None, api_key=None):
     ]
 
     last_error_details = ""
+    # 429 재시도 대기는 모델 전체에 걸쳐 이 마감 시간 안에서만 (같은 모델로 기다렸다 재시도)
+    deadline = time.monotonic() + PROVIDER_RETRY_DEADLINE
+    prompt_tokens = estimate_tokens(prompt)
     for model_id in models_to_try:
         try:
-            print(f"[INFO] Attempting generation with {model_id} (Gemini REST v1beta)...", file=sys.stderr)
+            log("INFO", f"Attempting generation with {model_id} (Gemini REST v1beta)...")
+            emit("provider_attempt", provider="gemini", model=model_id)
             url = f"{GEMINI_REST_BASE}/{model_id}:generateContent"
 
             payload = {
@@ -202,19 +293,22 @@ def generate_with_gemini(text, slides=5, bg_image=None, api_key=None):
                 },
             }
 
-            resp = httpx.post(
-                url,
-                params={"key": key},
-                json=payload,
-                timeout=120.0,
-            )
+            with span("llm_call", provider="gemini", model=model_id):
+                resp = call_with_retry(
+                    "gemini", key,
+                    lambda: http_client().post(url, params={"key": key}, json=payload, timeout=120.0),
+                    tokens=prompt_tokens, deadline=deadline,
+                )
 
-            print(f"[DEBUG] {model_id} HTTP status={resp.status_code}", file=sys.stderr)
+            log("DEBUG", f"{model_id} HTTP status={resp.status_code}")
+            if resp.status_code != 200:
+                record_provider_error("gemini", resp.status_code)
+                emit("provider_failed", provider="gemini", model=model_id, status=resp.status_code)
 
             # 인증 오류 → 즉시 중단 (다른 모델을 시도해도 동일하게 실패)
             if resp.status_code in (401, 403):
                 err = f"{model_id}: 인증 실패 - API 키를 확인해주세요 (HTTP {resp.status_code})"
-                print(f"[ERROR] {err}", file=sys.stderr)
+                log("ERROR", err)
                 raise Exception(err)
 
             if resp.status_code != 200:
@@ -223,15 +317,17 @@ def generate_with_gemini(text, slides=5, bg_image=None, api_key=None):
                 except Exception:
                     err_msg = resp.text[:300]
                 err = f"{model_id}: HTTP {resp.status_code} - {err_msg}"
-                print(f"[WARN] {err}", file=sys.stderr)
+                log("WARN", err)
                 last_error_details = err
                 continue
 
             data = resp.json()
+            usage = data.get("usageMetadata", {})
+            record_tokens("gemini", usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0))
             candidates = data.get("candidates", [])
             if not candidates:
                 last_error_details = f"{model_id}: 응답에 candidates 없음"
-                print(f"[WARN] {last_error_details}", file=sys.stderr)
+                log("WARN", last_error_details)
                 continue
 
             raw_text = (
@@ -241,32 +337,25 @@ def generate_with_gemini(text, slides=5, bg_image=None, api_key=None):
                 .get("text", "")
             )
 
-            print(
-                f"[DEBUG] {model_id} response length={len(raw_text)}, "
-                f"preview={repr(raw_text[:100])}",
-                file=sys.stderr,
-            )
+            log("DEBUG", f"{model_id} response length={len(raw_text)}, preview={repr(raw_text[:100])}")
 
             if not raw_text:
                 finish_reason = candidates[0].get("finishReason", "UNKNOWN")
                 last_error_details = f"{model_id}: 빈 응답 (finishReason={finish_reason})"
-                print(f"[WARN] {last_error_details}", file=sys.stderr)
+                log("WARN", last_error_details)
                 continue
 
-            html = extract_html(raw_text.strip())
+            html = parse(raw_text.strip())
             if html:
-                print(f"[INFO] ✅ 생성 완료 ({model_id})", file=sys.stderr)
+                log("INFO", f"✅ 생성 완료 ({model_id})")
                 return html
             else:
-                print(
-                    f"[WARN] {model_id} HTML 추출 실패. raw={repr(raw_text[:200])}",
-                    file=sys.stderr,
-                )
+                log("WARN", f"{model_id} HTML 추출 실패. raw={repr(raw_text[:200])}")
                 last_error_details = f"{model_id}: JSON 파싱 실패 (응답길이={len(raw_text)})"
 
         except Exception as e:
             err_str = str(e)
-            print(f"[WARN] {model_id} failed: {err_str}", file=sys.stderr)
+            log("WARN", f"{model_id} failed: {err_str}")
             last_error_details = f"{model_id}: {err_str}"
             # 인증 실패는 즉시 중단
             if "인증 실패" in err_str or "API_KEY_INVALID" in err_str:
@@ -276,12 +365,13 @@ def generate_with_gemini(text, slides=5, bg_image=None, api_key=None):
     raise Exception(f"AI 서비스 호출 실패: {last_error_details}")
 
 
-def generate_with_claude(text, slides=5, bg_image=None, api_key=None):
+def generate_with_claude(text, slides=5, bg_image=None, api_key=None, prompt=None, parse=None):
     if not api_key:
         return None
     try:
-        print(f"[INFO] Claude (Sonnet 3.5) generating...", file=sys.stderr)
-        prompt = build_prompt(text, slides, bg_image)
+        log("INFO", f"Claude (Sonnet 3.5) generating...")
+        emit("provider_attempt", provider="claude", model="claude-3-5-sonnet-20240620")
+        prompt = prompt or build_prompt(text, slides, bg_image)
         headers = {
             "x-api-key": api_key,
             "anthropic-version": "2023-06-01",
@@ -292,20 +382,31 @@ def generate_with_claude(text, slides=5, bg_image=None, api_key=None):
             "max_tokens": 8000,
             "messages": [{"role": "user", "content": prompt}]
         }
-        response = httpx.post("https://api.anthropic.com/v1/messages", headers=headers, json=data, timeout=120.0)
+        with span("llm_call", provider="claude", model=data["model"]):
+            response = call_with_retry(
+                "claude", api_key,
+                lambda: http_client().post("https://api.anthropic.com/v1/messages", headers=headers, json=data, timeout=120.0),
+                tokens=estimate_tokens(prompt),
+            )
+        if response.status_code != 200:
+            record_provider_error("claude", response.status_code)
         response.raise_for_status()
-        content = response.json()["content"][0]["text"]
-        return extract_html(content)
+        body = response.json()
+        usage = body.get("usage", {})
+        record_tokens("claude", usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        content = body["content"][0]["text"]
+        return (parse or extract_html)(content)
     except Exception as e:
-        print(f"[ERROR] Claude error: {e}", file=sys.stderr)
+        log("ERROR", f"Claude error: {e}")
         return None
 
-def generate_with_openai(text, slides=5, bg_image=None, api_key=None):
+def generate_with_openai(text, slides=5, bg_image=None, api_key=None, prompt=None, parse=None):
     if not api_key:
         return None
     try:
-        print(f"[INFO] OpenAI (GPT-4o) generating...", file=sys.stderr)
-        prompt = build_prompt(text, slides, bg_image)
+        log("INFO", f"OpenAI (GPT-4o) generating...")
+        emit("provider_attempt", provider="openai", model="gpt-4o")
+        prompt = prompt or build_prompt(text, slides, bg_image)
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -315,97 +416,123 @@ def generate_with_openai(text, slides=5, bg_image=None, api_key=None):
             "messages": [{"role": "user", "content": prompt}],
             "response_format": { "type": "json_object" }
         }
-        response = httpx.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data, timeout=120.0)
+        with span("llm_call", provider="openai", model=data["model"]):
+            response = call_with_retry(
+                "openai", api_key,
+                lambda: http_client().post("https://api.openai.com/v1/chat/completions", headers=headers, json=data, timeout=120.0),
+                tokens=estimate_tokens(prompt),
+            )
+        if response.status_code != 200:
+            record_provider_error("openai", response.status_code)
         response.raise_for_status()
-        content = response.json()["choices"][0]["message"]["content"]
-        return extract_html(content)
+        body = response.json()
+        usage = body.get("usage", {})
+        record_tokens("openai", usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        content = body["choices"][0]["message"]["content"]
+        return (parse or extract_html)(content)
     except Exception as e:
-        print(f"[ERROR] OpenAI error: {e}", file=sys.stderr)
+        log("ERROR", f"OpenAI error: {e}")
         return None
 
 # DeepSeek removed
 
 def extract_html(raw):
-    try:
-        if "```json" in raw:
-            m = re.search(r'```json\s*(.*?)\s*```', raw, re.DOTALL)
-            if m:
-                raw = m.group(1)
-        if not (raw.startswith("{") and raw.endswith("}")):
-            s, e = raw.find("{"), raw.rfind("}")
-            if s != -1 and e != -1:
-                raw = raw[s:e+1]
-        return json.loads(raw).get("html", "")
-    except Exception as e:
-        print(f"[ERROR] JSON parse: {e}", file=sys.stderr)
-        return None
+    # 출력 한도에 걸려 잘린 응답도 완성된 슬라이드까지는 살림 (html_extract)
+    with span("extract_html"):
+        return html_extract.extract_html(raw)
 
 
-def generate_html(text, slides=5, bg_image=None, gemini_key=None, claude_key=None, openai_key=None, deepseek_key=None):
-    # 우선순위: 제미나이 -> 클로드 -> 오픈AI
-    # 각 provider는 독립적으로 try/except 처리 → 하나 실패해도 다음 provider로 폴백
-    # 모든 실패 시 실제 오류 원인을 포함한 에러를 던져 진단 가능하게 함
-
-    provider_errors = []  # 각 provider의 실제 오류를 수집
-
-    # 1. GEMINI
-    g_key = gemini_key or GEMINI_API_KEY
-    if g_key:
+def extract_content(raw):
+    """구조화 모드 응답 → 정리된 콘텐츠 dict (deck_templates.normalize_content). 실패하면 None"""
+    with span("extract_content"):
         try:
-            html = generate_with_gemini(text, slides, bg_image, api_key=g_key)
-            if html:
-                print("[INFO] ✅ 생성 완료 (Gemini)", file=sys.stderr)
-                return html
-            else:
-                provider_errors.append("Gemini: 응답 파싱 실패 (HTML 없음)")
-                print("[WARN] Gemini: 응답에서 HTML 추출 실패", file=sys.stderr)
+            # 잘린 문구를 중간에서 닫지 않음 — 마지막으로 완성된 항목까지만
+            return deck_templates.normalize_content(html_extract.parse_json(raw, partial_strings=False))
         except Exception as e:
-            err = str(e)
-            provider_errors.append(f"Gemini: {err}")
-            print(f"[WARN] Gemini 실패, 다음 provider로 폴백: {err}", file=sys.stderr)
-    else:
-        provider_errors.append("Gemini: API 키 없음")
-
-    # 2. CLAUDE
-    if claude_key:
+            log("ERROR", f"콘텐츠 JSON 파싱: {e}")
+            return None
+
+
+def complete_missing(name, call, html, text, slides):
+    """잘린 응답에서 살린 덱에 모자란 뒷부분 슬라이드만 같은 provider 로 이어서 생성 (덱 전체 재생성 대신)"""
+    for _ in range(HTML_CONTINUATION_ROUNDS):
+        missing = html_extract.missing_slides(html, slides)
+        if not missing:
+            break
+        log("WARN", f"{PROVIDER_LABELS[name]}: 슬라이드 {missing} 누락 → 뒷부분만 이어서 요청")
+        emit("continuation", provider=name, missing=missing)
         try:
-            html = generate_with_claude(text, slides, bg_image, api_key=claude_key)
-            if html:
-                print("[INFO] ✅ 생성 완료 (Claude)", file=sys.stderr)
-                return html
-            else:
-                provider_errors.append("Claude: 응답 파싱 실패")
+            with span("continuation", provider=name):
+                fragments = call(prompt=html_extract.continuation_prompt(html, text, slides),
+                                 parse=html_extract.extract_slides)
         except Exception as e:
-            err = str(e)
-            provider_errors.append(f"Claude: {err}")
-            print(f"[WARN] Claude 실패, 다음 provider로 폴백: {err}", file=sys.stderr)
+            log("WARN", f"이어쓰기 실패: {e}")
+            break
+        if not fragments:
+            break
+        html = html_extract.append_slides(html, fragments[:len(missing)])
+    return html
+
+
+def generate_html(text, slides=5, bg_image=None, gemini_key=None, claude_key=None, openai_key=None, deepseek_key=None,
+                  provider=None, mode=None, template=None):
+    # 우선순위: PROVIDER_ORDER (기본 제미나이 -> 클로드 -> 오픈AI -> 로컬 Ollama), provider 지정 시 그 provider 먼저
+    # 각 provider는 독립적으로 try/except 처리 → 하나 실패해도 다음 provider로 폴백
+    # 모든 실패 시 실제 오류 원인을 포함한 에러를 던져 진단 가능하게 함
+    # structured 모드: 같은 provider 폴백 경로로 문구 JSON 만 받고 HTML 은 로컬 템플릿으로 렌더
+    structured = (mode or GENERATION_MODE) == "structured"
+    if structured:
+        deck_templates.load_template(template)  # 없는 템플릿이면 LLM 호출 전에 실패
+        options = {"prompt": build_content_prompt(text, slides), "parse": extract_content}
     else:
-        provider_errors.append("Claude: API 키 없음")
+        options = {}
+    keys = {"gemini": gemini_key or GEMINI_API_KEY, "claude": claude_key, "openai": openai_key}
+    callers = {
+        "gemini": lambda **kw: generate_with_gemini(text, slides, bg_image, api_key=keys["gemini"], **kw),
+        "claude": lambda **kw: generate_with_claude(text, slides, bg_image, api_key=keys["claude"], **kw),
+        "openai": lambda **kw: generate_with_openai(text, slides, bg_image, api_key=keys["openai"], **kw),
+        "ollama": lambda **kw: generate_with_ollama(text, slides, bg_image, **kw),
+    }
 
-    # 3. OPENAI
-    if openai_key:
+    provider_errors = []  # 각 provider의 실제 오류를 수집
+    attempted = False
+    for name in provider_order(provider):
+        label = PROVIDER_LABELS[name]
+        if name == "ollama":
+            if not local_available():
+                provider_errors.append(f"Ollama: 서버 또는 모델({OLLAMA_MODEL}) 없음")
+                continue
+        elif not keys[name]:
+            provider_errors.append(f"{label}: API 키 없음")
+            continue
+        attempted = True
         try:
-            html = generate_with_openai(text, slides, bg_image, api_key=openai_key)
+            html = callers[name](**options)
+            if html and structured:
+                with span("render_template"):
+                    html = deck_templates.render(html, template, bg_image)
+            elif html:
+                html = complete_missing(name, callers[name], html, text, slides)
             if html:
-                print("[INFO] ✅ 생성 완료 (OpenAI)", file=sys.stderr)
+                log("INFO", f"✅ 생성 완료 ({label})")
+                emit("html_parsed", provider=name, chars=len(html))
                 return html
-            else:
-                provider_errors.append("OpenAI: 응답 파싱 실패")
+            provider_errors.append(f"{label}: 응답 파싱 실패 (HTML 없음)")
+            log("WARN", f"{label}: 응답에서 HTML 추출 실패")
         except Exception as e:
             err = str(e)
-            provider_errors.append(f"OpenAI: {err}")
-            print(f"[WARN] OpenAI 실패: {err}", file=sys.stderr)
-    else:
-        provider_errors.append("OpenAI: API 키 없음")
+            provider_errors.append(f"{label}: {err}")
+            log("WARN", f"{label} 실패, 다음 provider로 폴백: {err}")
+            emit("fallback", provider=name, error=err[:300])
 
-    # 모든 시도가 실패한 경우 — 실제 오류 원인 포함
-    if not any([g_key, claude_key, openai_key]):
+    # 시도할 수 있는 provider 가 하나도 없는 경우
+    if not attempted:
         raise Exception("설정된 AI API 키가 없습니다. 설정 탭에서 API 키를 입력해주세요.")
 
     # 실제 provider 오류 원인을 에러에 포함 (진단용)
     error_detail = " | ".join(provider_errors)
     final_msg = f"모든 AI 서비스 호출에 실패했습니다. [{error_detail}]"
-    print(f"[ERROR] {final_msg}", file=sys.stderr)
+    log("ERROR", final_msg)
     raise Exception(final_msg)
 
 
@@ -414,5 +541,9 @@ if __name__ == "__main__":
     parser.add_argument("--text", required=True)
     parser.add_argument("--slides", type=int, default=5)
     parser.add_argument("--bg_image", default=None)
+    parser.add_argument("--provider", choices=PROVIDERS, default=None)
+    parser.add_argument("--mode", choices=GENERATION_MODES, default=None)
+    parser.add_argument("--template", default=None)
     args = parser.parse_args()
-    print(generate_html(args.text, args.slides, args.bg_image))
+    print(generate_html(args.text, args.slides, args.bg_image, provider=args.provider,
+                        mode=args.mode, template=args.template))
@@ -2,23 +2,49 @@ import os
 import sys
 import argparse
 import json
-import re
-import httpx
 from dotenv import load_dotenv
 
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution import ollama_client
+from execution.deck import slide_texts
+from execution.html_extract import parse_json
+from execution.metrics import span
+from execution.rate_limit import call_with_retry, estimate_tokens
+from execution.tracing import log
+
 load_dotenv()
 
-OLLAMA_BASE_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gemma3:12b")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+CAPTION_MAX_CHARS = int(os.environ.get("CAPTION_MAX_CHARS", "4000"))
+
+
+def caption_source(html_text):
+    """HTML 덱 → 슬라이드별 텍스트 ("[1] ..." 형식)
+
+    인라인 CSS 덱은 앞부분 대부분이 스타일 선언이라, HTML 을 그대로 잘라 보내면
+    토큰만 쓰고 내용은 거의 전달되지 않는다. 보이는 텍스트만 추려서 프롬프트에 넣는다.
+    """
+    if "<" not in html_text:
+        return html_text[:CAPTION_MAX_CHARS]
+    texts = slide_texts(html_text)
+    return "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts, 1) if text)[:CAPTION_MAX_CHARS]
+
 
+def _seed_line(seed_hashtags):
+    if not seed_hashtags:
+        return ""
+    return f"\nCANDIDATE HASHTAGS (ranked from our past posts and trends — keep the relevant ones, add more if needed):\n{seed_hashtags}\n"
 
-def generate_caption_with_ollama(html_text):
-    prompt = f"""You are an Instagram marketing expert. Analyze this Instagram Card News HTML and generate Korean captions and hashtags.
 
-HTML CONTENT:
-{html_text[:3000]}
+def generate_caption_with_ollama(source, seed_hashtags=None):
+    prompt = f"""You are an Instagram marketing expert. Read the text of this Instagram Card News deck (one block per slide) and generate Korean captions and hashtags.
 
+SLIDE TEXT:
+{source}
+{_seed_line(seed_hashtags)}
 Generate:
 1. A compelling Korean Instagram caption (2-3 paragraphs, engaging tone)
 2. 20-30 relevant Korean hashtags
@@ -29,76 +55,70 @@ Output ONLY valid JSON:
   "hashtags": "#해시태그1 #해시태그2 ..."
 }}"""
 
+    if not ollama_client.available(OLLAMA_MODEL):
+        return None
     try:
-        response = httpx.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json",
-                "options": {"temperature": 0.7, "num_predict": 2000}
-            },
-            timeout=120.0
-        )
-        response.raise_for_status()
-        result = response.json()
-        raw = result.get("response", "").strip()
-
-        if "```json" in raw:
-            match = re.search(r'```json\s*(.*?)\s*```', raw, re.DOTALL)
-            if match:
-                raw = match.group(1)
-        elif not (raw.startswith("{") and raw.endswith("}")):
-            start, end = raw.find("{"), raw.rfind("}")
-            if start != -1 and end != -1:
-                raw = raw[start:end+1]
-
-        return json.loads(raw)
+        with span("caption_call", provider="ollama", model=OLLAMA_MODEL):
+            result = ollama_client.generate(
+                prompt, OLLAMA_MODEL,
+                options={"temperature": 0.7, "num_predict": 2000},
+                timeout=120.0,
+            )
+        return parse_json(result.get("response", ""))
     except Exception as e:
-        print(f"Ollama error: {e}", file=sys.stderr)
+        log("ERROR", f"Ollama error: {e}")
         return None
 
 
-def generate_caption_with_gemini(html_text):
+def generate_caption_with_gemini(source, api_key=None, seed_hashtags=None):
+    key = api_key or GEMINI_API_KEY
     try:
         from google import genai
         from google.genai import types
 
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        prompt = f"""Analyze this Instagram Card News HTML and generate Korean caption and hashtags.
-HTML: {html_text[:3000]}
-Output ONLY JSON: {{"caption": "...", "hashtags": "#..."}}"""
-
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-lite",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                temperature=0.7,
-            )
+        client = genai.Client(api_key=key)
+        prompt = f"""Read the text of this Instagram Card News deck (one block per slide) and generate a Korean caption (2-3 paragraphs) and 20-30 Korean hashtags.
+SLIDE TEXT:
+{source}
+{_seed_line(seed_hashtags)}Output ONLY JSON: {{"caption": "...", "hashtags": "#..."}}"""
+
+        response = call_with_retry(
+            "gemini", key,
+            lambda: client.models.generate_content(
+                model="gemini-2.0-flash-lite",
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    temperature=0.7,
+                )
+            ),
+            tokens=estimate_tokens(prompt),
         )
-        return json.loads(response.text.strip())
+        return parse_json(response.text)
     except Exception as e:
-        print(f"Gemini error: {e}", file=sys.stderr)
+        log("ERROR", f"Gemini error: {e}")
         return None
 
 
-def generate_caption(html_text):
-    print("[INFO] Generating caption with Ollama...", file=sys.stderr)
-    result = generate_caption_with_ollama(html_text)
+def generate_caption(html_text, api_key=None, seed_hashtags=None):
+    """캡션 + 해시태그 생성. seed_hashtags 는 로컬 해시태그 엔진(hashtag_index)의 추천 — 프롬프트 후보로 전달"""
+    source = caption_source(html_text)
+    if not source.strip():
+        raise Exception("Caption generation failed: no text in deck.")
+    log("INFO", f"Generating caption with Ollama... ({len(source)} chars of slide text)")
+    result = generate_caption_with_ollama(source, seed_hashtags)
     if result:
-        print("[INFO] Caption generation succeeded!", file=sys.stderr)
+        log("INFO", "Caption generation succeeded!")
         return result
 
-    if GEMINI_API_KEY:
-        print("[INFO] Trying Gemini fallback...", file=sys.stderr)
-        result = generate_caption_with_gemini(html_text)
+    if api_key or GEMINI_API_KEY:
+        log("INFO", "Trying Gemini fallback...")
+        result = generate_caption_with_gemini(source, api_key, seed_hashtags)
         if result:
             return result
 
-    print("Error: Caption generation failed.", file=sys.stderr)
-    sys.exit(1)
+    # 서버 안에서 호출되므로 sys.exit 대신 예외로 알림 (CLI 는 __main__ 에서 종료 코드 처리)
+    raise Exception("Caption generation failed.")
 
 
 if __name__ == "__main__":
@@ -112,5 +132,9 @@ if __name__ == "__main__":
     else:
         html_text = args.html
 
-    result = generate_caption(html_text)
+    try:
+        result = generate_caption(html_text)
+    except Exception as e:
+        log("ERROR", f"Error: {e}")
+        sys.exit(1)
     print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,97 @@
+"""
+생성 결과 캐시 (worker 간 공유, .tmp/cache/generations)
+
+- research: 주제별 리서치 결과 — TTL 동안 여러 요청이 재사용
+- deck: (주제, 슬라이드 수) 별로 미리 생성된 카드뉴스 HTML — 한 번 꺼내면 삭제(take)
+  같은 덱이 여러 유저에게 중복 배포되지 않도록 1회용으로 둔다.
+  꺼내기는 os.rename 으로 선점하므로 여러 worker 가 동시에 요청해도 한 곳에만 전달된다.
+- caption: 덱 본문 텍스트 해시별 캡션/해시태그 — 스타일만 바뀐 덱은 같은 캡션을 재사용
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+
+from execution.filestore import atomic_write_json, read_json
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(WORKSPACE, ".tmp", "cache", "generations")
+GENERATION_CACHE_TTL = int(os.environ.get("GENERATION_CACHE_TTL", str(12 * 3600)))
+RESEARCH_CACHE_TTL = int(os.environ.get("RESEARCH_CACHE_TTL", str(6 * 3600)))
+CAPTION_CACHE_TTL = int(os.environ.get("CAPTION_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def normalize_topic(topic):
+    return re.sub(r"\s+", " ", (topic or "").strip()).lower()
+
+
+def _path(kind, *parts):
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(CACHE_DIR, f"{kind}-{digest}.json")
+
+
+def _fresh(entry, ttl):
+    return bool(entry) and time.time() - entry.get("created_at", 0) < ttl
+
+
+# ── 리서치 ────────────────────────────────────────────────────────────────
+def get_research(topic):
+    entry = read_json(_path("research", normalize_topic(topic)))
+    return entry["text"] if _fresh(entry, RESEARCH_CACHE_TTL) else None
+
+
+def put_research(topic, text):
+    if text and normalize_topic(text) != normalize_topic(topic):  # 리서치 실패 시 원문이 그대로 반환됨 → 저장 안 함
+        atomic_write_json(_path("research", normalize_topic(topic)), {"topic": topic, "text": text, "created_at": time.time()})
+
+
+# ── 완성 덱 ───────────────────────────────────────────────────────────────
+def has_deck(topic, slides):
+    return _fresh(read_json(_path("deck", normalize_topic(topic), slides)), GENERATION_CACHE_TTL)
+
+
+def put_deck(topic, slides, html, source="speculative", tokens=0):
+    atomic_write_json(_path("deck", normalize_topic(topic), slides), {
+        "topic": topic,
+        "slides": slides,
+        "html": html,
+        "source": source,
+        "tokens": tokens,
+        "created_at": time.time(),
+    })
+
+
+def take_deck(topic, slides):
+    """캐시된 덱을 꺼내고 삭제. 없거나 만료됐으면 None"""
+    path = _path("deck", normalize_topic(topic), slides)
+    claimed = f"{path}.{uuid.uuid4().hex}.claim"
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return None
+    try:
+        with open(claimed, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    finally:
+        if os.path.exists(claimed):
+            os.unlink(claimed)
+    return entry if _fresh(entry, GENERATION_CACHE_TTL) else None
+
+
+# ── 캡션 ──────────────────────────────────────────────────────────────────
+def caption_key(source):
+    """캡션 프롬프트에 들어가는 덱 텍스트 기준 키"""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+
+def get_caption(key):
+    entry = read_json(_path("caption", key))
+    return entry["result"] if _fresh(entry, CAPTION_CACHE_TTL) else None
+
+
+def put_caption(key, result):
+    atomic_write_json(_path("caption", key), {"result": result, "created_at": time.time()})
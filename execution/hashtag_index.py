@@ -0,0 +1,271 @@
+"""
+로컬 해시태그 엔진 — LLM 호출 없이 덱 텍스트에서 해시태그 추천
+
+- 토크나이저: 한글 어절에서 조사/어미를 떼고 불용어를 걸러 명사 위주의 키워드를 남김
+  붙어 나오는 두 키워드는 합성어 후보로도 만든다 ("부채 비율" → "부채비율", 해시태그는 띄어쓰기가 없으므로)
+- 인덱스(.tmp/cache/hashtag_index.json): 문서 빈도(df) + 해시태그별 인기 가중치
+  출처는 공개되는 자료만 — 생성된 캡션의 해시태그와 실시간 트렌드 피드 (모든 유저가 같은 인덱스를 씀)
+- 유저 히스토리 키워드는 공용 인덱스에 넣지 않고, 요청한 유저 본인의 것만 personal 가중치로 그때그때 더함
+- 추천: 덱 키워드의 TF-IDF 점수 × 인덱스 인기 가중치, 접두사 트라이로 "재테크" → "재테크공부" 같은 확장 태그도 후보에 포함
+- 인덱스 파일은 HASHTAG_INDEX_TTL 마다 다시 만들고, 다른 worker 가 만든 파일은 mtime 으로 감지해 다시 읽음
+"""
+import os
+import re
+import glob
+import math
+import time
+import threading
+from collections import Counter
+
+from execution.deck import slide_texts
+from execution.filestore import atomic_write_json, read_json
+from execution.tracing import log
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HASHTAG_INDEX_PATH = os.path.join(WORKSPACE, ".tmp", "cache", "hashtag_index.json")
+HASHTAG_INDEX_TTL = int(os.environ.get("HASHTAG_INDEX_TTL", "3600"))  # 초
+HASHTAG_LIMIT = int(os.environ.get("HASHTAG_LIMIT", "25"))
+
+# 출처별 인기 가중치
+CAPTION_TAG_WEIGHT = 3.0
+HISTORY_TERM_WEIGHT = 1.0
+TREND_WEIGHT = 5.0
+PREFIX_PENALTY = 0.6  # 접두사로 확장된 태그는 키워드 자체보다 약간 낮게
+PREFIX_FANOUT = 5     # 키워드당 확장 태그 최대 개수
+COMPOUND_PENALTY = 0.7  # 인덱스에 없는 합성어 후보는 단일 키워드보다 낮게
+
+_JOSA = sorted("""
+은 는 이 가 을 를 의 에 에서 에게 께 한테 으로 로 와 과 도 만 까지 부터 보다 처럼 마다 이나 나 랑 이랑 하고
+이다 입니다 이에요 예요 이며 이고 으로서 로서 으로써 로써 에는 에도 에서도 에서는 으로는 로는 과의 와의 들 들은 들이 들을
+하는 하고 하여 해서 했다 합니다 한다 해요 하기 하면 하게 된 되는 된다 됩니다 적인 적으로 스러운
+""".split(), key=len, reverse=True)
+
+_STOPWORDS = set("""
+것 수 등 및 더 또 또는 그 이 저 뒤에 앞에 위에 안에 그리고 하지만 그러나 그래서 따라서 때문 위해 위한 통해 대한 대해 관련
+정말 가장 매우 너무 아주 모든 모든것 각 중 전 후 내 외 곳 때 점 명 개 년 월 일 시 분 초 번 장
+오늘 지금 이번 최근 우리 여러분 당신 나 너 저희 누구 무엇 어떤 어떻게 왜 있다 없다 있는 없는 같은 같다
+이것 그것 저것 여기 거기 하나 두 세 네 다섯 보기 확인 시작 방법 이유 정도 경우 부분 내용 다음 이상 이하
+저장 팔로우 공유 댓글 좋아요 클릭 링크 프로필 dm DM
+""".split())
+
+_WORD_RE = re.compile(r"[0-9A-Za-z가-힣]+")
+_VERB_END_RE = re.compile(r"(?:습니다|니다|어요|아요|세요|해요|했다|한다|하다|된다|이다|있다|없다|였다|겠다|는다|었다|았다)$")
+_HASHTAG_RE = re.compile(r"#([0-9A-Za-z가-힣_]+)")
+
+
+# ── 토크나이저 ────────────────────────────────────────────────────────────
+def _strip_josa(word):
+    for suffix in _JOSA:
+        if len(word) > len(suffix) + 1 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """키워드 목록 (문장 순서 유지). 한글은 조사/어미 제거 후 2글자 이상, 영문은 2글자 이상"""
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        if word[0].isdigit():  # 숫자/수량 표현 ("3배", "35만주")
+            continue
+        if re.search(r"[가-힣]", word):
+            if _VERB_END_RE.search(word):  # 서술어
+                continue
+            word = _strip_josa(word)
+            if len(word) < 2:
+                continue
+        elif len(word) < 2:
+            continue
+        else:
+            word = word.lower()
+        if word in _STOPWORDS or word.lower() in _STOPWORDS:
+            continue
+        tokens.append(word)
+    return tokens
+
+
+def terms(text):
+    """TF 계산용 용어 목록 — 단일 키워드 + 인접한 한글 키워드 합성어"""
+    out = []
+    for line in (text or "").split("\n"):
+        tokens = tokenize(line)
+        out.extend(tokens)
+        for a, b in zip(tokens, tokens[1:]):
+            if re.fullmatch(r"[가-힣]+", a + b) and len(a + b) <= 10:
+                out.append(a + b)
+    return out
+
+
+def normalize_tag(tag):
+    return re.sub(r"\s+", "", tag.lstrip("#")).lower()
+
+
+# ── 접두사 트라이 ─────────────────────────────────────────────────────────
+class PrefixTrie:
+    """노드마다 그 접두사로 시작하는 상위 태그를 미리 모아 둬 조회가 접두사 길이에만 비례"""
+
+    TOP_K = 20
+
+    def __init__(self, weights):
+        self.root = {}
+        for tag, weight in sorted(weights.items(), key=lambda kv: -kv[1]):
+            node = self.root
+            for ch in tag:
+                node = node.setdefault(ch, {})
+                top = node.setdefault("", [])
+                if len(top) < self.TOP_K:
+                    top.append(tag)
+
+    def complete(self, prefix, limit=10):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        return node.get("", [])[:limit]
+
+
+# ── 인덱스 ────────────────────────────────────────────────────────────────
+def collect_sources(trends, caption_dir):
+    """공용 인덱스 재료: (문서 텍스트 목록, {태그: 가중치})"""
+    docs, weights = [], Counter()
+
+    for path in glob.glob(os.path.join(caption_dir, "caption-*.json")):
+        result = (read_json(path) or {}).get("result") or {}
+        docs.append(result.get("caption") or "")
+        for tag in _HASHTAG_RE.findall(result.get("hashtags") or ""):
+            weights[normalize_tag(tag)] += CAPTION_TAG_WEIGHT
+
+    for rank, trend in enumerate(trends or []):
+        boost = TREND_WEIGHT * (1 - rank / max(1, len(trends)))
+        docs.append(trend)
+        weights[normalize_tag(trend)] += boost
+        for term in tokenize(trend):
+            weights[term] += boost / 2
+    return docs, weights
+
+
+def history_weights(history):
+    """한 유저의 히스토리 → {키워드: 가중치} (그 유저의 요청에만 쓰는 personal 가중치)"""
+    weights = Counter()
+    for entry in history or []:
+        text = "\n".join([entry.get("text") or ""] + slide_texts(entry.get("html") or ""))
+        for term in set(tokenize(text)):
+            weights[term] += HISTORY_TERM_WEIGHT
+    return weights
+
+
+def build_index(docs, weights):
+    df = Counter()
+    for doc in docs:
+        df.update(set(terms(doc)))
+    return {
+        "built_at": time.time(),
+        "doc_count": len(docs),
+        "df": dict(df),
+        "tags": {tag: round(w, 3) for tag, w in weights.items() if tag},
+    }
+
+
+class HashtagIndex:
+    def __init__(self, path=HASHTAG_INDEX_PATH, ttl=HASHTAG_INDEX_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._data = {"built_at": 0, "doc_count": 0, "df": {}, "tags": {}}
+        self._trie = PrefixTrie({})
+        self._mtime = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _load(self):
+        """다른 worker 가 다시 만든 인덱스 파일이 있으면 읽어 트라이 재구성"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        data = read_json(self.path)
+        if data:
+            self._data, self._trie, self._mtime = data, PrefixTrie(data.get("tags", {})), mtime
+
+    def stale(self):
+        self._load()
+        return time.time() - self._data.get("built_at", 0) > self.ttl
+
+    def rebuild(self, trends, caption_dir):
+        with self._lock:
+            started = time.perf_counter()
+            data = build_index(*collect_sources(trends, caption_dir))
+            atomic_write_json(self.path, data)
+            self._data, self._trie = data, PrefixTrie(data["tags"])
+            self._mtime = os.stat(self.path).st_mtime
+            log("INFO", f"해시태그 인덱스 재구성: 문서 {data['doc_count']}개, 태그 {len(data['tags'])}개 "
+                        f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+    def refresh_if_stale(self, sources_fn):
+        """TTL 이 지났으면 sources_fn() → (trends, caption_dir) 로 다시 만듦
+
+        이미 다른 스레드가 만드는 중이면 기다리지 않고 기존 인덱스로 바로 답한다.
+        """
+        if not self.stale() or not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if self.stale():
+                self.rebuild(*sources_fn())
+        finally:
+            self._refresh_lock.release()
+
+    def _complete(self, prefix, limit, personal):
+        """공용 트라이 결과 + personal 태그 중 접두사가 맞는 것, 합친 가중치 순"""
+        found = self._trie.complete(prefix, max(limit, PrefixTrie.TOP_K))
+        if not personal:
+            return found[:limit]
+        tags = self._data.get("tags", {})
+        found += [tag for tag in personal if tag.startswith(prefix) and tag not in found]
+        return sorted(found, key=lambda tag: -(tags.get(tag, 0) + personal.get(tag, 0)))[:limit]
+
+    def complete(self, prefix, limit=10, personal=None):
+        """접두사 자동완성 (인기순). personal: 요청한 유저의 history_weights()"""
+        self._load()
+        return self._complete(normalize_tag(prefix), limit, personal)
+
+    def suggest(self, text, limit=HASHTAG_LIMIT, personal=None):
+        """텍스트 → 순위가 매겨진 해시태그 [(태그, 점수)]
+
+        빈 줄로 구분된 블록(슬라이드)이 3개 이상이면, 거의 모든 블록에 반복되는 용어
+        (브랜드명/페이지 표시 같은 꼬리말)는 주제어가 아니므로 제외한다.
+        """
+        self._load()
+        df, tags = self._data.get("df", {}), self._data.get("tags", {})
+        personal = personal or {}
+        n = self._data.get("doc_count", 0)
+        tf = Counter(terms(text))
+        if not tf:
+            return []
+        singles = set(tokenize(text))
+        blocks = [b for b in text.split("\n\n") if b.strip()]
+        if len(blocks) >= 3:
+            block_df = Counter(t for b in blocks for t in set(terms(b)))
+            for term, count in block_df.items():
+                if count >= 0.8 * len(blocks):
+                    tf.pop(term, None)
+
+        scores = Counter()
+        for term, count in tf.items():
+            idf = math.log((n + 1) / (df.get(term, 0) + 1)) + 1
+            base = (1 + math.log(count)) * idf
+            if term not in singles and term not in tags and term not in personal:
+                base *= COMPOUND_PENALTY
+            # 덱에 나온 키워드는 그 자체로 후보, 인덱스에서 인기 있는 태그면 가산
+            scores[term] = max(scores[term], base * (1 + math.log1p(tags.get(term, 0) + personal.get(term, 0))))
+            for tag in self._complete(term, PREFIX_FANOUT + 1, personal):
+                if tag != term:
+                    score = PREFIX_PENALTY * base * (1 + math.log1p(tags.get(tag, 0) + personal.get(tag, 0)))
+                    scores[tag] = max(scores[tag], score)
+        return [(tag, round(score, 3)) for tag, score in scores.most_common(limit)]
+
+    def hashtags(self, text, limit=HASHTAG_LIMIT, personal=None):
+        return " ".join(f"#{tag}" for tag, _ in self.suggest(text, limit, personal))
+
+
+hashtag_index = HashtagIndex()
@@ -0,0 +1,249 @@
+"""
+LLM 응답에서 JSON / 덱 HTML 추출 — 출력 한도에 걸려 잘린 응답 복구 포함
+
+- parse_json(): 코드 펜스/앞뒤 잡담을 걷어내고 json.loads. 실패하면 JsonScanner 로 잘린 지점을 찾아
+  열린 문자열/배열/객체를 닫은 뒤 다시 시도 (생성/수정/캡션이 같은 규칙을 씀)
+- JsonScanner: 문자열 안/이스케이프/컨테이너 스택만 추적하는 상태 기계. 구조 문자와 따옴표 사이는 정규식으로 건너뜀
+  feed() 를 여러 번 불러 스트리밍 조각을 이어 넣을 수 있다
+- extract_html(): {"html": "..."} 응답 → HTML. 잘린 응답이면 끝까지 완성된 슬라이드까지만 남기고 열린 태그를 닫음
+- missing_slides() / continuation_prompt() / extract_slides() / append_slides():
+  모자란 뒷부분 슬라이드만 다시 요청해 이어 붙이기 (덱 전체를 처음부터 다시 생성하지 않음)
+"""
+import re
+import json
+from html.parser import HTMLParser
+
+from execution.deck import is_single_slide, parse_deck, slide_texts
+from execution.progress import emit
+from execution.tracing import log
+
+_OUTSIDE_RE = re.compile(r'["{}\[\],:]')
+_INSIDE_RE = re.compile(r'["\\]')
+_PARTIAL_UNICODE_RE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+_CLOSERS = {"{": "}", "[": "]"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class JsonScanner:
+    """JSON 텍스트를 앞에서부터 읽으며 잘린 위치의 상태를 기록
+
+    safe: 여기서 자르고 stack 을 닫으면 유효한 JSON 이 되는 마지막 위치 (완성된 멤버 바로 뒤)와 그때의 stack
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.key_mode = []  # 프레임마다 지금 객체 키 자리인지
+        self.in_string = False
+        self.escape = False
+        self.length = 0
+        self.safe = None
+        self.closed = False  # 최상위 컨테이너가 닫혔는지
+
+    def feed(self, chunk):
+        i, n = 0, len(chunk)
+        while i < n:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    i += 1
+                    continue
+                match = _INSIDE_RE.search(chunk, i)
+                if not match:
+                    break
+                i = match.end()
+                if match.group() == "\\":
+                    self.escape = True
+                else:
+                    self.in_string = False
+                continue
+            match = _OUTSIDE_RE.search(chunk, i)
+            if not match:
+                break
+            ch, pos = match.group(), self.length + match.start()
+            i = match.end()
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.stack.append(ch)
+                self.key_mode.append(ch == "{")
+                self.safe = (pos + 1, list(self.stack))
+            elif ch in "}]":
+                if self.stack:
+                    self.stack.pop()
+                    self.key_mode.pop()
+                self.safe = (pos + 1, list(self.stack))
+                if not self.stack:
+                    self.closed = True
+            elif ch == "," and self.stack:
+                self.safe = (pos, list(self.stack))
+                self.key_mode[-1] = self.stack[-1] == "{"
+            elif ch == ":" and self.stack:
+                self.key_mode[-1] = False
+        self.length += n
+        return self
+
+    @property
+    def in_key(self):
+        return bool(self.stack) and self.stack[-1] == "{" and self.key_mode[-1]
+
+
+def _close(stack):
+    return "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def repair_json(text, partial_strings=True):
+    """잘린 JSON 을 닫아 파싱한 결과. 복구할 수 없으면 None
+
+    partial_strings: 잘린 문자열 값을 그 자리에서 닫아 살릴지 (False 면 마지막 완성 멤버까지만)
+    """
+    scanner = JsonScanner().feed(text)
+    if not scanner.stack:
+        return None
+    candidates = []
+    if scanner.in_string:
+        if partial_strings and not scanner.in_key:
+            body = text[:-1] if scanner.escape else _PARTIAL_UNICODE_RE.sub("", text)
+            candidates.append(body + '"' + _close(scanner.stack))
+    else:
+        candidates.append(text.rstrip() + _close(scanner.stack))
+    if scanner.safe:
+        offset, stack = scanner.safe
+        candidates.append(text[:offset] + _close(stack))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _json_text(raw):
+    raw = (raw or "").strip()
+    fence = raw.find("```json")
+    if fence != -1:
+        raw = raw[fence + 7:]
+        end = raw.find("```")
+        raw = (raw[:end] if end != -1 else raw).strip()  # 닫는 펜스 없이 잘린 응답도 허용
+    return raw
+
+
+def load_json(raw, partial_strings=True):
+    """(파싱 결과, 잘린 응답을 복구했는지). JSON 을 찾지 못하면 ValueError"""
+    raw = _json_text(raw)
+    start = raw.find("{")
+    if start == -1:
+        raise ValueError("응답에 JSON 객체가 없습니다")
+    end = raw.rfind("}")
+    if end > start:
+        try:
+            return json.loads(raw[start:end + 1]), False
+        except json.JSONDecodeError:
+            pass
+    repaired = repair_json(raw[start:], partial_strings)
+    if repaired is None:
+        raise ValueError(f"JSON 파싱/복구 실패 (응답길이={len(raw)})")
+    return repaired, True
+
+
+def parse_json(raw, partial_strings=True):
+    return load_json(raw, partial_strings)[0]
+
+
+# ── 덱 HTML ──────────────────────────────────────────────────────────────
+class _OpenTags(HTMLParser):
+    """문서 끝에서 아직 열려 있는 태그 목록"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.open = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in _VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.open:
+            del self.open[len(self.open) - 1 - self.open[::-1].index(tag):]
+
+
+def close_tags(html):
+    parser = _OpenTags()
+    parser.feed(html)
+    parser.close()
+    return "".join(f"</{tag}>" for tag in reversed(parser.open))
+
+
+def complete_slides(html):
+    """잘린 덱 HTML → 마지막으로 완성된 슬라이드까지 + 닫는 태그. 완성된 슬라이드가 없으면 빈 문자열"""
+    deck = parse_deck(html)
+    if not len(deck):
+        return ""
+    head = html[:deck.spans[-1][1]]
+    return head + "\n" + close_tags(head)
+
+
+def extract_html(raw):
+    """{"html": "..."} 응답 → HTML. 실패하면 None"""
+    try:
+        data, truncated = load_json(raw)
+        html = data.get("html", "")
+    except Exception as e:
+        log("ERROR", f"JSON parse: {e}")
+        return None
+    if truncated and html:
+        html = complete_slides(html)
+        count = len(parse_deck(html)) if html else 0
+        log("WARN", f"잘린 응답 복구: 완성된 슬라이드 {count}장")
+        emit("truncated", slides=count)
+    return html
+
+
+def missing_slides(html, slides):
+    """요청한 장수보다 모자란 뒷부분 슬라이드 번호. 슬라이드 구조를 못 찾으면 빈 목록 (이어 붙일 자리가 없음)"""
+    count = len(parse_deck(html))
+    return list(range(count + 1, slides + 1)) if count else []
+
+
+def continuation_prompt(html, text, slides):
+    """이미 완성된 슬라이드의 스타일과 요약만 보내고 뒷부분 슬라이드만 요청"""
+    deck = parse_deck(html)
+    have = len(deck)
+    summary = "\n".join(f"{n}. {t.splitlines()[0][:80] if t else ''}" for n, t in enumerate(slide_texts(html), 1))
+    return f"""You are continuing an Instagram Card News deck (1080x1350 slides) whose generation was cut off.
+Slides 1-{have} of {slides} are finished. Write ONLY slides {have + 1}-{slides}.
+
+SHARED CSS (already in the document — reuse its classes, do not repeat it):
+{deck.style or "(none)"}
+
+LAST FINISHED SLIDE (match its structure, size and style):
+{deck.slide(have)}
+
+FINISHED SLIDES (first line of each — do not repeat this content):
+{summary}
+
+CONTENT SOURCE: "{text}"
+
+=== RULES ===
+1. Output ONLY JSON: {{"slides": ["<one complete slide element>", ...]}} with exactly {slides - have} items, in order.
+2. Each item is exactly ONE slide element with the same outer tag and class as the finished slides.
+3. Slide {slides} is the last slide and MUST have a CTA (저장/팔로우/DM 유도 문구).
+4. No markdown symbols (**, #). Use <b> for emphasis.
+"""
+
+
+def extract_slides(raw):
+    """이어쓰기 응답 → 슬라이드 조각 목록 (잘린 마지막 조각은 버림). 실패하면 None"""
+    try:
+        data = parse_json(raw, partial_strings=False)
+    except Exception as e:
+        log("ERROR", f"JSON parse: {e}")
+        return None
+    items = data.get("slides") if isinstance(data, dict) else None
+    fragments = [item.strip() for item in items or [] if isinstance(item, str) and is_single_slide(item.strip())]
+    return fragments or None
+
+
+def append_slides(html, fragments):
+    """마지막 슬라이드 뒤에 조각들을 이어 붙인 HTML"""
+    end = parse_deck(html).spans[-1][1]
+    return html[:end] + "\n" + "\n".join(fragments) + html[end:]
@@ -0,0 +1,152 @@
+"""
+정적 결과물(슬라이드 PNG, 업로드 이미지) HTTP 캐싱 + 응답 압축
+
+- 파일명에 내용 해시를 넣어 URL 자체가 내용을 식별 → `Cache-Control: immutable` 로 1년 캐시
+- ETag / If-None-Match → 304, Range / If-Range → 206 (Starlette 0.27 FileResponse 는 Range 미지원)
+- 큰 JSON/HTML 응답은 gzip (이미 압축된 이미지 경로와 스트리밍 응답 경로는 제외)
+"""
+import os
+import re
+import hashlib
+import mimetypes
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+CHUNK_SIZE = 64 * 1024
+HASH_LENGTH = 16
+
+# 파일명 안의 내용 해시 (slide_01.<hash>.png, <hash>.jpg)
+_HASH_RE = re.compile(r"(?:^|\.)([0-9a-f]{16,64})\.[A-Za-z0-9]+$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_addressed(path):
+    """slide_01.png → slide_01.<hash>.png 로 이름 변경 후 새 파일명 반환"""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    name = f"{stem}.{hash_file(path)[:HASH_LENGTH]}{ext}"
+    os.replace(path, os.path.join(os.path.dirname(path), name))
+    return name
+
+
+def content_hash(filename):
+    match = _HASH_RE.search(filename)
+    return match.group(1) if match else None
+
+
+def _etag(path, st):
+    hashed = content_hash(os.path.basename(path))
+    if hashed:
+        return f'"{hashed}"'
+    return f'W/"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _etag_matches(header, etag):
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def _parse_range(header, size):
+    """단일 바이트 범위만 지원. (start, end) / None(무시하고 전체 전송) / False(범위 불만족)"""
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:  # bytes=-N → 마지막 N 바이트
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _iter_file(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def cached_file_response(request, path, media_type=None):
+    """ETag/304, Range/206 를 처리하는 FileResponse. 해시 파일명이면 immutable 캐시"""
+    st = os.stat(path)
+    etag = _etag(path, st)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if content_hash(os.path.basename(path)) else REVALIDATE_CACHE,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, st.st_size)
+        if byte_range is False:
+            return Response(status_code=416, headers=dict(headers, **{"Content-Range": f"bytes */{st.st_size}"}))
+        if byte_range:
+            start, end = byte_range
+            media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+            return StreamingResponse(
+                _iter_file(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers=dict(headers, **{
+                    "Content-Range": f"bytes {start}-{end}/{st.st_size}",
+                    "Content-Length": str(end - start + 1),
+                }),
+            )
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=st)
+
+
+class SelectiveGZipMiddleware:
+    """경로 접두사로 제외 대상을 지정할 수 있는 GZipMiddleware
+
+    이미지(이미 압축됨, Range 응답과 충돌)와 스트리밍 이벤트 응답(버퍼링되면 안 됨)은 그대로 통과
+    """
+
+    def __init__(self, app, exclude_prefixes=(), minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
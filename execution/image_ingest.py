@@ -0,0 +1,145 @@
+"""
+배경 이미지 업로드 수집 (ingest)
+
+- 업로드를 청크 단위로 디스크에 스트리밍 — 최대 UPLOAD_MAX_BYTES 초과 시 즉시 중단
+- 스트리밍하면서 sha256 계산 → 같은 원본은 한 번만 처리하고 같은 URL 반환 (중복 제거)
+  청크 해시/쓰기는 스레드에서 실행해 업로드 중에도 이벤트 루프가 다른 요청을 처리
+- 디코딩/EXIF 회전/1080×1350 cover 크롭/JPEG 재인코딩은 CPU 작업이므로 프로세스 풀에서 실행
+  → Chromium 이 렌더링 때마다 수 MB 원본을 디코딩하지 않도록 카드 크기로 미리 맞춰 둠
+- 파일명은 원본 해시 기반 (`<hash>.jpg`) 이라 URL 이 항상 같음
+"""
+import os
+import uuid
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from execution.tracing import log
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOADS_DIR = os.path.join(WORKSPACE, "uploads")
+INCOMING_DIR = os.path.join(UPLOADS_DIR, ".incoming")
+
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+CARD_SIZE = (1080, 1350)  # 인스타그램 4:5 카드
+JPEG_QUALITY = 88
+CHUNK_SIZE = 1024 * 1024
+HASH_LENGTH = 32
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _reset_executor(broken):
+    """worker 가 죽어(OOM 등) 깨진 풀은 다시 쓸 수 없으므로 버리고 다음 요청에서 새로 만듦"""
+    global _executor
+    if _executor is broken:
+        _executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def normalize_image(src_path, dst_path, size=CARD_SIZE):
+    """(프로세스 풀에서 실행) 디코딩 → EXIF 회전 → cover 크롭/리사이즈 → JPEG 저장"""
+    from PIL import Image, ImageOps
+
+    with Image.open(src_path) as img:
+        # JPEG 는 디코딩 단계에서 바로 축소 (DCT scaling) → 대형 카메라 사진도 빠르게 처리
+        img.draft("RGB", (size[0] * 2, size[1] * 2))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            flat = Image.new("RGB", img.size, (255, 255, 255))
+            flat.paste(img, mask=img.split()[-1])
+            img = flat
+        else:
+            img = img.convert("RGB")
+        img = ImageOps.fit(img, size, method=Image.LANCZOS)
+
+        tmp_path = f"{dst_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            img.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp_path, dst_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+def _write_chunk(f, digest, chunk):
+    """(스레드에서 실행) 1MB 청크 해시 + 쓰기 — sha256 은 큰 버퍼에서 GIL 을 놓으므로 이벤트 루프를 막지 않음"""
+    digest.update(chunk)
+    f.write(chunk)
+
+
+async def stream_to_disk(upload, max_bytes=UPLOAD_MAX_BYTES):
+    """UploadFile 을 임시 파일로 스트리밍하며 해시 계산. (임시 경로, sha256 hex) 반환"""
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    tmp_path = os.path.join(INCOMING_DIR, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    total = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise UploadRejected(f"파일이 너무 큽니다 (최대 {max_bytes // (1024 * 1024)}MB)", status_code=413)
+                await asyncio.to_thread(_write_chunk, f, digest, chunk)
+        if total == 0:
+            raise UploadRejected("빈 파일입니다")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+async def ingest_upload(upload):
+    """업로드 → 정규화된 카드 배경 이미지. {"file_name", "hash", "deduplicated"} 반환"""
+    tmp_path, sha = await stream_to_disk(upload)
+    file_name = f"{sha[:HASH_LENGTH]}.jpg"
+    dst_path = os.path.join(UPLOADS_DIR, file_name)
+    try:
+        if os.path.exists(dst_path):
+            os.utime(dst_path)  # 최근 사용 표시
+            return {"file_name": file_name, "hash": sha, "deduplicated": True}
+
+        loop = asyncio.get_running_loop()
+        executor = get_executor()
+        try:
+            await loop.run_in_executor(executor, normalize_image, tmp_path, dst_path)
+        except BrokenProcessPool as e:
+            # 파일 문제가 아니라 서버 쪽 장애 → 풀을 다시 만들고 5xx (다시 시도하면 성공할 수 있음)
+            log("WARN", f"이미지 처리 프로세스 풀 중단, 재생성: {e}")
+            _reset_executor(executor)
+            raise UploadRejected("이미지 처리 서버 오류입니다. 잠시 후 다시 시도해주세요.", status_code=503) from e
+        except Exception as e:
+            log("WARN", f"이미지 정규화 실패: {e}")
+            raise UploadRejected("이미지 파일을 읽을 수 없습니다") from e
+        return {"file_name": file_name, "hash": sha, "deduplicated": False}
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
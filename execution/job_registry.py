@@ -0,0 +1,183 @@
+"""
+worker 프로세스 간 공유되는 작업(job) 레지스트리 — SQLite(WAL) 기반
+
+렌더/생성 작업의 상태를 한 곳에 기록해 어느 worker 가 요청을 받더라도
+같은 작업을 조회할 수 있게 한다. 작업마다 전용 디렉토리(.tmp/jobs/<id>)를 갖는다.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+from contextlib import closing
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOBS_DIR = os.path.join(WORKSPACE, ".tmp", "jobs")
+REGISTRY_PATH = os.path.join(WORKSPACE, ".tmp", "jobs.sqlite3")
+# 진행 중(queued/running) 작업이 이 시간(초) 동안 갱신되지 않으면 처리하던 worker 가 사라진 것으로 봄
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "300"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    meta TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_kind_created ON jobs(kind, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS job_events_job_seq ON job_events(job_id, seq);
+"""
+
+
+class JobRegistry:
+    def __init__(self, path=REGISTRY_PATH, jobs_dir=JOBS_DIR):
+        self.path = path
+        self.jobs_dir = jobs_dir
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.makedirs(jobs_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # 스레드/프로세스마다 짧게 연결 — 잠금 대기는 SQLite busy timeout 에 맡김
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def create(self, kind, owner=None, meta=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, owner, status, created_at, updated_at, meta) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, owner, "queued", now, now, json.dumps(meta or {}, ensure_ascii=False)),
+            )
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        return job_id
+
+    def update(self, job_id, status=None, result=None, error=None):
+        fields, values = ["updated_at = ?"], [time.time()]
+        if status is not None:
+            fields.append("status = ?")
+            values.append(status)
+        if result is not None:
+            fields.append("result = ?")
+            values.append(json.dumps(result, ensure_ascii=False))
+        if error is not None:
+            fields.append("error = ?")
+            values.append(error)
+        values.append(job_id)
+        with closing(self._connect()) as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(fields)} WHERE id = ?", values)
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, kind=None, owner=None, limit=50):
+        query, values = "SELECT * FROM jobs WHERE 1 = 1", []
+        if kind:
+            query += " AND kind = ?"
+            values.append(kind)
+        if owner:
+            query += " AND owner = ?"
+            values.append(owner)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        values.append(limit)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, values).fetchall()
+        return [self._row_to_dict(r) for r in rows]
+
+    def active(self, kinds=None, owner=None, stale_seconds=JOB_STALE_SECONDS):
+        """모든 worker 를 통틀어 진행 중인 작업 수 (stale_seconds 동안 갱신이 없는 작업은 제외)"""
+        query = "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running') AND updated_at >= ?"
+        values = [time.time() - stale_seconds]
+        if kinds:
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            values += list(kinds)
+        if owner:
+            query += " AND owner = ?"
+            values.append(owner)
+        with closing(self._connect()) as conn:
+            return conn.execute(query, values).fetchone()[0]
+
+    def in_progress(self, kinds=None):
+        """queued/running 상태인 작업 목록 (오래 갱신이 없어도 포함)"""
+        query = "SELECT * FROM jobs WHERE status IN ('queued', 'running')"
+        values = []
+        if kinds:
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            values += list(kinds)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, values).fetchall()
+        return [self._row_to_dict(r) for r in rows]
+
+    def fail_if_stale(self, job_id, error, stale_seconds=JOB_STALE_SECONDS):
+        """진행 중인데 stale_seconds 동안 갱신(heartbeat)이 없는 작업을 error 로 바꾸고 error 이벤트를 남김
+
+        처리하던 worker 가 죽어 영영 끝나지 않는 작업 정리용. 이번 호출이 바꿨으면 True (여러 worker 가 동시에 불러도 한 번만)
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            # 상태 변경과 error 이벤트를 한 트랜잭션으로 (SSE 가 error 상태를 보고 이벤트 없이 끝나지 않게)
+            conn.execute("BEGIN IMMEDIATE")
+            changed = conn.execute(
+                "UPDATE jobs SET status = 'error', error = ?, updated_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'running') AND updated_at < ?",
+                (error, now, job_id, now - stale_seconds),
+            ).rowcount
+            if changed:
+                conn.execute(
+                    "INSERT INTO job_events (job_id, ts, type, data) VALUES (?, ?, ?, ?)",
+                    (job_id, now, "error", json.dumps({"message": error}, ensure_ascii=False)),
+                )
+            conn.execute("COMMIT")
+        return bool(changed)
+
+    def add_event(self, job_id, event_type, data=None):
+        """진행 이벤트 추가. 단조 증가하는 seq 반환 (SSE 이벤트 ID / 재연결 위치로 사용)"""
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "INSERT INTO job_events (job_id, ts, type, data) VALUES (?, ?, ?, ?)",
+                (job_id, time.time(), event_type, json.dumps(data or {}, ensure_ascii=False)),
+            )
+            return cur.lastrowid
+
+    def events(self, job_id, after=0):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT seq, ts, type, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after),
+            ).fetchall()
+        return [{"seq": r["seq"], "ts": r["ts"], "type": r["type"], "data": json.loads(r["data"] or "{}")} for r in rows]
+
+    def delete(self, job_id):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    @staticmethod
+    def _row_to_dict(row):
+        job = dict(row)
+        job["meta"] = json.loads(job["meta"]) if job.get("meta") else {}
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        return job
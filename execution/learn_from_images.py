@@ -1,38 +1,55 @@
 """
 레퍼런스 이미지를 gemma3 (로컬 비전 모델)로 분석하여 디자인 패턴 추출
+
+- 이미지 1장씩 분석하고 결과를 내용 해시(sha256) 기준으로 캐시 (.tmp/cache/reference_analysis)
+  → 레퍼런스를 5장 추가하고 다시 학습하면 새 5장만 분석한다 (파일 이름이 바뀌어도 내용이 같으면 재사용)
+- 해시/크기/썸네일은 reference_index 가 관리 — 원본 대신 썸네일을 읽고, 거의 같은 이미지는 묶음 대표 1장만 분석
+- 분석은 LEARN_CONCURRENCY 개씩 동시에 실행 (Ollama 쪽 동시 처리 수 OLLAMA_CONCURRENCY 도 함께 올려야 실제로 병렬)
+- 이미지는 긴 변 LEARN_MAX_SIDE px 로 줄여 JPEG 로 인코딩 후 전송 (원본 PNG 를 그대로 base64 로 보내지 않음)
+- 합치기는 결정적: 해시 순서로 모아 문구는 등장 횟수순, 타이포 값은 최빈값
+  → 같은 이미지 집합이면 언제 돌려도 같은 learned_design.json
+- color_palette / layout 은 palette_analyzer 가 픽셀에서 직접 계산 (수 초). LLM 은 장식/강조/타이포 같은 정성적 메모만
+  --no-llm 이면 LLM 없이 팔레트/레이아웃만 다시 계산하고 기존 정성적 메모는 유지
 """
 import os
+import io
 import sys
 import json
 import base64
-import glob
-import httpx
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from dotenv import load_dotenv
 
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution import ollama_client, palette_analyzer
+from execution.filestore import atomic_write_json, read_json
+from execution.reference_index import REFERENCE_DIR, ReferenceIndex
+from execution.tracing import log
+
 load_dotenv()
 
-OLLAMA_BASE_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 VISION_MODEL = "gemma3:12b"  # 비전 지원 모델
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "learned_design.json")
-REFERENCE_DIR = os.path.join(os.path.dirname(__file__), "references")
-
-
-def encode_image(path):
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
-
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(WORKSPACE, ".tmp", "cache", "reference_analysis")
 
-def analyze_batch(image_paths, batch_label=""):
-    """gemma3로 이미지 배치 분석"""
-    images_b64 = [encode_image(p) for p in image_paths]
+LEARN_CONCURRENCY = int(os.environ.get("LEARN_CONCURRENCY", "2"))
+LEARN_MAX_SIDE = int(os.environ.get("LEARN_MAX_SIDE", "768"))  # px
+LEARN_TIMEOUT = float(os.environ.get("LEARN_TIMEOUT", "180"))  # 초 (이미지 1장)
+LEARN_MAX_ITEMS = int(os.environ.get("LEARN_MAX_ITEMS", "20"))  # 항목별 최대 개수 (프롬프트 길이 제한)
 
-    prompt = """이 인스타그램 카드뉴스 이미지들을 분석해서 디자인 패턴을 추출해줘.
+PROMPT_VERSION = 3  # 프롬프트를 바꾸면 올려서 캐시 무효화
+# 색상/여백/배치는 palette_analyzer 가 계산하므로 묻지 않음
+PROMPT = """이 인스타그램 카드뉴스 이미지를 분석해서 디자인 패턴을 추출해줘.
 
 다음 항목을 JSON으로 출력해줘:
 {
-  "color_palette": {"배경색들": [], "강조색들": [], "텍스트색들": []},
   "typography": {"제목_크기": "", "본문_크기": "", "폰트_굵기들": [], "정렬": ""},
-  "layout": {"슬라이드_구성": "", "여백": "", "요소_배치": ""},
   "decorative": ["장식 요소들 CSS로 설명"],
   "highlights": ["핵심 데이터 강조 방식"],
   "best_practices": ["관찰된 디자인 베스트 프랙티스"]
@@ -40,107 +57,173 @@ def analyze_batch(image_paths, batch_label=""):
 
 CSS 값은 최대한 구체적으로 (px, hex색상 등). JSON만 출력해."""
 
+LIST_KEYS = ["decorative", "highlights", "best_practices"]
+
+
+def cache_path(digest):
+    # 모델/프롬프트가 바뀌면 다른 키 → 예전 분석을 섞어 쓰지 않음
+    return os.path.join(CACHE_DIR, f"{VISION_MODEL.replace(':', '_')}-v{PROMPT_VERSION}-{digest[:32]}.json")
+
+
+def encode_image(path, max_side=LEARN_MAX_SIDE):
+    """긴 변을 max_side 로 줄인 JPEG 의 base64 (이미 그 크기 이하인 JPEG 썸네일은 다시 인코딩하지 않음)"""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if image.format == "JPEG" and max(image.size) <= max_side:
+            with open(path, "rb") as f:
+                return base64.b64encode(f.read()).decode("utf-8")
+        image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def analyze_image(path):
+    """이미지 1장 분석. 실패하면 None (캐시하지 않음 → 다음 학습 때 다시 시도)"""
+    data = ollama_client.generate(
+        PROMPT, VISION_MODEL,
+        images=[encode_image(path)],
+        options={"temperature": 0.2, "num_predict": 2000},
+        timeout=LEARN_TIMEOUT,
+        queue_timeout=LEARN_TIMEOUT,
+    )
+    raw = data.get("response", "").strip()
     try:
-        print(f"[INFO] Batch {batch_label}: {len(image_paths)}개 이미지 분석 중...", file=sys.stderr)
-        response = httpx.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": VISION_MODEL,
-                "prompt": prompt,
-                "images": images_b64,
-                "stream": False,
-                "format": "json",
-                "options": {
-                    "temperature": 0.2,
-                    "num_predict": 4000,
-                }
-            },
-            timeout=180.0
-        )
-        response.raise_for_status()
-        raw = response.json().get("response", "").strip()
-        return json.loads(raw)
+        result = json.loads(raw)
     except json.JSONDecodeError as e:
-        print(f"[WARN] JSON 파싱 실패: {e}", file=sys.stderr)
-        return {"raw": raw}
-    except Exception as e:
-        print(f"[ERROR] 분석 실패: {e}", file=sys.stderr)
+        log("WARN", f"JSON 파싱 실패 ({os.path.basename(path)}): {e}")
         return None
+    return result if isinstance(result, dict) else None
+
+
+def analyze_all(images, concurrency=LEARN_CONCURRENCY, force=False):
+    """images: [(보낼 이미지 경로, 원본 sha256)] → {해시: 분석 결과} — 캐시에 없는 이미지만 동시에 분석"""
+    results, todo, queued = {}, [], set()
+    for path, digest in images:
+        if digest in results or digest in queued:  # 내용이 같은 파일은 한 번만
+            continue
+        cached = None if force else read_json(cache_path(digest))
+        if cached is not None:
+            results[digest] = cached
+        else:
+            todo.append((path, digest))
+            queued.add(digest)
+
+    log("INFO", f"총 {len(images)}개 이미지: 캐시 {len(results)}개, 새로 분석 {len(todo)}개")
+    if not todo:
+        return results
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(analyze_image, path): (path, digest) for path, digest in todo}
+        for future in as_completed(futures):
+            path, digest = futures[future]
+            done += 1
+            try:
+                result = future.result()
+            except Exception as e:
+                log("ERROR", f"분석 실패 ({os.path.basename(path)}): {e}")
+                continue
+            if result is None:
+                continue
+            atomic_write_json(cache_path(digest), result)
+            results[digest] = result
+            log("INFO", f"{done}/{len(todo)} 분석 완료: {os.path.basename(path)}")
+    return results
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _ranked(counter, first_seen, limit=None):
+    """등장 횟수 내림차순, 같으면 처음 나온 순서 (입력 순서가 같으면 항상 같은 결과)"""
+    items = sorted(counter, key=lambda item: (-counter[item], first_seen[item]))
+    return items[:limit] if limit else items
 
 
 def merge_analysis(results):
-    """여러 배치 결과를 하나로 합치기"""
-    merged = {
-        "color_palette": {"배경색들": set(), "강조색들": set(), "텍스트색들": set()},
-        "typography": {},
-        "layout": {},
-        "decorative": [],
-        "highlights": [],
-        "best_practices": []
-    }
+    """이미지별 LLM 메모를 하나로 합치기 (results 순서대로 — 호출자가 해시순으로 넘김)"""
+    lists = {key: Counter() for key in LIST_KEYS}
+    typography = {}
+    weights = Counter()
+    first_seen = {}
+
+    def seen(bucket, value):
+        first_seen.setdefault((bucket, value), len(first_seen))
+        return value
 
     for r in results:
         if not r or "raw" in r:
             continue
-        # 색상 합치기
-        cp = r.get("color_palette", {})
-        for key in ["배경색들", "강조색들", "텍스트색들"]:
-            vals = cp.get(key, [])
-            if isinstance(vals, list):
-                merged["color_palette"][key].update(vals)
-
-        # 나머지 합치기
-        if r.get("typography"):
-            merged["typography"] = r["typography"]
-        if r.get("layout"):
-            merged["layout"] = r["layout"]
-        merged["decorative"].extend(r.get("decorative", []))
-        merged["highlights"].extend(r.get("highlights", []))
-        merged["best_practices"].extend(r.get("best_practices", []))
-
-    # set → list
-    for key in merged["color_palette"]:
-        merged["color_palette"][key] = list(merged["color_palette"][key])
-
-    # 중복 제거
-    merged["decorative"] = list(set(merged["decorative"]))
-    merged["highlights"] = list(set(merged["highlights"]))
-    merged["best_practices"] = list(set(merged["best_practices"]))
-
+        fields = r.get("typography") or {}
+        for field, value in (fields.items() if isinstance(fields, dict) else []):
+            if field == "폰트_굵기들":
+                for weight in value if isinstance(value, list) else [value]:
+                    weights[seen(field, _text(weight))] += 1
+            elif value not in ("", None):
+                typography.setdefault(field, Counter())[seen(field, _text(value))] += 1
+
+        for key in LIST_KEYS:
+            values = r.get(key)
+            for value in dict.fromkeys(_text(v) for v in (values if isinstance(values, list) else []) if v):
+                lists[key][seen(key, value)] += 1
+
+    def ranked(bucket, counter, limit=None):
+        return _ranked(counter, {v: first_seen[(bucket, v)] for v in counter}, limit)
+
+    merged = {"typography": {field: ranked(field, counter)[0] for field, counter in typography.items()}}  # 최빈값
+    if weights:
+        merged["typography"]["폰트_굵기들"] = ranked("폰트_굵기들", weights)
+    for key in LIST_KEYS:
+        merged[key] = ranked(key, lists[key], LEARN_MAX_ITEMS)
     return merged
 
 
 def main():
-    images = []
-    for ext in ["*.png", "*.jpg", "*.jpeg"]:
-        images.extend(glob.glob(os.path.join(REFERENCE_DIR, ext)))
-
-    if not images:
-        print("[ERROR] references/ 폴더에 이미지가 없습니다.", file=sys.stderr)
-        sys.exit(1)
-
-    print(f"[INFO] 총 {len(images)}개 이미지 발견", file=sys.stderr)
-
-    # 3개씩 배치 (gemma3 비전 모델 제한)
-    batch_size = 3
-    results = []
-    for i in range(0, min(len(images), 15), batch_size):  # 최대 15개
-        batch = images[i:i + batch_size]
-        label = f"{i//batch_size + 1}/{min(len(images), 15)//batch_size + 1}"
-        result = analyze_batch(batch, label)
-        if result:
-            results.append(result)
-
-    if not results:
-        print("[ERROR] 분석 결과 없음", file=sys.stderr)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=REFERENCE_DIR, help="Reference image directory")
+    parser.add_argument("--concurrency", type=int, default=LEARN_CONCURRENCY)
+    parser.add_argument("--force", action="store_true", help="Ignore cached analyses")
+    parser.add_argument("--no-llm", action="store_true", help="Only recompute palette/layout locally")
+    args = parser.parse_args()
+
+    # 인덱스 갱신 (바뀐 파일만) → 유사 이미지 묶음마다 대표 1장의 썸네일만 분석
+    index = ReferenceIndex(args.dir)
+    changed, removed = index.update()
+    entries = index.data["entries"]
+    if not entries:
+        log("ERROR", "references/ 폴더에 이미지가 없습니다.")
         sys.exit(1)
-
-    merged = merge_analysis(results)
+    representatives = [name for name, _ in index.representatives()]
+    log("INFO", f"레퍼런스 {len(entries)}개 (인덱스 갱신 {changed}, 삭제 {removed}) → "
+                f"유사 이미지 묶음 대표 {len(representatives)}개 분석")
+    images = [(index.thumbnail(name), entries[name]["sha256"]) for name in representatives]
+
+    started = time.perf_counter()
+    local = palette_analyzer.analyze_images([thumb for thumb, _ in images])
+    log("INFO", f"팔레트/레이아웃 로컬 분석: {len(local)}개 ({time.perf_counter() - started:.1f}s)")
+
+    if args.no_llm:
+        previous = read_json(OUTPUT_FILE, {}) or {}
+        merged = {key: previous[key] for key in ["typography"] + LIST_KEYS if key in previous}
+    else:
+        analyses = analyze_all(images, args.concurrency, args.force)
+        if not analyses and not local:
+            log("ERROR", "분석 결과 없음")
+            sys.exit(1)
+        # 해시순으로 합쳐야 파일 순서/완료 순서와 무관하게 같은 결과
+        merged = merge_analysis([analyses[digest] for digest in sorted(analyses)])
+
+    palette, layout = palette_analyzer.summarize(local) if local else ({}, {})
+    merged = dict(merged, color_palette=palette, layout=layout, source_images=len(local))
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(merged, f, ensure_ascii=False, indent=2)
 
-    print(f"\n[INFO] ✅ 학습 완료! → {OUTPUT_FILE}", file=sys.stderr)
+    log("INFO", f"✅ 학습 완료! ({len(local)}/{len(entries)}개 이미지) → {OUTPUT_FILE}")
     print(json.dumps(merged, ensure_ascii=False, indent=2))
 
 
@@ -0,0 +1,150 @@
+"""
+단계별 지연시간/호출 수 계측 — Prometheus 형식으로 /metrics 에 노출
+
+    with span("research"):
+        ...
+    with span("llm_call", provider="gemini", model="gemini-2.0-flash"):
+        ...
+
+- stage_seconds: 단계별 소요 시간 히스토그램 (stage, provider, model)
+- stage_errors: 단계 안에서 예외가 난 횟수
+- provider_errors: provider 응답 오류 (provider, status)
+- llm_tokens: provider 가 보고한 토큰 사용량 (provider, kind=prompt|completion)
+- cache_events: 캐시 적중/실패 (cache, result=hit|miss)
+- ollama_first_token_seconds / ollama_load_seconds: 로컬 모델 첫 토큰 지연, 모델 로드 시간 (model)
+- http_requests / http_request_seconds: 엔드포인트별 요청 수, 지연시간
+
+uvicorn worker 가 여러 개면 PROMETHEUS_MULTIPROC_DIR 을 지정해야 worker 합산 값이 노출된다.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+
+from execution.tracing import end_span, start_span
+
+# LLM 호출(수십 초) ~ 파일 작업(수 ms) 까지 한 히스토그램으로 커버
+STAGE_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 240)
+
+stage_seconds = Histogram(
+    "cardnews_stage_seconds", "Latency of a pipeline stage",
+    ["stage", "provider", "model"], buckets=STAGE_BUCKETS,
+)
+stage_errors = Counter(
+    "cardnews_stage_errors_total", "Exceptions raised inside a pipeline stage",
+    ["stage", "provider", "model"],
+)
+provider_errors = Counter(
+    "cardnews_provider_errors_total", "Non-success responses from AI providers",
+    ["provider", "status"],
+)
+llm_tokens = Counter(
+    "cardnews_llm_tokens_total", "Tokens reported by AI providers",
+    ["provider", "kind"],
+)
+cache_events = Counter(
+    "cardnews_cache_events_total", "Cache lookups",
+    ["cache", "result"],
+)
+ollama_first_token_seconds = Histogram(
+    "cardnews_ollama_first_token_seconds", "Time to first streamed token from the local Ollama model",
+    ["model"], buckets=STAGE_BUCKETS,
+)
+ollama_load_seconds = Histogram(
+    "cardnews_ollama_load_seconds", "Model load time reported by Ollama (non-zero means the model was reloaded)",
+    ["model"], buckets=STAGE_BUCKETS,
+)
+http_requests = Counter(
+    "cardnews_http_requests_total", "HTTP requests",
+    ["method", "route", "status"],
+)
+http_request_seconds = Histogram(
+    "cardnews_http_request_seconds", "HTTP request latency",
+    ["method", "route"], buckets=STAGE_BUCKETS,
+)
+
+
+@contextmanager
+def span(stage, provider="", model=""):
+    """with 블록의 소요 시간을 stage 히스토그램에 기록 (예외도 기록 후 그대로 전파)
+
+    요청 처리 중이면 tracing 의 요청 span 트리에도 자식 노드로 추가된다.
+    """
+    start = time.perf_counter()
+    child, token = start_span(stage, provider=provider, model=model)
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        stage_errors.labels(stage, provider, model).inc()
+        raise
+    finally:
+        stage_seconds.labels(stage, provider, model).observe(time.perf_counter() - start)
+        end_span(child, token, error)
+
+
+def record_provider_error(provider, status):
+    provider_errors.labels(provider, str(status)).inc()
+
+
+def record_tokens(provider, prompt=0, completion=0):
+    if prompt:
+        llm_tokens.labels(provider, "prompt").inc(prompt)
+    if completion:
+        llm_tokens.labels(provider, "completion").inc(completion)
+
+
+def record_ollama(model, first_token=None, load=0.0):
+    if first_token is not None:
+        ollama_first_token_seconds.labels(model).observe(first_token)
+    ollama_load_seconds.labels(model).observe(load or 0.0)
+
+
+def record_cache(cache, hit):
+    cache_events.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_latest():
+    """(body, content_type) — multiprocess 모드면 모든 worker 값을 합산"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """엔드포인트(라우트 템플릿) 단위 요청 수/지연시간 기록 — 경로 파라미터로 라벨이 늘어나지 않게 함"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests.labels(scope["method"], route, str(status["code"])).inc()
+            http_request_seconds.labels(scope["method"], route).observe(time.perf_counter() - start)
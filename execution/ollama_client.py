@@ -0,0 +1,205 @@
+"""
+로컬 Ollama 호출 공용 클라이언트 — 생성/수정/캡션이 같은 규칙으로 로컬 모델을 사용
+
+- keep_alive: 매 요청에 OLLAMA_KEEP_ALIVE 를 실어 보내 호출 사이에 모델이 메모리에서 내려가지 않게 함
+  (Ollama 기본값 5분 → 요청이 뜸하면 매번 수십 초짜리 모델 로드가 반복됨)
+- 동시 실행 제한: 로컬 GPU 가 동시에 처리할 수 있는 수(OLLAMA_CONCURRENCY, 서버의 OLLAMA_NUM_PARALLEL 과 맞춤)만큼만
+  보내고, OLLAMA_QUEUE_TIMEOUT 안에 자리가 나지 않으면 OllamaBusy → 호출자는 다음 provider 로 폴백
+  한도는 worker 프로세스 전체 합계 — 슬롯 파일 OLLAMA_CONCURRENCY 개에 대한 논블로킹 락(filestore.try_lock)으로 나눠 가짐
+- 스트리밍: 응답을 조각으로 받아 첫 토큰 지연을 측정하고, 진행 중인 생성 작업에는 글자 수를 progress 이벤트로 알림
+- available(): /api/tags 결과를 OLLAMA_HEALTH_TTL 동안 캐시 — 서버가 없거나 모델이 안 받아져 있으면 시도하지 않음
+- warmup(): 서버 기동 시 빈 프롬프트로 모델을 미리 올려 둠
+"""
+import os
+import json
+import time
+import threading
+
+import httpx
+
+from execution.filestore import try_lock
+from execution.metrics import record_ollama, record_provider_error, record_tokens, span
+from execution.progress import emit
+from execution.tracing import log
+
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_CONCURRENCY = int(os.environ.get("OLLAMA_CONCURRENCY", "1"))
+OLLAMA_QUEUE_TIMEOUT = float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", "30"))  # 초
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "300"))  # 초
+OLLAMA_STREAM = os.getenv("OLLAMA_STREAM", "true").lower() == "true"
+OLLAMA_HEALTH_TTL = int(os.environ.get("OLLAMA_HEALTH_TTL", "30"))  # 초
+# 기동 시 미리 올릴 모델 (쉼표 구분). 비어 있으면 HTML 생성 모델만
+OLLAMA_WARMUP_MODELS = [m.strip() for m in os.environ.get("OLLAMA_WARMUP_MODELS", "").split(",") if m.strip()]
+
+PROGRESS_EVERY = 2.0  # 스트리밍 진행 이벤트 최소 간격 (초)
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SLOT_DIR = os.path.join(WORKSPACE, ".tmp", "cache", "ollama_slots")
+SLOT_POLL = 0.2  # 슬롯이 모두 찼을 때 다시 시도하는 간격 (초)
+
+
+class OllamaBusy(Exception):
+    """로컬 모델 동시 실행 한도가 찼고 대기 시간 안에 자리가 나지 않음"""
+
+
+_slots = threading.BoundedSemaphore(max(1, OLLAMA_CONCURRENCY))  # 프로세스 안 스레드끼리 (슬롯 파일 경쟁 전에 거름)
+_client = None
+_client_lock = threading.Lock()
+_health = {"checked": 0.0, "models": None}
+_health_lock = threading.Lock()
+
+
+def client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(base_url=OLLAMA_BASE_URL, timeout=OLLAMA_TIMEOUT)
+        return _client
+
+
+def _model_names(name):
+    return {name, name + ":latest"} if ":" not in name else {name}
+
+
+def available(model=None):
+    """Ollama 서버가 응답하고 (model 이 주어지면) 그 모델이 받아져 있는지"""
+    with _health_lock:
+        if time.monotonic() - _health["checked"] > OLLAMA_HEALTH_TTL:
+            try:
+                response = client().get("/api/tags", timeout=2.0)
+                response.raise_for_status()
+                _health["models"] = {m.get("name") for m in response.json().get("models", [])}
+            except Exception:
+                _health["models"] = None
+            _health["checked"] = time.monotonic()
+        models = _health["models"]
+    if models is None:
+        return False
+    return model is None or bool(_model_names(model) & models)
+
+
+def _mark_down():
+    """연결 실패 — 다음 헬스체크 주기까지 Ollama 를 건너뜀"""
+    with _health_lock:
+        _health["models"], _health["checked"] = None, time.monotonic()
+
+
+def _acquire_slot(timeout):
+    """모든 worker 가 공유하는 실행 슬롯 하나를 잡음 → 락을 쥔 파일 객체 (닫으면 반납). 시간 안에 못 잡으면 None"""
+    deadline = time.monotonic() + timeout
+    if not _slots.acquire(timeout=timeout):
+        return None
+    try:
+        while True:
+            for i in range(max(1, OLLAMA_CONCURRENCY)):
+                lock_file = try_lock(os.path.join(SLOT_DIR, f"slot-{i}"))
+                if lock_file is not None:
+                    return lock_file
+            if time.monotonic() >= deadline:
+                _slots.release()
+                return None
+            time.sleep(min(SLOT_POLL, max(0.0, deadline - time.monotonic())))
+    except BaseException:
+        _slots.release()
+        raise
+
+
+def _release_slot(lock_file):
+    lock_file.close()
+    _slots.release()
+
+
+def _collect_stream(response, started):
+    """스트리밍 응답(NDJSON)을 모아 마지막 통계 줄과 함께 반환"""
+    parts, first_token, last_emit, final = [], None, started, {}
+    for line in response.iter_lines():
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise Exception(chunk["error"])
+        piece = chunk.get("response", "")
+        if piece:
+            parts.append(piece)
+            now = time.perf_counter()
+            if first_token is None:
+                first_token = now - started
+            if now - last_emit >= PROGRESS_EVERY:
+                emit("streaming", provider="ollama", chars=sum(len(p) for p in parts))
+                last_emit = now
+        if chunk.get("done"):
+            final = chunk
+            break
+    return dict(final, response="".join(parts)), first_token
+
+
+def generate(prompt, model, options=None, format="json", stream=None, images=None, timeout=None, queue_timeout=None):
+    """/api/generate 호출 → {"response", "prompt_eval_count", "eval_count", ...}. 실패하면 예외
+
+    queue_timeout: 동시 실행 자리를 기다릴 최대 시간 (기본 OLLAMA_QUEUE_TIMEOUT). 폴백할 곳이 없는 배치 작업은 길게 준다.
+    """
+    queue_timeout = OLLAMA_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+    stream = OLLAMA_STREAM if stream is None else stream
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": options or {},
+    }
+    if format:
+        payload["format"] = format
+    if images:
+        payload["images"] = images
+
+    with span("ollama_queue", provider="ollama", model=model):
+        slot = _acquire_slot(queue_timeout)
+    if slot is None:
+        raise OllamaBusy(f"Ollama 동시 실행 한도({OLLAMA_CONCURRENCY}) 초과 — {queue_timeout:g}초 대기 후 포기")
+    try:
+        started = time.perf_counter()
+        first_token = None
+        try:
+            if stream:
+                with client().stream("POST", "/api/generate", json=payload, timeout=timeout or OLLAMA_TIMEOUT) as response:
+                    if response.status_code != 200:
+                        response.read()
+                        record_provider_error("ollama", response.status_code)
+                        response.raise_for_status()
+                    data, first_token = _collect_stream(response, started)
+            else:
+                response = client().post("/api/generate", json=payload, timeout=timeout or OLLAMA_TIMEOUT)
+                if response.status_code != 200:
+                    record_provider_error("ollama", response.status_code)
+                response.raise_for_status()
+                data = response.json()
+        except httpx.ConnectError:
+            _mark_down()
+            raise
+    finally:
+        _release_slot(slot)
+
+    # load_duration 이 크면 모델이 다시 올라온 것 — keep_alive 가 너무 짧다는 신호
+    record_ollama(model, first_token=first_token, load=data.get("load_duration", 0) / 1e9)
+    record_tokens("ollama", data.get("prompt_eval_count", 0), data.get("eval_count", 0))
+    return data
+
+
+def warmup(models):
+    """빈 프롬프트로 모델을 메모리에 올려 둠 (keep_alive 동안 유지). 서버/모델이 없으면 건너뜀"""
+    for model in OLLAMA_WARMUP_MODELS or models:
+        if not available(model):
+            log("INFO", f"Ollama warmup 건너뜀: {model} 없음 ({OLLAMA_BASE_URL})")
+            continue
+        started = time.perf_counter()
+        try:
+            with span("ollama_warmup", provider="ollama", model=model):
+                response = client().post(
+                    "/api/generate",
+                    json={"model": model, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE},
+                    timeout=OLLAMA_TIMEOUT,
+                )
+            response.raise_for_status()
+            log("INFO", f"Ollama warmup: {model} ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            log("WARN", f"Ollama warmup {model}: {e}")
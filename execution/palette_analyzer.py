@@ -0,0 +1,287 @@
+"""
+레퍼런스 이미지 로컬 분석 — 색상 팔레트와 레이아웃(여백/텍스트 블록)을 NumPy 로 계산
+
+비전 LLM 이 hex 코드를 추측하는 대신 픽셀에서 직접 뽑는다 (이미지당 0.1초 안팎, LLM 은 정성적 메모에만 사용).
+
+- 색상: 긴 변 PALETTE_SAMPLE_SIDE px 로 줄인 픽셀을 Lab 공간에서 k-means (벡터화, 시드 고정 → 결정적)
+  · 배경색: 테두리 픽셀에서 가장 많은 군집
+  · 글자색: 배경과 명도 대비가 크고 경계(edge) 위에 많이 놓인 군집
+  · 강조색: 나머지 중 채도가 가장 높은 군집
+- 레이아웃: 배경과의 대비 + 기울기(edge) 지도 → "잉크" 마스크
+  · 여백: 잉크가 처음/마지막으로 나오는 행/열 (가장자리의 끝까지 이어진 테두리 선은 그 줄만 제외)
+  · 텍스트 블록: 행 방향 투영에서 잉크가 이어지는 구간, 블록별 좌우 여백으로 정렬 추정
+  위치/여백은 카드뉴스 캔버스(1080px 폭) 기준 px 로 환산
+- 여러 이미지는 프로세스 풀(PALETTE_WORKERS)로 나눠 분석하고, 합칠 때 ΔE 가 가까운 색은 하나로 묶는다
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from execution.tracing import log
+
+PALETTE_SAMPLE_SIDE = int(os.environ.get("PALETTE_SAMPLE_SIDE", "160"))  # 색상 군집용 (px)
+LAYOUT_SAMPLE_SIDE = int(os.environ.get("LAYOUT_SAMPLE_SIDE", "360"))    # 레이아웃 분석용 (px)
+PALETTE_K = int(os.environ.get("PALETTE_K", "6"))
+PALETTE_WORKERS = int(os.environ.get("PALETTE_WORKERS", "0")) or os.cpu_count() or 1
+
+CANVAS_WIDTH = 1080
+KMEANS_ITERATIONS = 20
+MIN_SHARE = 0.01        # 이보다 작은 군집은 잡음으로 봄
+MERGE_DELTA_E = 6.0     # 이미지 간 합칠 때 같은 색으로 보는 거리
+INK_CONTRAST = 18.0     # 배경과 L* 차이가 이 이상이면 잉크
+EDGE_THRESHOLD = 12.0   # L* 기울기
+BLOCK_GAP = 0.02        # 높이 대비 이 이상 비면 다른 블록
+BORDER_LINE_FILL = 0.95  # 가장자리 띠 안에서 이 비율 이상 잉크로 채워진 행/열 = 테두리 선
+
+
+# ── 색 공간 ──────────────────────────────────────────────────────────────
+_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                 [0.2126729, 0.7151522, 0.0721750],
+                 [0.0193339, 0.1191920, 0.9503041]])
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def rgb_to_lab(rgb):
+    """(..., 3) uint8/0~255 → (..., 3) Lab"""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ _XYZ.T / _WHITE
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def lab_to_rgb(lab):
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f ** 3 > 216 / 24389, f ** 3, (116 * f - 16) / (24389 / 27)) * _WHITE
+    c = xyz @ np.linalg.inv(_XYZ).T
+    c = np.where(c > 0.0031308, 1.055 * np.clip(c, 0, None) ** (1 / 2.4) - 0.055, 12.92 * c)
+    return np.clip(np.round(c * 255), 0, 255).astype(np.uint8)
+
+
+def to_hex(lab):
+    r, g, b = lab_to_rgb(lab)
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+
+# ── k-means ──────────────────────────────────────────────────────────────
+def kmeans(points, k=PALETTE_K, iterations=KMEANS_ITERATIONS, seed=0):
+    """(N, 3) → (중심 (k, 3), 라벨 (N,)). k-means++ 초기화, 시드 고정"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(np.unique(points, axis=0)))
+    centers = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        d2 = ((points[:, None, :] - np.array(centers)[None]) ** 2).sum(-1).min(1)
+        centers.append(points[rng.choice(len(points), p=d2 / d2.sum())])
+    centers = np.array(centers)
+    for _ in range(iterations):
+        labels = ((points[:, None, :] - centers[None]) ** 2).sum(-1).argmin(1)
+        counts = np.bincount(labels, minlength=k)[:, None]
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        moved = np.where(counts > 0, sums / np.maximum(counts, 1), centers)
+        if np.allclose(moved, centers, atol=0.1):
+            centers = moved
+            break
+        centers = moved
+    labels = ((points[:, None, :] - centers[None]) ** 2).sum(-1).argmin(1)
+    return centers, labels
+
+
+def _load(path, side):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image = image.convert("RGB")
+        image.thumbnail((side, side), Image.BILINEAR)
+        return np.asarray(image)
+
+
+def _gradient(lightness):
+    gy, gx = np.gradient(lightness)
+    return np.hypot(gx, gy)
+
+
+def _border(shape, width):
+    mask = np.zeros(shape, dtype=bool)
+    mask[:width], mask[-width:], mask[:, :width], mask[:, -width:] = True, True, True, True
+    return mask
+
+
+# ── 이미지 1장 ───────────────────────────────────────────────────────────
+def analyze_colors(rgb):
+    """{"background", "text", "accent": hex 또는 None, "clusters": [(hex, 비율)]}"""
+    lab = rgb_to_lab(rgb)
+    h, w = lab.shape[:2]
+    centers, labels = kmeans(lab.reshape(-1, 3))
+    labels = labels.reshape(h, w)
+    k = len(centers)
+    share = np.bincount(labels.ravel(), minlength=k) / labels.size
+
+    border = np.bincount(labels[_border((h, w), max(1, min(h, w) // 20))], minlength=k)
+    background = int(border.argmax())
+
+    edges = _gradient(lab[..., 0]) > EDGE_THRESHOLD
+    edge_ratio = np.bincount(labels[edges], minlength=k) / np.maximum(np.bincount(labels.ravel(), minlength=k), 1)
+    contrast = np.abs(centers[:, 0] - centers[background, 0])
+    chroma = np.hypot(centers[:, 1], centers[:, 2])
+
+    candidates = [i for i in range(k) if i != background and share[i] >= MIN_SHARE]
+    text = max(candidates, key=lambda i: contrast[i] * edge_ratio[i] * np.sqrt(share[i]), default=None)
+    rest = [i for i in candidates if i != text and chroma[i] > 20]
+    accent = max(rest, key=lambda i: chroma[i] * np.sqrt(share[i]), default=None)
+
+    order = np.argsort(-share)
+    return {
+        "background": to_hex(centers[background]),
+        "text": to_hex(centers[text]) if text is not None else None,
+        "accent": to_hex(centers[accent]) if accent is not None else None,
+        "clusters": [(to_hex(centers[i]), round(float(share[i]), 3)) for i in order if share[i] >= MIN_SHARE],
+    }
+
+
+def analyze_layout(rgb):
+    """여백(px, 1080 폭 기준)과 텍스트 블록 위치(높이 대비 비율), 정렬 추정"""
+    lab = rgb_to_lab(rgb)
+    h, w = lab.shape[:2]
+    lightness = lab[..., 0]
+    band = max(1, min(h, w) // 20)
+    bg_l = np.median(lightness[_border((h, w), band)])
+    ink = (np.abs(lightness - bg_l) > INK_CONTRAST) | (_gradient(lightness) > EDGE_THRESHOLD)
+    # 테두리 선/프레임은 내용이 아님 — 가장자리 띠 안에서 거의 끝까지 채워진 줄만 지움 (띠 안의 글자는 유지)
+    lines = ink.mean(1) >= BORDER_LINE_FILL
+    lines[band:h - band] = False
+    ink[lines] = False
+    lines = ink.mean(0) >= BORDER_LINE_FILL
+    lines[band:w - band] = False
+    ink[:, lines] = False
+
+    scale = CANVAS_WIDTH / w
+    rows, cols = ink.mean(1), ink.mean(0)
+    row_idx, col_idx = np.flatnonzero(rows > 0.005), np.flatnonzero(cols > 0.005)
+    if not len(row_idx) or not len(col_idx):
+        return {"margins": None, "blocks": [], "align": None}
+    margins = {
+        "top": round(row_idx[0] * scale), "bottom": round((h - 1 - row_idx[-1]) * scale),
+        "left": round(col_idx[0] * scale), "right": round((w - 1 - col_idx[-1]) * scale),
+    }
+
+    # 행 투영 → 잉크가 이어지는 구간 = 텍스트 블록
+    active = rows > 0.01
+    gap = max(1, int(h * BLOCK_GAP))
+    blocks, start, last = [], None, None
+    for y in np.flatnonzero(active):
+        if start is None:
+            start = last = y
+        elif y - last > gap:
+            blocks.append((start, last))
+            start = last = y
+        else:
+            last = y
+    if start is not None:
+        blocks.append((start, last))
+
+    described, offsets = [], []
+    for y0, y1 in blocks:
+        xs = np.flatnonzero(ink[y0:y1 + 1].any(0))
+        left, right = xs[0], w - 1 - xs[-1]
+        offsets.append((left, right))
+        described.append({
+            "top": round(y0 / h, 3), "bottom": round((y1 + 1) / h, 3),
+            "left": round(left * scale), "right": round(right * scale),
+        })
+
+    align = None
+    if offsets:
+        lefts, rights = np.array(offsets, dtype=float).T
+        if np.median(np.abs(lefts - rights)) < w * 0.05:
+            align = "center"
+        elif np.std(lefts) <= np.std(rights):
+            align = "left"
+        else:
+            align = "right"
+    return {"margins": margins, "blocks": described, "align": align}
+
+
+def analyze_image(path):
+    """이미지 1장 → {"path", "colors", "layout"} (프로세스 풀 작업 단위)"""
+    try:
+        return {
+            "path": path,
+            "colors": analyze_colors(_load(path, PALETTE_SAMPLE_SIDE)),
+            "layout": analyze_layout(_load(path, LAYOUT_SAMPLE_SIDE)),
+        }
+    except Exception as e:
+        log("WARN", f"팔레트 분석 실패 ({os.path.basename(path)}): {e}")
+        return None
+
+
+def analyze_images(paths, workers=PALETTE_WORKERS):
+    """경로 순서를 유지한 결과 목록 (실패한 이미지는 제외)"""
+    paths = list(paths)
+    if workers <= 1 or len(paths) <= 1:
+        results = [analyze_image(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            results = list(pool.map(analyze_image, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    return [r for r in results if r]
+
+
+# ── 합치기 ───────────────────────────────────────────────────────────────
+def merge_colors(hexes, limit=8):
+    """ΔE 가 MERGE_DELTA_E 이내인 색을 묶어 빈도순 대표색 목록 (결정적)"""
+    hexes = [h for h in hexes if h]
+    if not hexes:
+        return []
+    values, counts = np.unique(hexes, return_counts=True)
+    order = sorted(range(len(values)), key=lambda i: (-counts[i], values[i]))
+    rgb = np.array([[int(v[i:i + 2], 16) for i in (1, 3, 5)] for v in values])
+    labs = rgb_to_lab(rgb)
+    groups = []  # [대표 인덱스, 합계]
+    for i in order:
+        for group in groups:
+            if np.linalg.norm(labs[i] - labs[group[0]]) <= MERGE_DELTA_E:
+                group[1] += counts[i]
+                break
+        else:
+            groups.append([i, counts[i]])
+    groups.sort(key=lambda g: (-g[1], values[g[0]]))
+    return [str(values[i]) for i, _ in groups[:limit]]
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return int(np.median(values)) if values else None
+
+
+def summarize(results):
+    """learned_design.json 의 color_palette / layout 섹션"""
+    palette = {
+        "배경색들": merge_colors([r["colors"]["background"] for r in results]),
+        "강조색들": merge_colors([r["colors"]["accent"] for r in results]),
+        "텍스트색들": merge_colors([r["colors"]["text"] for r in results]),
+    }
+
+    layouts = [r["layout"] for r in results if r["layout"]["margins"]]
+    if not layouts:
+        return palette, {}
+    margins = {side: _median([l["margins"][side] for l in layouts]) for side in ("top", "bottom", "left", "right")}
+    block_counts = [len(l["blocks"]) for l in layouts]
+    aligns = [l["align"] for l in layouts if l["align"]]
+    align = max(sorted(set(aligns)), key=aligns.count) if aligns else "center"
+    align_label = {"center": "중앙 정렬", "left": "좌측 정렬", "right": "우측 정렬"}[align]
+    tops = [l["blocks"][0]["top"] for l in layouts if l["blocks"]]
+    bottoms = [l["blocks"][-1]["bottom"] for l in layouts if l["blocks"]]
+    horizontal = _median([margins["left"], margins["right"]])
+    vertical = _median([margins["top"], margins["bottom"]])
+    layout = {
+        "슬라이드_구성": f"텍스트 블록 {int(np.median(block_counts))}개 내외",
+        "여백": f"좌우 {horizontal}px, 상하 {vertical}px",
+        "요소_배치": (f"{align_label}, 내용은 상단 {round(float(np.median(tops)) * 100)}% ~ "
+                   f"{round(float(np.median(bottoms)) * 100)}% 구간") if tops else align_label,
+        "margins_px": margins,
+        "align": align,
+    }
+    return palette, layout
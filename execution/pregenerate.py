@@ -0,0 +1,162 @@
+"""
+유휴 시간 트렌드 주제 선생성 (speculative pre-generation)
+
+/api/trends 상위 N개 주제의 리서치 + 기본 슬라이드 수 덱을 서버 키로 미리 만들어
+generation_cache 에 넣어 둔다. 사용자가 같은 주제로 생성하면 즉시 반환된다.
+
+- PREGENERATE_ENABLED=true 일 때만 동작 (기본 꺼짐), 서버 GEMINI_API_KEY 필요
+- 일일 토큰 예산(PREGENERATE_DAILY_TOKENS) 안에서만 실행 — 토큰은 프롬프트/응답 길이로 추정, 실패한 생성은 덱 1개 예상 비용으로 차감
+- 실제 유저 요청이 진행 중이거나 최근 PREGENERATE_IDLE_SECONDS 이내에 있었으면 다음 단계로 넘어가지 않고 대기
+  (유휴 판단은 공유 상태 기준 — 모든 worker 가 갱신하는 활동 시각 파일 + 작업 레지스트리의 진행 중 작업)
+- 리서치/생성은 LLM 풀에서 low_priority 로 실행 → 빈 슬롯이 있을 때만 돌고 유저 요청 앞에 줄 서지 않음
+- worker 가 여러 개면 락을 잡은 한 프로세스만 실행
+"""
+import os
+import sys
+import time
+import asyncio
+import uuid
+from datetime import date
+
+from execution import generation_cache
+from execution.admission import AdmissionRejected, llm_pool
+from execution.filestore import read_json, try_lock, update_json
+from execution.rate_limit import estimate_tokens
+from execution.research_topic import research_topic
+from execution.generate_html_from_text import build_prompt, generate_html
+from execution.tracing import log, set_request_id
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(WORKSPACE, ".tmp", "cache", "pregenerate_budget.json")
+LEADER_PATH = os.path.join(WORKSPACE, ".tmp", "cache", "pregenerate")  # 스케줄러 실행권 락 (예산 파일 락과 분리)
+ACTIVITY_PATH = os.path.join(WORKSPACE, ".tmp", "cache", "user_activity")  # mtime = 마지막 유저 생성 요청 시각
+POOL_KEY = "pregenerate"
+
+PREGENERATE_ENABLED = os.getenv("PREGENERATE_ENABLED", "false").lower() == "true"
+PREGENERATE_TOP_N = int(os.environ.get("PREGENERATE_TOP_N", "3"))
+PREGENERATE_SLIDES = int(os.environ.get("PREGENERATE_SLIDES", "5"))
+PREGENERATE_DAILY_TOKENS = int(os.environ.get("PREGENERATE_DAILY_TOKENS", "150000"))
+PREGENERATE_INTERVAL = int(os.environ.get("PREGENERATE_INTERVAL", "900"))
+PREGENERATE_IDLE_SECONDS = int(os.environ.get("PREGENERATE_IDLE_SECONDS", "60"))
+# 선생성은 급하지 않으므로 로컬 모델(ollama)로 돌려 클라우드 할당량을 아낄 수 있음 (비우면 PROVIDER_ORDER)
+PREGENERATE_PROVIDER = os.environ.get("PREGENERATE_PROVIDER", "") or None
+# 덱 1개 예상 비용 — 실제 사용량이 쌓이면 이동 평균으로 갱신
+DEFAULT_DECK_TOKENS = 20000
+
+
+def tokens_used_today():
+    data = read_json(BUDGET_PATH, {}) or {}
+    return data.get("tokens", 0) if data.get("date") == date.today().isoformat() else 0
+
+
+def charge_tokens(tokens):
+    today = date.today().isoformat()
+
+    def add(data):
+        if data.get("date") != today:
+            data.clear()
+            data["date"] = today
+        data["tokens"] = data.get("tokens", 0) + tokens
+
+    update_json(BUDGET_PATH, add)
+
+
+class PregenerateScheduler:
+    def __init__(self, topics_fn, load_fn, api_key=None):
+        """topics_fn: 현재 트렌드 주제 목록 반환, load_fn: 어느 worker 에서든 유저 작업이 진행 중이면 True"""
+        self.topics_fn = topics_fn
+        self.load_fn = load_fn
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
+        self.avg_deck_tokens = DEFAULT_DECK_TOKENS
+        self.generated = 0
+        self._lock_file = None
+
+    def note_user_activity(self):
+        """요청을 받은 worker 가 호출 — 파일 mtime 으로 남겨 스케줄러를 가진 worker 도 보게 함"""
+        try:
+            os.utime(ACTIVITY_PATH)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(ACTIVITY_PATH), exist_ok=True)
+            open(ACTIVITY_PATH, "a").close()
+
+    @staticmethod
+    def last_user_activity():
+        try:
+            return os.stat(ACTIVITY_PATH).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def is_idle(self):
+        return time.time() - self.last_user_activity() >= PREGENERATE_IDLE_SECONDS and not self.load_fn()
+
+    def budget_left(self):
+        return PREGENERATE_DAILY_TOKENS - tokens_used_today()
+
+    def stats(self):
+        return {
+            "enabled": PREGENERATE_ENABLED and bool(self.api_key),
+            "tokens_used_today": tokens_used_today(),
+            "daily_budget": PREGENERATE_DAILY_TOKENS,
+            "generated": self.generated,
+        }
+
+    async def _wait_idle(self):
+        while not await asyncio.to_thread(self.is_idle):  # load_fn 은 SQLite 를 읽으므로 이벤트 루프 밖에서
+            await asyncio.sleep(5)
+
+    async def _run_idle(self, fn, *args, **kwargs):
+        """유휴 상태가 될 때까지 기다렸다가 LLM 풀 빈 슬롯에서 실행 (슬롯이 없으면 다시 대기)"""
+        while True:
+            await self._wait_idle()
+            try:
+                return await llm_pool.run(POOL_KEY, fn, *args, user_limit=1, low_priority=True, **kwargs)
+            except AdmissionRejected:
+                await asyncio.sleep(5)
+
+    async def pregenerate_topic(self, topic):
+        set_request_id(f"pregen-{uuid.uuid4().hex[:8]}")  # 선생성 로그를 주제별로 묶음
+        research = generation_cache.get_research(topic)
+        tokens = 0
+        try:
+            if research is None:
+                research = await self._run_idle(research_topic, topic, self.api_key)
+                tokens = estimate_tokens(topic, research) + 500  # 리서치 프롬프트 고정분
+                generation_cache.put_research(topic, research)
+
+            # 리서치와 생성 사이에 유저 요청이 들어오면 양보
+            html = await self._run_idle(
+                generate_html, text=research, slides=PREGENERATE_SLIDES, gemini_key=self.api_key,
+                provider=PREGENERATE_PROVIDER,
+            )
+        except Exception:
+            # 실패·잘린 응답도 provider 할당량은 이미 썼음 → 덱 1개 예상 비용으로 차감 (실패가 반복돼도 예산에서 멈춤)
+            charge_tokens(tokens + self.avg_deck_tokens)
+            raise
+        tokens += estimate_tokens(build_prompt(research, PREGENERATE_SLIDES), html)
+        charge_tokens(tokens)
+        generation_cache.put_deck(topic, PREGENERATE_SLIDES, html, source="speculative", tokens=tokens)
+        self.avg_deck_tokens = int(0.7 * self.avg_deck_tokens + 0.3 * tokens)
+        self.generated += 1
+        log("INFO", f"선생성 완료: {topic} (~{tokens} tokens)")
+
+    async def run_once(self):
+        for topic in self.topics_fn()[:PREGENERATE_TOP_N]:
+            if generation_cache.has_deck(topic, PREGENERATE_SLIDES):
+                continue
+            if self.budget_left() < self.avg_deck_tokens:
+                log("INFO", "선생성 일일 토큰 예산 소진 — 내일 재개")
+                return
+            try:
+                await self.pregenerate_topic(topic)
+            except Exception as e:
+                log("WARN", f"선생성 실패 ({topic}): {e}")
+
+    async def run(self):
+        if not PREGENERATE_ENABLED or not self.api_key:
+            return
+        while True:
+            if self._lock_file is None:
+                self._lock_file = try_lock(LEADER_PATH)
+            if self._lock_file is not None:
+                await self.run_once()
+            await asyncio.sleep(PREGENERATE_INTERVAL)
@@ -0,0 +1,32 @@
+"""
+생성 진행 이벤트 전달 (research 시작/완료, provider 시도, 폴백, HTML 파싱 등)
+
+실행 모듈은 emit() 만 호출하고, 이벤트를 어디로 보낼지는 호출한 쪽이 bind() 로 정한다.
+contextvar 기반이라 LLM 풀 스레드(copy_context)까지 그대로 전달되고,
+bind 되지 않은 호출(CLI, 동기 엔드포인트)에서는 아무 일도 하지 않는다.
+"""
+import contextvars
+
+from execution.tracing import log
+
+_sink = contextvars.ContextVar("progress_sink", default=None)
+
+
+def bind(sink):
+    """sink(event, data) 를 현재 컨텍스트에 연결. contextvar 토큰 반환"""
+    return _sink.set(sink)
+
+
+def unbind(token):
+    _sink.reset(token)
+
+
+def emit(event, **data):
+    sink = _sink.get()
+    if sink is None:
+        return
+    try:
+        sink(event, data)
+    except Exception as e:
+        # 진행 이벤트 기록 실패가 생성 자체를 실패시키지 않도록
+        log("WARN", f"progress event '{event}' 기록 실패: {e}")
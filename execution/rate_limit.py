@@ -0,0 +1,201 @@
+"""
+AI provider 호출 앞단의 클라이언트 측 rate limit + 429 재시도
+
+- API 키(해시)별 토큰 버킷 2개: 분당 요청 수(RPM), 분당 토큰 수(TPM)
+  버킷이 비어 있으면 요청을 보내지 않고 잠깐 대기 → provider 쪽 RESOURCE_EXHAUSTED 를 미리 피함
+- 429 를 받으면 같은 모델로 지수 백오프(+지터) 재시도 — Retry-After 헤더와 Gemini retryDelay 힌트를 우선
+  다른 모델로 바로 넘어가 그 모델의 할당량까지 소모하지 않도록, 마감 시간(deadline) 안에서는 기다린다
+- 대기/재시도는 호출 스레드에서 블로킹 (provider 호출은 모두 LLM 풀 스레드나 to_thread 안에서 실행됨)
+"""
+import os
+import re
+import time
+import random
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+
+from execution.metrics import span
+from execution.progress import emit
+from execution.tracing import log
+
+PROVIDER_RETRY_DEADLINE = float(os.environ.get("PROVIDER_RETRY_DEADLINE", "60"))  # 초
+PROVIDER_RETRY_BASE = float(os.environ.get("PROVIDER_RETRY_BASE", "2"))
+PROVIDER_RETRY_MAX_DELAY = float(os.environ.get("PROVIDER_RETRY_MAX_DELAY", "30"))
+
+# provider 별 (RPM, TPM) — 키 등급에 맞게 환경변수로 조정
+PROVIDER_LIMITS = {
+    "gemini": (int(os.environ.get("GEMINI_RPM", "15")), int(os.environ.get("GEMINI_TPM", "1000000"))),
+    "claude": (int(os.environ.get("CLAUDE_RPM", "50")), int(os.environ.get("CLAUDE_TPM", "40000"))),
+    "openai": (int(os.environ.get("OPENAI_RPM", "500")), int(os.environ.get("OPENAI_TPM", "30000"))),
+}
+
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+class RateLimitTimeout(Exception):
+    """마감 시간 안에 호출 기회를 얻지 못함"""
+
+    def __init__(self, provider, retry_after):
+        super().__init__(f"{provider}: 요청 한도 초과 (RESOURCE_EXHAUSTED) — 약 {int(retry_after) + 1}초 후 다시 시도해주세요")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def estimate_tokens(*texts):
+    """대략적인 토큰 수 추정 (한글 혼합 텍스트 ≈ 2.5자/토큰)"""
+    return int(sum(len(t or "") for t in texts) / 2.5)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """amount 만큼 꺼내려면 기다려야 하는 시간 (버킷 용량보다 큰 요청은 가득 찰 때까지만 대기)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    def __init__(self, provider, rpm, tpm):
+        self.provider = provider
+        self.requests = TokenBucket(rpm)
+        self.token_budget = TokenBucket(tpm)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens, deadline):
+        """요청 1건 + tokens 만큼 버킷에서 꺼냄. 마감 전에 못 꺼내면 RateLimitTimeout"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.token_budget.wait_time(tokens, now))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.token_budget.take(tokens)
+                    return
+            if now + wait > deadline:
+                raise RateLimitTimeout(self.provider, wait)
+            with span("rate_limit_wait", provider=self.provider):
+                time.sleep(min(wait, 5.0))
+
+    def penalize(self):
+        """429 를 받으면 요청 버킷을 비워 같은 키의 다른 요청도 잠시 멈추게 함"""
+        with self._lock:
+            self.requests.tokens = min(self.requests.tokens, 0.0)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(provider, api_key):
+    key_id = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    with _limiters_lock:
+        limiter = _limiters.get((provider, key_id))
+        if limiter is None:
+            rpm, tpm = PROVIDER_LIMITS.get(provider, (60, 1000000))
+            limiter = _limiters[(provider, key_id)] = ProviderLimiter(provider, rpm, tpm)
+        return limiter
+
+
+# ── 429 판별 / 재시도 힌트 ────────────────────────────────────────────────
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_hint(response=None, error=None):
+    """Retry-After / retry-after-ms 헤더 또는 Gemini RetryInfo.retryDelay 에서 대기 시간(초) 추출"""
+    headers = getattr(response, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if headers:
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000.0
+            except ValueError:
+                pass
+        hint = _parse_retry_after(headers.get("retry-after"))
+        if hint is not None:
+            return hint
+
+    text = ""
+    if response is not None:
+        try:
+            text = response.text
+        except Exception:
+            text = ""
+    if error is not None:
+        text += " " + str(getattr(error, "details", "") or "") + " " + str(error)
+    match = _RETRY_DELAY_RE.search(text)
+    return float(match.group(1)) if match else None
+
+
+def is_rate_limited(response=None, error=None):
+    if response is not None:
+        return getattr(response, "status_code", None) == 429
+    if error is not None:
+        code = getattr(error, "code", None) or getattr(getattr(error, "response", None), "status_code", None)
+        return code == 429 or "RESOURCE_EXHAUSTED" in str(error)
+    return False
+
+
+def backoff_delay(attempt, hint=None):
+    if hint is not None:
+        # 서버가 알려 준 시간은 지키되, 동시에 깨어난 요청이 몰리지 않게 약간의 지터만 추가
+        return hint + random.uniform(0, 1.0)
+    return min(PROVIDER_RETRY_MAX_DELAY, PROVIDER_RETRY_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def call_with_retry(provider, api_key, send, tokens=0, deadline=None):
+    """rate limit 을 통과한 뒤 send() 실행, 429 면 마감 시간까지 백오프 재시도
+
+    send 는 httpx.Response 를 반환하거나(REST) 예외를 던지는(SDK) 함수.
+    429 가 아닌 응답/예외는 그대로 호출자에게 돌려준다.
+    마지막 시도도 429 면 REST 는 그 응답을 반환, SDK 는 예외를 다시 던진다.
+    """
+    deadline = deadline or time.monotonic() + PROVIDER_RETRY_DEADLINE
+    limiter = limiter_for(provider, api_key)
+    attempt = 0
+    while True:
+        limiter.acquire(tokens, deadline)
+        response, error = None, None
+        try:
+            response = send()
+        except Exception as e:
+            if not is_rate_limited(error=e):
+                raise
+            error = e
+
+        if not is_rate_limited(response, error):
+            return response
+
+        limiter.penalize()
+        delay = backoff_delay(attempt, retry_hint(response, error))
+        if time.monotonic() + delay > deadline:
+            if error is not None:
+                raise error
+            return response
+        log("WARN", f"{provider} 429 — {delay:.1f}s 후 재시도 (#{attempt + 1})")
+        emit("rate_limited", provider=provider, retry_in=round(delay, 1))
+        with span("rate_limit_wait", provider=provider):
+            time.sleep(delay)
+        attempt += 1
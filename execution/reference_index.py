@@ -0,0 +1,214 @@
+"""
+레퍼런스 이미지 라이브러리 인덱스 — 지각 해시(pHash), 크기, 썸네일 캐시, 유사 이미지 묶음
+
+- 인덱스/썸네일은 레퍼런스 폴더(--dir)마다 따로 둔다: .tmp/cache/references/<폴더 경로 해시>/
+  (폴더를 바꿔 실행해도 다른 폴더의 인덱스를 덮어쓰거나 그 썸네일을 지우지 않음)
+- 인덱스(index.json): 파일 이름별 {크기/mtime, sha256, 가로/세로, phash, 썸네일}
+  update() 는 크기/mtime 이 바뀐 파일만 다시 읽고, 사라진 파일은 항목과 썸네일을 지운다
+- 썸네일(thumbs/): 긴 변 REFERENCE_THUMB_SIDE px JPEG — 학습/팔레트 분석은 원본 대신 이것을 읽음
+- pHash: 32x32 흑백 → 2D DCT → 저주파 8x8 계수의 중앙값 비교 (64비트). 묶음 안의 모든 쌍이 해밍 거리
+  REFERENCE_DUP_DISTANCE 이하인 이미지끼리만 한 묶음 (complete linkage — 조금씩 다른 이미지가 사슬처럼
+  이어져 서로 전혀 다른 이미지까지 묶이지 않음) → 묶음마다 대표 1장(가장 큰 해상도)만 분석
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+import numpy as np
+
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.filestore import atomic_write_json, file_lock, read_json
+from execution.tracing import log
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE_DIR = os.path.join(os.path.dirname(__file__), "references")
+CACHE_DIR = os.path.join(WORKSPACE, ".tmp", "cache", "references")
+
+REFERENCE_THUMB_SIDE = int(os.environ.get("REFERENCE_THUMB_SIDE", "768"))  # px
+REFERENCE_DUP_DISTANCE = int(os.environ.get("REFERENCE_DUP_DISTANCE", "8"))  # 64비트 중 다른 비트 수
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+INDEX_VERSION = 1  # 해시/썸네일 방식을 바꾸면 올려서 전체 재계산
+
+
+# ── 지각 해시 ─────────────────────────────────────────────────────────────
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def phash(image):
+    """PIL 이미지 → 64비트 pHash (16자리 hex)"""
+    from PIL import Image
+
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT32 @ pixels @ _DCT32.T)[:8, :8]
+    bits = (low > np.median(low.ravel()[1:])).ravel()  # DC 성분은 밝기 평균이라 중앙값 계산에서 제외
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _bits(hashes):
+    """hex 해시 목록 → (N, 64) bool 배열"""
+    values = np.array([int(h, 16) for h in hashes], dtype=np.uint64)
+    return ((values[:, None] >> np.arange(63, -1, -1, dtype=np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def clusters(hashes, distance=REFERENCE_DUP_DISTANCE):
+    """모든 쌍의 해밍 거리가 distance 이하인 이미지 묶음 (complete linkage). 입력 인덱스 목록의 목록
+
+    입력 순서대로 보며, 묶음의 모든 이미지와 가까운 첫 묶음에 넣고 없으면 새 묶음 (같은 입력이면 같은 결과)
+    """
+    n = len(hashes)
+    if not n:
+        return []
+    bits = _bits(hashes)
+    close = (bits[:, None, :] != bits[None, :, :]).sum(-1) <= distance
+    groups = []
+    for i in range(n):
+        for group in groups:
+            if close[i, group].all():
+                group.append(i)
+                break
+        else:
+            groups.append([i])
+    return groups
+
+
+# ── 인덱스 ────────────────────────────────────────────────────────────────
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir(directory):
+    """레퍼런스 폴더별 인덱스/썸네일 위치 (절대 경로 해시로 구분)"""
+    key = hashlib.sha1(os.path.realpath(directory).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, key)
+
+
+class ReferenceIndex:
+    def __init__(self, directory=REFERENCE_DIR, path=None, thumb_dir=None):
+        self.directory = directory
+        self.path = path or os.path.join(cache_dir(directory), "index.json")
+        self.thumb_dir = thumb_dir or os.path.join(cache_dir(directory), "thumbs")
+        self.data = {"version": INDEX_VERSION, "entries": {}, "clusters": []}
+
+    def _thumb_path(self, sha):
+        return os.path.join(self.thumb_dir, f"{sha[:32]}-{REFERENCE_THUMB_SIDE}.jpg")
+
+    def _describe(self, path, stat):
+        """파일 1개를 읽어 sha256 / 크기 / pHash / 썸네일 계산"""
+        from PIL import Image
+
+        sha = _sha256(path)
+        thumb = self._thumb_path(sha)
+        with Image.open(path) as image:
+            width, height = image.size
+            rgb = image.convert("RGB")
+            if not os.path.exists(thumb):
+                small = rgb.copy()
+                small.thumbnail((REFERENCE_THUMB_SIDE, REFERENCE_THUMB_SIDE), Image.LANCZOS)
+                os.makedirs(self.thumb_dir, exist_ok=True)
+                tmp = f"{thumb}.{os.getpid()}.tmp"
+                small.save(tmp, format="JPEG", quality=90)
+                os.replace(tmp, thumb)
+            return {
+                "size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha,
+                "width": width, "height": height, "phash": phash(rgb), "thumb": os.path.basename(thumb),
+            }
+
+    def update(self):
+        """폴더와 인덱스를 맞춤 (바뀐 파일만 다시 계산). 반환: (추가/변경 수, 삭제 수)"""
+        with file_lock(self.path):
+            stored = read_json(self.path) or {}
+            entries = stored.get("entries", {}) if stored.get("version") == INDEX_VERSION else {}
+            names = sorted(n for n in os.listdir(self.directory) if n.lower().endswith(IMAGE_EXTENSIONS)) \
+                if os.path.isdir(self.directory) else []
+
+            changed = 0
+            fresh = {}
+            for name in names:
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entry = entries.get(name)
+                if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime \
+                        and os.path.exists(os.path.join(self.thumb_dir, entry["thumb"])):
+                    fresh[name] = entry
+                    continue
+                try:
+                    fresh[name] = self._describe(path, stat)
+                    changed += 1
+                except Exception as e:
+                    log("WARN", f"레퍼런스 인덱싱 실패 ({name}): {e}")
+            removed = len(set(entries) - set(fresh))
+
+            ordered = sorted(fresh)
+            groups = clusters([fresh[n]["phash"] for n in ordered])
+            self.data = {
+                "version": INDEX_VERSION,
+                "entries": fresh,
+                "clusters": sorted(([ordered[i] for i in g] for g in groups), key=lambda g: g[0]),
+            }
+            if changed or removed or stored.get("clusters") != self.data["clusters"]:
+                atomic_write_json(self.path, self.data)
+            self._prune_thumbs()
+        return changed, removed
+
+    def _prune_thumbs(self):
+        """인덱스에 없는 썸네일 삭제 (레퍼런스가 지워졌거나 내용이 바뀐 경우)"""
+        if not os.path.isdir(self.thumb_dir):
+            return
+        keep = {entry["thumb"] for entry in self.data["entries"].values()}
+        for name in os.listdir(self.thumb_dir):
+            if name not in keep and not name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.thumb_dir, name))
+                except OSError:
+                    pass
+
+    def thumbnail(self, name):
+        return os.path.join(self.thumb_dir, self.data["entries"][name]["thumb"])
+
+    def representatives(self):
+        """묶음마다 대표 1장 (해상도가 가장 큰 것, 같으면 이름순) → [(이름, 묶음 크기)]"""
+        entries = self.data["entries"]
+        picked = []
+        for group in self.data["clusters"]:
+            best = min(group, key=lambda n: (-entries[n]["width"] * entries[n]["height"], n))
+            picked.append((best, len(group)))
+        return sorted(picked)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=REFERENCE_DIR)
+    args = parser.parse_args()
+
+    index = ReferenceIndex(args.dir)
+    changed, removed = index.update()
+    entries = index.data["entries"]
+    log("INFO", f"레퍼런스 {len(entries)}개 (새로 계산 {changed}, 삭제 {removed}), "
+                f"묶음 {len(index.data['clusters'])}개")
+    duplicates = [g for g in index.data["clusters"] if len(g) > 1]
+    print(json.dumps({"duplicates": duplicates, "representatives": [n for n, _ in index.representatives()]},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,216 @@
 import os
 import sys
 import argparse
-import json
-import re
-import httpx
 from dotenv import load_dotenv
 
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution import ollama_client
+from execution.deck import is_single_slide, parse_deck, target_slides
+from execution.html_extract import parse_json
+from execution.metrics import record_tokens, span
+from execution.rate_limit import call_with_retry, estimate_tokens
+from execution.style_rules import apply_style_request
+from execution.tracing import log
+
 load_dotenv()
 
-OLLAMA_BASE_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gemma3:12b")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+GEMINI_REFINE_MODEL = "gemini-2.0-flash-lite"
 
 
-def refine_with_ollama(html, request):
-    prompt = f"""You are an expert HTML editor. Modify the following Instagram Card News HTML based on the user's request.
-
-USER REQUEST: {request}
-
-CURRENT HTML:
-{html}
-
-=== RULES ===
-1. Output ONLY valid JSON: {{"html": "..."}}
-2. Apply the user's requested changes precisely
-3. Keep the overall structure and number of slides the same
-4. NEVER use <img> tags. CSS only.
-5. Maintain all existing styles unless directly related to the change
+def _parse_json(raw):
+    # 잘린 응답이면 마지막으로 완성된 슬라이드 수정본까지만 사용 (잘린 HTML 조각은 버림)
+    return parse_json(raw, partial_strings=False)
 
-Now output the modified HTML as JSON:"""
 
+def ask_ollama(prompt, num_predict=12000):
+    """Ollama 에 JSON 응답 요청. 서버/모델이 없거나 실패하면 None"""
+    if not ollama_client.available(OLLAMA_MODEL):
+        return None
     try:
-        response = httpx.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json",
-                "options": {"temperature": 0.3, "num_predict": 12000}
-            },
-            timeout=180.0
-        )
-        response.raise_for_status()
-        result = response.json()
-        raw = result.get("response", "").strip()
-
-        if "```json" in raw:
-            match = re.search(r'```json\s*(.*?)\s*```', raw, re.DOTALL)
-            if match:
-                raw = match.group(1)
-        elif not (raw.startswith("{") and raw.endswith("}")):
-            start, end = raw.find("{"), raw.rfind("}")
-            if start != -1 and end != -1:
-                raw = raw[start:end+1]
-
-        parsed = json.loads(raw)
-        return parsed.get("html", "")
+        with span("refine_call", provider="ollama", model=OLLAMA_MODEL):
+            data = ollama_client.generate(
+                prompt, OLLAMA_MODEL,
+                options={"temperature": 0.3, "num_predict": num_predict},
+                timeout=180.0,
+            )
+        return _parse_json(data.get("response", ""))
     except Exception as e:
-        print(f"Ollama refine error: {e}", file=sys.stderr)
+        log("ERROR", f"Ollama refine error: {e}")
         return None
 
 
-def refine_with_gemini(html, request):
+def ask_gemini(prompt, api_key=None):
+    """Gemini 에 JSON 응답 요청. 실패하면 None"""
+    api_key = api_key or GEMINI_API_KEY
     try:
         from google import genai
         from google.genai import types
 
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        prompt = f"""Modify this Instagram Card News HTML based on the request.
-REQUEST: {request}
-HTML: {html}
-Rules: No <img> tags. Output ONLY JSON: {{"html": "..."}}"""
-
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-lite",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                temperature=0.3,
+        client = genai.Client(api_key=api_key)
+        with span("refine_call", provider="gemini", model=GEMINI_REFINE_MODEL):
+            response = call_with_retry(
+                "gemini", api_key,
+                lambda: client.models.generate_content(
+                    model=GEMINI_REFINE_MODEL,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json",
+                        temperature=0.3,
+                    )
+                ),
+                tokens=estimate_tokens(prompt),
             )
-        )
-        parsed = json.loads(response.text.strip())
-        return parsed.get("html", "")
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            record_tokens("gemini", usage.prompt_token_count or 0, usage.candidates_token_count or 0)
+        return _parse_json(response.text)
     except Exception as e:
-        print(f"Gemini refine error: {e}", file=sys.stderr)
+        log("ERROR", f"Gemini refine error: {e}")
         return None
 
 
-def refine_html(html, request):
-    print(f"[INFO] Refining with Ollama ({OLLAMA_MODEL})...", file=sys.stderr)
-    result = refine_with_ollama(html, request)
+def _ask(prompt, api_key=None, num_predict=12000):
+    log("INFO", f"Refining with Ollama ({OLLAMA_MODEL})...")
+    result = ask_ollama(prompt, num_predict)
     if result:
-        print("[INFO] Ollama refinement succeeded!", file=sys.stderr)
+        log("INFO", "Ollama refinement succeeded!")
         return result
 
-    if GEMINI_API_KEY:
-        print("[INFO] Trying Gemini fallback...", file=sys.stderr)
-        result = refine_with_gemini(html, request)
-        if result:
-            return result
+    if api_key or GEMINI_API_KEY:
+        log("INFO", "Trying Gemini fallback...")
+        return ask_gemini(prompt, api_key)
+    return None
+
+
+# ── 슬라이드 단위 수정 ────────────────────────────────────────────────────
+def build_slide_prompt(style, slides, request, total):
+    """대상 슬라이드 + 공유 스타일만 담은 프롬프트 (덱 전체를 보내지 않음)"""
+    parts = "\n\n".join(f"<!-- SLIDE {n} / {total} -->\n{html}" for n, html in slides.items())
+    return f"""You are an expert HTML editor. Edit slides of an Instagram Card News deck ({total} slides, 1080x1350) based on the user's request.
+
+USER REQUEST: {request}
+
+SHARED CSS (used by every slide, read-only context):
+{style or "(none)"}
+
+SLIDES TO EDIT:
+{parts}
 
-    print("Error: Refinement failed.", file=sys.stderr)
-    sys.exit(1)
+=== RULES ===
+1. Output ONLY valid JSON: {{"slides": [{{"slide": <number>, "html": "<the full edited slide element>"}}], "css": "<extra CSS rules or empty string>"}}
+2. Return ONLY the slides you actually changed. Each "html" must be exactly ONE complete slide element, keeping its outer tag and size.
+3. Apply the user's requested changes precisely. Keep everything else (text, structure, styles) unchanged.
+4. If the change is deck-wide styling (colors, fonts), you may put override rules in "css" instead of editing every slide. Do not repeat the shared CSS.
+5. NEVER use <img> tags. CSS only.
+
+Now output the JSON:"""
+
+
+def refine_with_rules(html, request, targets=None):
+    """규칙 엔진으로 처리 가능한 요청이면 결과 반환, 아니면 None (LLM 호출 없음)"""
+    with span("refine_rules"):
+        fast = apply_style_request(html, request, targets)
+    if not fast:
+        return None
+    log("INFO", f"규칙 기반 수정 적용: {fast['actions']}")
+    return {"html": fast["html"], "changed": fast["changed"], "mode": "rules"}
+
+
+def refine_slides(html, request, targets=None, api_key=None, rules=True):
+    """요청과 관련된 슬라이드만 LLM 에 보내 수정하고 원래 자리에 끼워 넣음
+
+    targets: 수정할 슬라이드 번호(1부터). 없으면 요청 문장에서 추출, 그래도 없으면 전체 슬라이드.
+    색상/글자 크기/폰트/정렬/여백 같은 단순 요청은 규칙 엔진(style_rules)으로 LLM 없이 처리.
+    반환: {"html", "changed": [슬라이드 번호], "mode": "rules" | "slides" | "document"}
+    """
+    if rules:
+        fast = refine_with_rules(html, request, targets)
+        if fast:
+            return fast
+
+    deck = parse_deck(html)
+    if not len(deck):
+        # 슬라이드 구조를 못 찾은 덱은 문서 전체를 수정
+        return {"html": refine_html(html, request, api_key), "changed": [], "mode": "document"}
+
+    total = len(deck)
+    targets = sorted(n for n in (targets or []) if 1 <= n <= total) or target_slides(request, total)
+    sent = {n: deck.slide(n) for n in (targets or range(1, total + 1))}
+    log("INFO", f"Refining slides {list(sent)} of {total}")
+
+    prompt = build_slide_prompt(deck.style, sent, request, total)
+    # 응답 길이는 보낸 슬라이드 분량에 비례 — 덱 전체 기준의 고정 한도를 쓰지 않음
+    num_predict = min(12000, estimate_tokens(*sent.values()) * 2 + 1000)
+    result = _ask(prompt, api_key, num_predict)
+    if not result:
+        raise Exception("Refinement failed.")
+
+    edits = {}
+    for item in result.get("slides") or []:
+        try:
+            number = int(item.get("slide"))
+        except (TypeError, ValueError):
+            continue
+        fragment = (item.get("html") or "").strip()
+        if number not in sent or not fragment:
+            continue
+        if not is_single_slide(fragment):
+            log("WARN", f"슬라이드 {number} 수정본이 슬라이드 1장 형태가 아니어서 무시")
+            continue
+        if fragment != sent[number].strip():
+            edits[number] = fragment
+    css = result.get("css") or ""
+    if not isinstance(css, str):
+        css = ""
+
+    if not edits and not css.strip():
+        raise Exception("Refinement produced no changes.")
+    return {"html": deck.splice(edits, css), "changed": sorted(edits), "mode": "slides"}
+
+
+def refine_html(html, request, api_key=None):
+    """문서 전체 수정 (슬라이드를 찾지 못한 HTML 용)"""
+    prompt = f"""You are an expert HTML editor. Modify the following Instagram Card News HTML based on the user's request.
+
+USER REQUEST: {request}
+
+CURRENT HTML:
+{html}
+
+=== RULES ===
+1. Output ONLY valid JSON: {{"html": "..."}}
+2. Apply the user's requested changes precisely
+3. Keep the overall structure and number of slides the same
+4. NEVER use <img> tags. CSS only.
+5. Maintain all existing styles unless directly related to the change
+
+Now output the modified HTML as JSON:"""
+
+    result = _ask(prompt, api_key)
+    if result and result.get("html"):
+        return result["html"]
+
+    # 서버 안에서 호출되므로 sys.exit 대신 예외로 알림 (CLI 는 __main__ 에서 종료 코드 처리)
+    raise Exception("Refinement failed.")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--html", required=True, help="Path to HTML file")
     parser.add_argument("--request", required=True, help="Refinement request")
+    parser.add_argument("--slides", type=int, nargs="*", help="Slide numbers to edit (1-based)")
     args = parser.parse_args()
 
     with open(args.html, "r", encoding="utf-8") as f:
         current_html = f.read()
 
-    refined = refine_html(current_html, args.request)
-    print(refined)
+    try:
+        refined = refine_slides(current_html, args.request, targets=args.slides)
+    except Exception as e:
+        log("ERROR", f"Error: {e}")
+        sys.exit(1)
+    print(refined["html"])
@@ -0,0 +1,66 @@
+"""
+서버 프로세스 안에서 재사용하는 Chromium 브라우저 (Playwright)
+
+export 요청마다 Chromium 을 새로 띄우는 대신, 한 번 띄운 브라우저에서 페이지만 열고 닫는다.
+서버 기동 직후 백그라운드에서 warmup() 으로 미리 띄워 둘 수 있다.
+동시 페이지 수는 admission.render_pool 슬롯으로 제한한다.
+"""
+import asyncio
+
+from execution.metrics import span
+from execution.tracing import log
+
+
+class BrowserPool:
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self):
+        return self._browser is not None and self._browser.is_connected()
+
+    async def browser(self):
+        async with self._lock:
+            if not self.ready:
+                # playwright 는 첫 사용 시점에 import (서버 기동 시간 단축)
+                from playwright.async_api import async_playwright
+
+                with span("render_launch"):
+                    if self._playwright is None:
+                        self._playwright = await async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch()
+                log("INFO", "Chromium 브라우저 풀 준비 완료")
+        return self._browser
+
+    async def warmup(self):
+        try:
+            await self.browser()
+        except Exception as e:
+            log("WARN", f"브라우저 풀 warmup 실패 (요청 시 서브프로세스로 렌더링): {e}")
+
+    async def capture(self, html_path, output_dir):
+        from execution.export_slides_to_png import capture_slides
+
+        browser = await self.browser()
+        return await capture_slides(html_path, output_dir, browser=browser)
+
+    async def fit(self, html):
+        """글자 넘침 맞춤 (text_fit) — 캡처와 같은 브라우저에서 페이지 1개로"""
+        from execution.text_fit import fit_html
+
+        browser = await self.browser()
+        return await fit_html(html, browser)
+
+    async def close(self):
+        async with self._lock:
+            if self._browser is not None:
+                await self._browser.close()
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+browser_pool = BrowserPool()
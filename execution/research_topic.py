@@ -2,9 +2,17 @@ import os
 import sys
 import argparse
 import json
+import time
 import httpx
 from dotenv import load_dotenv
 
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.metrics import record_tokens, span
+from execution.rate_limit import PROVIDER_RETRY_DEADLINE, call_with_retry, estimate_tokens
+from execution.tracing import log
+
 load_dotenv()
 
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
@@ -12,8 +20,7 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 def research_topic(topic, api_key=None):
     key = api_key or GEMINI_API_KEY
     if not key:
-        error_msg = "[ERROR] Gemini API 키가 없어 자료 조사를 수행할 수 없습니다. 설정에서 키를 입력해주세요."
-        print(error_msg, file=sys.stderr)
+        log("ERROR", "Gemini API 키가 없어 자료 조사를 수행할 수 없습니다. 설정에서 키를 입력해주세요.")
         # 생성 단계에서 에러를 내기 위해 일단 원본 텍스트를 반환하거나 에러를 던질 수 있음
         # 여기서는 원본을 반환하되 로그를 명확히 남깁니다.
         return topic
@@ -22,7 +29,7 @@ def research_topic(topic, api_key=None):
         from google import genai
         from google.genai import types
         
-        print(f"[INFO] Researching topic: {topic}...", file=sys.stderr)
+        log("INFO", f"Researching topic: {topic}...")
         # Google Search Grounding 은 v1beta 에서만 지원됨 → v1beta 명시 또는 기본값 사용
         # gemini-2.0-flash 등 최신 모델도 v1beta 에서만 제공되므로 v1 사용 금지
         client = genai.Client(
@@ -47,27 +54,37 @@ def research_topic(topic, api_key=None):
             "gemini-2.0-flash-lite",
             "gemini-1.5-flash",
         ]
+        deadline = time.monotonic() + PROVIDER_RETRY_DEADLINE
         for model_id in models:
             try:
-                print(f"[INFO] Researching with {model_id} (Google Search enabled)...", file=sys.stderr)
+                log("INFO", f"Researching with {model_id} (Google Search enabled)...")
                 # 구글 검색(Grounding) 기능 활성화하여 최신 정보 반영
-                response = client.models.generate_content(
-                    model=model_id,
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        tools=[types.Tool(google_search=types.GoogleSearch())],
-                        temperature=0.3
+                with span("research_call", provider="gemini", model=model_id):
+                    # 429 시 같은 모델로 Retry-After/retryDelay 만큼 기다렸다 재시도
+                    response = call_with_retry(
+                        "gemini", key,
+                        lambda: client.models.generate_content(
+                            model=model_id,
+                            contents=prompt,
+                            config=types.GenerateContentConfig(
+                                tools=[types.Tool(google_search=types.GoogleSearch())],
+                                temperature=0.3
+                            )
+                        ),
+                        tokens=estimate_tokens(prompt), deadline=deadline,
                     )
-                )
+                usage = getattr(response, "usage_metadata", None)
+                if usage:
+                    record_tokens("gemini", usage.prompt_token_count or 0, usage.candidates_token_count or 0)
                 return response.text.strip()
             except Exception as e:
-                print(f"[WARN] Research with {model_id} failed: {e}", file=sys.stderr)
+                log("WARN", f"Research with {model_id} failed: {e}")
                 continue
         
-        print(f"[ERROR] All research models failed", file=sys.stderr)
+        log("ERROR", f"All research models failed")
         return topic
     except Exception as e:
-        print(f"[ERROR] Research failed: {e}", file=sys.stderr)
+        log("ERROR", f"Research failed: {e}")
         return topic
 
 if __name__ == "__main__":
@@ -0,0 +1,438 @@
+"""
+단순한 스타일 수정 요청을 LLM 없이 바로 적용하는 규칙 엔진
+
+"배경을 남색으로", "제목 더 크게", "폰트 나눔명조로", "가운데 정렬", "여백 좁게" 같은 요청은
+덱의 인라인 style 속성과 <style> 블록 선언을 직접 고쳐서 수 ms 안에 처리한다.
+요청을 쉼표/그리고 단위로 나눠 모든 절이 규칙에 맞을 때만 적용하고,
+하나라도 해석하지 못하면 None 을 반환해 LLM 수정(refine_slides)으로 넘긴다.
+
+색 변경은 "색/컬러" 를 직접 말하거나, 색 이름이 "…을 <색>으로" 의 목적어 전체일 때만 인정한다
+("제목을 레드와인 추천으로" 처럼 색 단어가 들어간 문구 수정은 LLM 으로). 제목/글자는 문구를 바꾸는
+요청과 헷갈리기 쉬워 "색" 을 말해야만 하고, 따옴표 안 글자는 색으로 읽지 않는다.
+
+제목/본문 구분은 태그가 아니라 글자 크기로 한다 — 생성된 덱은 대부분 인라인 스타일의 div 라서
+범위(슬라이드 또는 스타일 블록) 안에서 가장 큰 글자 크기의 70% 이상이면 제목으로 본다.
+"""
+import re
+
+from execution.deck import parse_deck, target_slides
+
+TITLE_MIN_PX = 32
+TITLE_RATIO = 0.7
+
+COLOR_NAMES = [
+    (r"남색|네이비|navy", "#1e3a8a"),
+    (r"하늘색|스카이", "#38bdf8"),
+    (r"검정|검은|까만|블랙|black", "#111111"),
+    (r"흰색|하얀|흰|화이트|white", "#ffffff"),
+    (r"빨간|빨강|레드|red", "#e11d48"),
+    (r"파란|파랑|블루|blue", "#2563eb"),
+    (r"초록|녹색|그린|green", "#16a34a"),
+    (r"민트|mint", "#2dd4bf"),
+    (r"노란|노랑|옐로|yellow", "#facc15"),
+    (r"주황|오렌지|orange", "#f97316"),
+    (r"보라|퍼플|purple", "#7c3aed"),
+    (r"분홍|핑크|pink", "#ec4899"),
+    (r"회색|그레이|gray|grey", "#6b7280"),
+    (r"베이지|beige", "#f5f0e6"),
+    (r"갈색|브라운|brown", "#92400e"),
+    (r"금색|골드|gold", "#d4af37"),
+    (r"은색|실버|silver", "#c0c0c0"),
+]
+
+_GF = "https://fonts.googleapis.com/css2?family={}&display=swap"
+FONTS = [
+    (r"나눔\s*고딕|nanum\s*gothic", "'Nanum Gothic'", _GF.format("Nanum+Gothic:wght@400;700;800")),
+    (r"나눔\s*명조|nanum\s*myeongjo", "'Nanum Myeongjo'", _GF.format("Nanum+Myeongjo:wght@400;700;800")),
+    (r"나눔\s*(?:펜|손글씨)", "'Nanum Pen Script'", _GF.format("Nanum+Pen+Script")),
+    (r"고운\s*돋움", "'Gowun Dodum'", _GF.format("Gowun+Dodum")),
+    (r"고운\s*바탕", "'Gowun Batang'", _GF.format("Gowun+Batang:wght@400;700")),
+    (r"블랙\s*한\s*산스|black\s*han\s*sans", "'Black Han Sans'", _GF.format("Black+Han+Sans")),
+    (r"도현|do\s*hyeon", "'Do Hyeon'", _GF.format("Do+Hyeon")),
+    (r"주아|jua", "'Jua'", _GF.format("Jua")),
+    (r"프리텐다드|pretendard", "'Pretendard'",
+     "https://cdn.jsdelivr.net/gh/orioncactus/pretendard@v1.3.9/dist/web/static/pretendard.min.css"),
+    (r"노토\s*세리프|본명조|명조체?|noto\s*serif|serif", "'Noto Serif KR'", _GF.format("Noto+Serif+KR:wght@400;700;900")),
+    (r"노토\s*산스|본고딕|고딕체?|noto\s*sans|sans", "'Noto Sans KR'", _GF.format("Noto+Sans+KR:wght@300;400;700;900")),
+]
+
+# 내용 자체를 바꾸는 요청은 규칙으로 처리하지 않음
+_CONTENT_RE = re.compile(r"내용|문구|문장|카피|추가|삭제|지워|빼|넣어|써\s*줘|작성|요약|번역|순서|바꿔\s*써|다시\s*써|이미지|사진|아이콘")
+_CLAUSE_SPLIT_RE = re.compile(r"\s*(?:,|，|/|그리고|하고|\s및\s|&|\n)\s*")
+_QUOTED_RE = re.compile(r'"[^"]*"|“[^”]*”|\'[^\']*\'|‘[^’]*’|「[^」]*」')
+_COLOR_CUE_RE = re.compile(r"색|컬러|color", re.IGNORECASE)
+_OBJECT_RE = re.compile(r"(?<!\S)(\S+?)\s*(?:으로|로)(?=\s|$)")
+_HEX_RE = re.compile(r"#([0-9a-fA-F]{6}|[0-9a-fA-F]{3})(?![0-9a-fA-F])")
+_RGB_RE = re.compile(r"rgba?\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*(,\s*[\d.]+\s*)?\)")
+_STYLE_ATTR_RE = re.compile(r"""(\sstyle\s*=\s*)(["'])(.*?)\2""", re.DOTALL | re.IGNORECASE)
+_CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_PX_RE = re.compile(r"(-?\d+(?:\.\d+)?)px")
+
+
+# ── 요청 해석 ─────────────────────────────────────────────────────────────
+def _find_color(clause):
+    match = _HEX_RE.search(clause)
+    if match:
+        return "#" + match.group(1).lower()
+    for pattern, value in COLOR_NAMES:
+        if re.search(pattern, clause, re.IGNORECASE):
+            return value
+    return None
+
+
+def _is_color_word(word):
+    return bool(_HEX_RE.fullmatch(word)) or any(
+        re.fullmatch(f"(?:{pattern})", word, re.IGNORECASE) for pattern, _ in COLOR_NAMES)
+
+
+def _color_is_object(clause):
+    """"…을 남색으로" 처럼 '으로/로' 앞 단어 전체가 색 이름인지"""
+    objects = _OBJECT_RE.findall(clause)
+    return bool(objects) and _is_color_word(objects[-1])
+
+
+def _scale_factor(clause):
+    up = re.search(r"크게|키워|키우|늘려|늘리|넓게|넓혀|크기\s*업", clause)
+    down = re.search(r"작게|줄여|줄이|좁게|좁혀", clause)
+    if bool(up) == bool(down):
+        return None
+    strong = re.search(r"훨씬|많이|확|두\s*배|아주|매우", clause)
+    if up:
+        return 1.4 if strong else 1.2
+    return 0.7 if strong else 0.85
+
+
+def parse_clause(clause):
+    """요청 한 절 → (동작, 인자) 또는 None"""
+    if re.search(r"정렬|중앙으로|가운데로|왼쪽으로|오른쪽으로", clause):
+        if re.search(r"가운데|중앙|center", clause):
+            return ("align", "center")
+        if re.search(r"왼쪽|좌측|left", clause):
+            return ("align", "left")
+        if re.search(r"오른쪽|우측|right", clause):
+            return ("align", "right")
+        return None
+
+    if re.search(r"여백|패딩|padding", clause, re.IGNORECASE):
+        factor = _scale_factor(clause)
+        return ("padding", factor) if factor else None
+
+    if re.search(r"폰트|글꼴|서체|font", clause, re.IGNORECASE) and not re.search(r"색|컬러|color|크기|크게|작게|키워|줄여", clause):
+        for pattern, family, url in FONTS:
+            if re.search(pattern, clause, re.IGNORECASE):
+                return ("font", (family, url))
+        return None
+
+    color = _find_color(clause)
+    explicit = bool(_COLOR_CUE_RE.search(clause))
+    if color and (explicit or _color_is_object(clause)):
+        if re.search(r"배경|바탕|background", clause, re.IGNORECASE):
+            return ("background", color)
+        if re.search(r"제목|타이틀|title|헤드라인", clause, re.IGNORECASE):
+            return ("title_color", color) if explicit else None
+        if re.search(r"포인트|강조|액센트|accent|메인\s*컬러|키\s*컬러", clause, re.IGNORECASE):
+            return ("accent", color)
+        if re.search(r"글자|글씨|텍스트|본문|폰트|text|font", clause, re.IGNORECASE):
+            return ("text_color", color) if explicit else None
+        return None
+
+    if re.search(r"제목|타이틀|title|헤드라인", clause, re.IGNORECASE):
+        px = re.search(r"(\d{2,3})\s*px", clause)
+        if px:
+            return ("title_size", ("px", int(px.group(1))))
+        factor = _scale_factor(clause)
+        return ("title_size", ("scale", factor)) if factor else None
+    if re.search(r"글자|글씨|텍스트|본문|폰트", clause):
+        factor = _scale_factor(clause)
+        return ("body_size", ("scale", factor)) if factor else None
+    return None
+
+
+def parse_request(request):
+    """요청 전체 → 동작 목록. 해석 못 하는 절이 있으면 None"""
+    if _CONTENT_RE.search(request):
+        return None
+    # 따옴표 안은 넣을 문구 — 색/크기 단어로 읽지 않음
+    request = _QUOTED_RE.sub('""', request)
+    # 대상 슬라이드 지정 부분("3번 슬라이드", "표지")은 떼고 해석
+    text = re.sub(r"\d{1,2}\s*[~\-]\s*\d{1,2}\s*(?:번째|번|장|페이지|쪽)?|\d{1,2}\s*(?:번째|번|장|페이지|쪽)|슬라이드|표지|커버|마지막", " ", request)
+    actions = []
+    for clause in _CLAUSE_SPLIT_RE.split(text):
+        clause = clause.strip(" .!~")
+        if not clause or re.fullmatch(r"(?:의|에서|은|는|만|도|해\s*줘|해주세요|바꿔\s*줘|좀)+", clause):
+            continue
+        action = parse_clause(clause)
+        if action is None:
+            return None
+        actions.append(action)
+    return actions or None
+
+
+# ── 선언 블록 편집 ────────────────────────────────────────────────────────
+def _parse_decls(text):
+    decls = []
+    for part in text.split(";"):
+        if ":" in part:
+            prop, value = part.split(":", 1)
+            if prop.strip():
+                decls.append([prop.strip().lower(), value.strip()])
+    return decls
+
+
+def _format_decls(decls):
+    return "; ".join(f"{p}: {v}" for p, v in decls) + (";" if decls else "")
+
+
+def _update_decls(text, old, new):
+    """선언 문자열에서 바뀐 속성 값만 그 자리에서 교체/추가 (원래 서식 유지)"""
+    before = dict((p, v) for p, v in old)
+    for prop, value in new:
+        if before.get(prop) == value:
+            continue
+        if prop in before:
+            pattern = re.compile(r"(^|;)(\s*" + re.escape(prop) + r"\s*:\s*)([^;]*?)(\s*)(?=;|$)", re.IGNORECASE)
+            text = pattern.sub(lambda m: m.group(1) + m.group(2) + value + m.group(4), text, count=1)
+        else:
+            body = text.rstrip()
+            sep = "" if not body.strip() or body.endswith(";") else ";"
+            space = " " if ": " in text else ""
+            text = f"{body}{sep}{space}{prop}:{space}{value};" + text[len(body):]
+    return text
+
+
+def _get(decls, prop):
+    return next((v for p, v in decls if p == prop), None)
+
+
+def _set(decls, prop, value):
+    for decl in decls:
+        if decl[0] == prop:
+            decl[1] = value
+            return
+    decls.append([prop, value])
+
+
+def _font_px(decls):
+    value = _get(decls, "font-size") or ""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)px(\s*!important)?", value)
+    return float(match.group(1)) if match else None
+
+
+def _scale_px(value, factor):
+    return _PX_RE.sub(lambda m: f"{round(float(m.group(1)) * factor)}px", value)
+
+
+def _hex_rgb(value):
+    value = value.lstrip("#")
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _saturated(rgb):
+    high, low = max(rgb), min(rgb)
+    return high >= 64 and (high - low) / high >= 0.35
+
+
+def _color_counts(text):
+    counts = {}
+    for match in _HEX_RE.finditer(text):
+        rgb = _hex_rgb(match.group(1))
+        counts[rgb] = counts.get(rgb, 0) + 1
+    for match in _RGB_RE.finditer(text):
+        rgb = tuple(int(match.group(i)) for i in (1, 2, 3))
+        counts[rgb] = counts.get(rgb, 0) + 1
+    return counts
+
+
+def _replace_color(text, old_rgb, new_hex):
+    new_rgb = _hex_rgb(new_hex)
+    text = _HEX_RE.sub(lambda m: new_hex if _hex_rgb(m.group(1)) == old_rgb else m.group(0), text)
+
+    def rgb_sub(m):
+        if tuple(int(m.group(i)) for i in (1, 2, 3)) != old_rgb:
+            return m.group(0)
+        alpha = m.group(4)
+        return f"rgba({new_rgb[0]}, {new_rgb[1]}, {new_rgb[2]}{alpha})" if alpha else f"rgb{new_rgb}"
+    return _RGB_RE.sub(rgb_sub, text)
+
+
+class _Scope:
+    """선언 블록들(인라인 style 또는 CSS 규칙)의 모음 — 제목 기준 크기를 범위 단위로 계산"""
+
+    def __init__(self, blocks):
+        self.blocks = blocks  # [decls, ...]
+        sizes = [s for s in (_font_px(d) for d in blocks) if s]
+        self.title_px = max(TITLE_MIN_PX, TITLE_RATIO * max(sizes)) if sizes else None
+        self.max_px = max(sizes) if sizes else None
+
+    def titles(self):
+        return [d for d in self.blocks if self.title_px and (_font_px(d) or 0) >= self.title_px]
+
+    def bodies(self):
+        return [d for d in self.blocks if self.title_px and 0 < (_font_px(d) or 0) < self.title_px]
+
+
+def _apply_to_blocks(scope, action, arg):
+    """스코프 안 선언 블록에 동작 적용. 바꾼 블록 수 반환"""
+    changed = 0
+    if action == "title_size":
+        titles = scope.titles()
+        kind, value = arg
+        factor = value / scope.max_px if kind == "px" and scope.max_px else value
+        for decls in titles:
+            _set(decls, "font-size", _scale_px(_get(decls, "font-size"), factor))
+            changed += 1
+    elif action == "body_size":
+        for decls in scope.bodies():
+            _set(decls, "font-size", _scale_px(_get(decls, "font-size"), arg[1]))
+            changed += 1
+    elif action == "title_color":
+        for decls in scope.titles():
+            _set(decls, "color", arg)
+            if _get(decls, "-webkit-text-fill-color"):
+                _set(decls, "-webkit-text-fill-color", arg)
+            changed += 1
+    elif action == "text_color":
+        for decls in scope.blocks:
+            if _get(decls, "color"):
+                _set(decls, "color", arg)
+                changed += 1
+    elif action == "font":
+        for decls in scope.blocks:
+            if _get(decls, "font-family"):
+                _set(decls, "font-family", f"{arg[0]}, sans-serif")
+                changed += 1
+    elif action == "align":
+        for decls in scope.blocks:
+            if _get(decls, "text-align"):
+                _set(decls, "text-align", arg)
+                changed += 1
+    return changed
+
+
+def _apply_to_root(decls, action, arg):
+    """슬라이드 최상위 요소 선언 — 배경/여백/상속되는 속성"""
+    if action == "background":
+        _set(decls, "background", arg)
+        return 1
+    if action == "padding":
+        padding = _get(decls, "padding")
+        if not padding:
+            return 0
+        _set(decls, "padding", _scale_px(padding, arg))
+        return 1
+    if action == "text_color":
+        _set(decls, "color", arg)
+        return 1
+    if action == "font":
+        _set(decls, "font-family", f"{arg[0]}, sans-serif")
+        return 1
+    if action == "align":
+        _set(decls, "text-align", arg)
+        if _get(decls, "flex-direction") == "column":
+            _set(decls, "align-items", {"center": "center", "left": "flex-start", "right": "flex-end"}[arg])
+        return 1
+    return 0
+
+
+# ── 덱 적용 ───────────────────────────────────────────────────────────────
+def _rewrite_fragment(fragment, actions):
+    """슬라이드 1장의 인라인 style 들을 고친 HTML 과 바꾼 블록 수 반환"""
+    attrs = list(_STYLE_ATTR_RE.finditer(fragment))
+    blocks = [_parse_decls(m.group(3)) for m in attrs]
+    originals = [[list(d) for d in decls] for decls in blocks]
+    root_end = fragment.find(">") + 1
+    has_root_style = bool(attrs) and attrs[0].start() < root_end
+    root = blocks[0] if has_root_style else []
+    scope = _Scope(blocks)
+
+    changed = 0
+    for action, arg in actions:
+        changed += _apply_to_blocks(scope, action, arg)
+        changed += _apply_to_root(root, action, arg)
+    if not changed:
+        return fragment, 0
+
+    out = fragment
+    for match, decls, original in reversed(list(zip(attrs, blocks, originals))):
+        if decls != original:
+            out = out[:match.start(3)] + _update_decls(match.group(3), original, decls) + out[match.end(3):]
+    if root and not has_root_style:
+        close = root_end - 1 - (1 if fragment[root_end - 2] == "/" else 0)
+        out = out[:close] + f' style="{_format_decls(root)}"' + out[close:]
+    return out, changed
+
+
+def _rewrite_css(css, actions):
+    rules = list(_CSS_RULE_RE.finditer(css))
+    blocks = [_parse_decls(m.group(2)) for m in rules]
+    originals = [[list(d) for d in decls] for decls in blocks]
+    scope = _Scope(blocks)
+    changed = sum(_apply_to_blocks(scope, action, arg) for action, arg in actions
+                  if action not in ("background", "padding", "accent"))
+    if not changed:
+        return css, 0
+    out = css
+    for match, decls, original in reversed(list(zip(rules, blocks, originals))):
+        if decls != original:
+            out = out[:match.start(2)] + _update_decls(match.group(2), original, decls) + out[match.end(2):]
+    return out, changed
+
+
+def apply_style_request(html, request, targets=None):
+    """규칙으로 처리 가능한 요청이면 {"html", "changed", "actions"} 반환, 아니면 None"""
+    actions = parse_request(request)
+    if not actions:
+        return None
+    deck = parse_deck(html)
+    if not len(deck):
+        return None
+    total = len(deck)
+    targets = sorted(n for n in (targets or []) if 1 <= n <= total) or target_slides(request, total)
+    numbers = targets or list(range(1, total + 1))
+    whole_deck = len(numbers) == total
+
+    slides, styles, changed = {}, {}, 0
+    for action, arg in actions:
+        if action != "accent":
+            continue
+        # 포인트 색 = 덱에서 가장 많이 쓰인 채도 높은 색 → 같은 색을 모두 교체
+        scope_text = "".join(deck.slide(n) for n in numbers) + (deck.style if whole_deck else "")
+        counts = {rgb: c for rgb, c in _color_counts(scope_text).items() if _saturated(rgb)}
+        if not counts:
+            return None
+        accent = max(counts, key=counts.get)
+        for n in numbers:
+            slides[n] = _replace_color(slides.get(n, deck.slide(n)), accent, arg)
+        if whole_deck:
+            for i, (start, end) in enumerate(deck.style_spans):
+                styles[i] = _replace_color(styles.get(i, deck.html[start:end]), accent, arg)
+        changed += counts[accent]
+
+    others = [(a, v) for a, v in actions if a != "accent"]
+    if others:
+        for n in numbers:
+            fragment, count = _rewrite_fragment(slides.get(n, deck.slide(n)), others)
+            if count:
+                slides[n] = fragment
+                changed += count
+        # 공유 스타일 블록은 덱 전체를 바꿀 때만 수정 (특정 슬라이드 요청이 다른 슬라이드에 번지지 않게)
+        if whole_deck:
+            for i, (start, end) in enumerate(deck.style_spans):
+                css, count = _rewrite_css(styles.get(i, deck.html[start:end]), others)
+                if count:
+                    styles[i] = css
+                    changed += count
+
+    if not changed:
+        return None
+    head_html = ""
+    for action, arg in actions:
+        if action == "font" and arg[1] and arg[1] not in html:
+            head_html += f'<link href="{arg[1]}" rel="stylesheet">\n'
+    return {
+        "html": deck.splice(slides, styles=styles, head_html=head_html),
+        "changed": sorted(slides),
+        "actions": [a for a, _ in actions],
+    }
@@ -0,0 +1,226 @@
+"""
+생성된 덱의 글자 넘침을 브라우저에서 직접 재고 글자 크기를 줄여 맞추기 (LLM 호출 없음)
+
+- 브라우저 풀의 페이지 1개에 덱을 올리고, 슬라이드마다 텍스트 블록(글자를 직접 가진 요소)의
+  scrollWidth / 위치를 슬라이드 영역과 비교
+- 1단계 (블록): 가로로 넘치는 블록(긴 제목 등)은 그 블록(+안쪽 블록)만 이진 탐색으로 줄임
+- 2단계 (슬라이드): 그래도 슬라이드 밖으로 나가는 글자가 있으면 슬라이드 전체 글자 배율을 이진 탐색
+- 결과는 줄인 요소의 인라인 style 에 font-size / line-height (!important) 로 직접 씀
+  → 프론트가 <body> 안쪽만 쓰거나(innerHTML) 슬라이드 순서를 바꿔도 요소와 함께 따라감
+  원래 인라인 값은 data-fit 속성에 보관 — strip_fit() 이 되돌린 뒤 처음부터 다시 측정 (재실행해도 누적되지 않음)
+- 페이지에는 슬라이드 안 시작 태그마다 data-fit-id 를 붙인 사본을 올리고, 측정 결과는 그 번호로
+  원본의 같은 태그에 되돌려 적용 (브라우저가 직렬화한 DOM 을 쓰지 않으므로 나머지는 한 글자도 바뀌지 않음)
+- 줄 간격은 글자 크기와 같은 비율로 함께 줄임
+"""
+import os
+import re
+from html import escape, unescape
+from html.parser import HTMLParser
+
+from execution.deck import parse_deck
+from execution.metrics import span
+
+TEXT_FIT_MIN_SCALE = float(os.environ.get("TEXT_FIT_MIN_SCALE", "0.6"))  # 원래 크기 대비 최소 배율
+TEXT_FIT_STEPS = int(os.environ.get("TEXT_FIT_STEPS", "7"))  # 이진 탐색 횟수 (7회 ≈ 0.3% 정밀도)
+TEXT_FIT_TIMEOUT = float(os.environ.get("TEXT_FIT_TIMEOUT", "15"))  # 초 (페이지 로드)
+
+FIT_PROPS = ("font-size", "line-height")
+_FIT_STYLE_RE = re.compile(r'<style id="text-fit">.*?</style>\s*', re.DOTALL)  # 예전 방식(선택자 규칙 블록)
+_STYLE_ATTR_RE = re.compile(r"""\sstyle\s*=\s*(["'])(.*?)\1""", re.DOTALL | re.IGNORECASE)
+_FIT_ATTR_RE = re.compile(r"""\sdata-fit\s*=\s*(["'])(.*?)\1""", re.DOTALL | re.IGNORECASE)
+
+# 페이지 안에서 실행 — {fits: [{id, font, line}], slides: [{slide, adjusted, overflow, min_scale}]} 반환
+FIT_SCRIPT = """
+async ({minScale, steps}) => {
+  await document.fonts.ready;
+  let slides = [...document.querySelectorAll('.slide')];
+  if (!slides.length) slides = [...document.querySelectorAll('[id^="slide"]')].filter(e => /^slide-?\\d+$/.test(e.id));
+  const SKIP = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE']);
+  const hasText = el => !SKIP.has(el.tagName) &&
+    [...el.childNodes].some(n => n.nodeType === Node.TEXT_NODE && n.textContent.trim());
+
+  const report = {fits: [], slides: []};
+  slides.forEach((slide, index) => {
+    const blocks = [slide, ...slide.querySelectorAll('*')].filter(hasText).map(el => {
+      const cs = getComputedStyle(el);
+      return {el, size: parseFloat(cs.fontSize), line: cs.lineHeight === 'normal' ? 0 : parseFloat(cs.lineHeight),
+              inline: cs.display === 'inline', scale: 1};
+    });
+    const apply = (group, factor) => group.forEach(b => {
+      b.el.style.setProperty('font-size', `${(b.size * b.scale * factor).toFixed(2)}px`, 'important');
+      if (b.line) b.el.style.setProperty('line-height', `${(b.line * b.scale * factor).toFixed(2)}px`, 'important');
+    });
+    const box = () => slide.getBoundingClientRect();
+    const overX = (b, s = box()) => {
+      const r = b.el.getBoundingClientRect();
+      return (!b.inline && b.el.scrollWidth > b.el.clientWidth + 1) || r.right > s.right + 0.5 || r.left < s.left - 0.5;
+    };
+    const outside = b => {
+      const s = box(), r = b.el.getBoundingClientRect();
+      return overX(b, s) || r.bottom > s.bottom + 0.5 || r.top < s.top - 0.5;
+    };
+    // fits() 가 참인 가장 큰 배율. minScale 에서도 안 맞으면 null
+    const search = (group, fits) => {
+      apply(group, 1);
+      if (fits()) return 1;
+      apply(group, minScale);
+      if (!fits()) return null;
+      let lo = minScale, hi = 1;
+      for (let i = 0; i < steps; i++) {
+        const mid = (lo + hi) / 2;
+        apply(group, mid);
+        if (fits()) lo = mid; else hi = mid;
+      }
+      apply(group, lo);
+      return lo;
+    };
+
+    // 1단계: 가로로 넘치는 블록만 (안쪽 블록과 함께) 줄임
+    const done = new Set();
+    for (const b of blocks) {
+      if (done.has(b) || !overX(b)) continue;
+      const group = blocks.filter(d => b.el.contains(d.el));
+      group.forEach(d => done.add(d));
+      // 끝까지 안 맞아도 줄일수록 덜 넘치므로 최소 배율까지는 적용
+      const factor = search(group, () => !overX(b)) ?? minScale;
+      group.forEach(d => { d.scale *= factor; });
+      apply(group, 1);
+    }
+    // 2단계: 슬라이드 밖으로 나가는 글자가 남아 있으면 슬라이드 전체 배율
+    // (최소 배율로도 안 맞으면 글자 크기 문제가 아님 — 일부러 밖에 둔 장식 글자 등 → 그대로 두고 overflow 로 보고)
+    if (blocks.some(outside)) {
+      const factor = search(blocks, () => !blocks.some(outside)) ?? 1;
+      blocks.forEach(b => { b.scale *= factor; });
+      apply(blocks, 1);
+    }
+
+    // 브라우저가 만든 요소(원본에 없는 태그)는 data-fit-id 가 없어 되돌려 쓸 수 없음
+    const changed = blocks.filter(b => b.scale < 0.999 && b.el.dataset.fitId !== undefined);
+    changed.forEach(b => report.fits.push({id: Number(b.el.dataset.fitId), font: +(b.size * b.scale).toFixed(2),
+                                           line: b.line ? +(b.line * b.scale).toFixed(2) : null}));
+    report.slides.push({slide: index + 1, adjusted: changed.length, overflow: blocks.some(outside),
+                        min_scale: Math.round(Math.min(1, ...blocks.map(b => b.scale)) * 1000) / 1000});
+  });
+  return report;
+}
+"""
+
+
+class _StartTags(HTMLParser):
+    """시작 태그의 원본 offset (시작, 끝) 목록 (deck._SlideLocator 와 같은 방식으로 위치 계산)"""
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=False)
+        self.line_starts = [0] + [m.end() for m in re.finditer("\n", html)]
+        self.spans = []
+
+    def handle_starttag(self, tag, attrs):
+        line, col = self.getpos()
+        start = self.line_starts[line - 1] + col
+        self.spans.append((start, start + len(self.get_starttag_text())))
+
+
+def _start_tags(html):
+    parser = _StartTags(html)
+    parser.feed(html)
+    parser.close()
+    return parser.spans
+
+
+def _insert_attr(tag, attr):
+    close = len(tag) - (2 if tag.endswith("/>") else 1)
+    return tag[:close] + attr + tag[close:]
+
+
+def _split_decls(style):
+    """인라인 style → (맞춤 대상 속성 선언, 나머지 선언)"""
+    fit, rest = [], []
+    for decl in (d.strip() for d in style.split(";")):
+        if decl:
+            (fit if decl.split(":", 1)[0].strip().lower() in FIT_PROPS else rest).append(decl)
+    return fit, rest
+
+
+def _set_style(tag, decls):
+    style = "; ".join(decls) + (";" if decls else "")
+    match = _STYLE_ATTR_RE.search(tag)
+    if match:
+        if not decls:
+            return tag[:match.start()] + tag[match.end():]
+        return tag[:match.start(2)] + style + tag[match.end(2):]
+    return _insert_attr(tag, f' style="{style}"') if decls else tag
+
+
+def fit_tag(tag, font, line=None):
+    """시작 태그에 맞춘 크기를 인라인 !important 로 쓰고 원래 인라인 값은 data-fit 에 보관"""
+    match = _STYLE_ATTR_RE.search(tag)
+    original, rest = _split_decls(match.group(2) if match else "")
+    decls = rest + [f"font-size: {font}px !important"]
+    if line:
+        decls.append(f"line-height: {line}px !important")
+    else:
+        decls += [d for d in original if d.split(":", 1)[0].strip().lower() == "line-height"]
+    tag = _set_style(tag, decls)
+    return _insert_attr(tag, f' data-fit="{escape("; ".join(original), quote=True)}"')
+
+
+def unfit_tag(tag):
+    """fit_tag 되돌리기 — 맞춘 크기를 지우고 원래 인라인 값 복원"""
+    fit_attr = _FIT_ATTR_RE.search(tag)
+    if not fit_attr:
+        return tag
+    original = [d.strip() for d in unescape(fit_attr.group(2)).split(";") if d.strip()]
+    tag = tag[:fit_attr.start()] + tag[fit_attr.end():]
+    match = _STYLE_ATTR_RE.search(tag)
+    _, rest = _split_decls(match.group(2) if match else "")
+    return _set_style(tag, rest + original)
+
+
+def _rewrite_tags(html, edits):
+    """{태그 (시작, 끝): 새 태그} 적용 (나머지 부분은 그대로)"""
+    parts, last = [], 0
+    for (start, end), tag in sorted(edits.items()):
+        parts += [html[last:start], tag]
+        last = end
+    parts.append(html[last:])
+    return "".join(parts)
+
+
+def strip_fit(html):
+    """이전 맞춤 결과 제거 (data-fit 이 붙은 태그를 원래 인라인 값으로, 예전 <style id="text-fit"> 블록 삭제)"""
+    html = _FIT_STYLE_RE.sub("", html)
+    if "data-fit" not in html:
+        return html
+    edits = {}
+    for start, end in _start_tags(html):
+        tag = html[start:end]
+        if "data-fit" in tag:
+            edits[(start, end)] = unfit_tag(tag)
+    return _rewrite_tags(html, edits)
+
+
+async def fit_html(html, browser, min_scale=TEXT_FIT_MIN_SCALE, steps=TEXT_FIT_STEPS):
+    """덱 HTML → (맞춘 HTML, 보고서). 보고서: {"adjusted": 줄인 요소 수, "slides": [슬라이드별 결과]}"""
+    source = strip_fit(html)
+    slide_spans = parse_deck(source).spans
+    tags = [(start, end) for start, end in _start_tags(source) if any(a <= start < b for a, b in slide_spans)]
+    annotated = _rewrite_tags(source, {
+        (start, end): _insert_attr(source[start:end], f' data-fit-id="{i}"') for i, (start, end) in enumerate(tags)
+    })
+
+    with span("render_page"):
+        page = await browser.new_page(viewport={"width": 1080, "height": 1350})
+    try:
+        with span("fit_load"):
+            await page.set_content(annotated, wait_until="networkidle", timeout=TEXT_FIT_TIMEOUT * 1000)
+        with span("fit_measure"):
+            result = await page.evaluate(FIT_SCRIPT, {"minScale": min_scale, "steps": steps})
+    finally:
+        await page.close()
+
+    edits = {}
+    for fit in result["fits"]:
+        if 0 <= fit["id"] < len(tags):
+            start, end = tags[fit["id"]]
+            edits[(start, end)] = fit_tag(source[start:end], fit["font"], fit["line"])
+    return _rewrite_tags(source, edits), {"adjusted": len(edits), "slides": result["slides"]}
@@ -0,0 +1,217 @@
+"""
+요청 단위 추적 — correlation ID + span 트리 + JSON 라인 로그
+
+- 요청마다 request_id 를 contextvar 에 저장 (X-Request-ID 헤더가 오면 그대로 사용, 응답 헤더로 반환)
+  asyncio.to_thread / 풀 실행(copy_context) 로 스레드까지 전파, 서브프로세스에는 REQUEST_ID 환경변수로 전달
+- logging 레코드에 RequestIdFilter 가 request_id 를 붙이고 JsonFormatter 가 한 줄 JSON 으로 출력
+  ({"ts", "level", "logger", "request_id", "msg"}). uvicorn 의 log_config 로 설치하므로
+  uvicorn 접근/오류 로그와 앱 로그(log())가 같은 형식이 되고, sys.stdout/stderr 는 건드리지 않음
+  (Procfile: --log-config log_config.json, 직접 실행: uvicorn.run(log_config=log_config()))
+  LOG_FORMAT=text 면 같은 설정으로 사람이 읽는 한 줄 텍스트 (request_id 포함)
+- 백엔드/execution 모듈의 진단 출력은 모두 log() 로 남김 (print 는 CLI 결과 출력에만 사용)
+  uvicorn 설정 없이 실행될 때(CLI, 렌더 서브프로세스)는 처음 log() 에서 같은 포매터의 stderr 핸들러를 붙임
+- metrics.span() 으로 잰 단계들이 요청의 span 트리로 쌓이고,
+  요청이 SLOW_REQUEST_SECONDS 를 넘으면 트리 전체를 slow_request 로그로 남김
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import logging
+import contextvars
+from datetime import datetime, timezone
+
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "30"))
+LOG_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "log_config.json")
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+current_span_var = contextvars.ContextVar("current_span", default=None)
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+def set_request_id(request_id):
+    return request_id_var.set(request_id)
+
+
+def subprocess_env(env=None):
+    """서브프로세스에 현재 request_id 전달"""
+    env = dict(env if env is not None else os.environ)
+    request_id = get_request_id()
+    if request_id:
+        env["REQUEST_ID"] = request_id
+    return env
+
+
+# ── span 트리 ─────────────────────────────────────────────────────────────
+class Span:
+    __slots__ = ("name", "labels", "start", "duration", "error", "children")
+
+    def __init__(self, name, labels=None):
+        self.name = name
+        self.labels = labels or {}
+        self.start = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self.children = []
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self.start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+        node = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+        }
+        labels = {k: v for k, v in self.labels.items() if v}
+        if labels:
+            node["labels"] = labels
+        if self.error:
+            node["error"] = self.error
+        if self.children:
+            node["children"] = [c.to_dict(origin) for c in list(self.children)]
+        return node
+
+
+def start_span(name, **labels):
+    """현재 span 의 자식으로 새 span 시작. (span, 복원 토큰) 반환 — 요청 밖이면 (None, None)"""
+    parent = current_span_var.get()
+    if parent is None:
+        return None, None
+    child = Span(name, labels)
+    parent.children.append(child)
+    return child, current_span_var.set(child)
+
+
+def end_span(child, token, error=None):
+    if child is None:
+        return
+    child.finish(error)
+    current_span_var.reset(token)
+
+
+# ── JSON 라인 로그 ────────────────────────────────────────────────────────
+logger = logging.getLogger("app")
+_LEVELS = {"WARN": logging.WARNING, "INFO": logging.INFO, "ERROR": logging.ERROR, "DEBUG": logging.DEBUG}
+_TEXT_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+
+
+class RequestIdFilter(logging.Filter):
+    """레코드에 현재 요청의 request_id 를 붙임 (요청 밖이면 None)"""
+
+    def filter(self, record):
+        record.request_id = get_request_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """레코드 → 한 줄 JSON. log() 로 넘긴 추가 필드(fields)는 최상위 키로 합침"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.pop("use_colors", None)  # uvicorn 이 dict 설정의 포매터에 넣는 옵션
+        super().__init__(_TEXT_FORMAT)
+        self.json = os.environ.get("LOG_FORMAT", "json").lower() == "json"
+
+    def format(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = get_request_id()
+        if not self.json:
+            return super().format(record)
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": {"WARNING": "WARN"}.get(record.levelname, record.levelname),
+            "logger": record.name,
+            "request_id": record.request_id,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def log_config():
+    """uvicorn log_config (dictConfig) — Procfile 의 --log-config 와 같은 파일"""
+    with open(LOG_CONFIG_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _ensure_handler():
+    """log_config 가 적용되지 않은 프로세스(CLI, 서브프로세스) — app 로거에 stderr 핸들러 설치"""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(RequestIdFilter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log(level, msg, **fields):
+    """구조화 로그 한 건 (fields 는 JSON 의 최상위 키로 출력)"""
+    _ensure_handler()
+    logger.log(_LEVELS.get(level, logging.INFO), msg, extra={"fields": fields})
+
+
+def init_subprocess():
+    """서브프로세스(CLI 스크립트) 시작 시 호출 — 부모 요청의 request_id 를 이어받아 이후 log() 에 붙임"""
+    if os.environ.get("REQUEST_ID"):
+        set_request_id(os.environ["REQUEST_ID"])
+
+
+# ── ASGI 미들웨어 ─────────────────────────────────────────────────────────
+class TracingMiddleware:
+    def __init__(self, app, slow_seconds=SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID_RE.match(incoming) else new_request_id()
+        root = Span(f"{scope['method']} {scope['path']}")
+        id_token = request_id_var.set(request_id)
+        span_token = current_span_var.set(root)
+        status = {"code": 500, "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                content_type = dict(message.get("headers") or []).get(b"content-type", b"")
+                status["stream"] = content_type.startswith(b"text/event-stream")
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            root.finish(error)
+            # SSE 는 연결이 오래 유지되는 게 정상이므로 느린 요청으로 보지 않음
+            if root.duration >= self.slow_seconds and not status["stream"]:
+                log("WARN", "slow_request", status=status["code"],
+                    duration_ms=round(root.duration * 1000, 1), spans=root.to_dict())
+            current_span_var.reset(span_token)
+            request_id_var.reset(id_token)
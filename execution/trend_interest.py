@@ -0,0 +1,225 @@
+"""
+여러 키워드의 Google Trends 관심도 변화를 한 번에 분석해 카드뉴스 주제 후보를 순위화
+
+- pytrends 는 요청당 최대 5개 키워드 → 공통 기준 키워드(anchor) + 4개씩 그룹으로 나눔
+  같은 요청 안에서 anchor 평균을 100 으로 맞춰 그룹 간 값을 비교 가능하게 정규화
+- 그룹 요청은 프로세스 단위 rate-limited 큐를 통과 (최소 간격 + 429 시 지수 백오프)
+- 지표(최근 변화율, 기울기, 급등 점수)는 pandas/NumPy 로 전체 키워드를 한 번에 계산
+- 결과는 (geo, timeframe, anchor, keyword) 별로 공유 캐시에 저장
+
+CLI:
+    python execution/trend_interest.py --keywords 부동산 비트코인 금리 --timeframe "today 3-m"
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+# CLI 로 직접 실행할 때도 execution 패키지를 찾을 수 있도록 루트 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.filestore import read_json, update_json
+from execution.metrics import record_cache, span
+from execution.trends_cache import get_pytrend
+from execution.tracing import log
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTEREST_CACHE_PATH = os.path.join(WORKSPACE, ".tmp", "cache", "trend_interest.json")
+
+GROUP_SIZE = 5  # pytrends build_payload 키워드 상한
+TRENDS_MIN_INTERVAL = float(os.environ.get("TRENDS_MIN_INTERVAL", "2.0"))  # 그룹 요청 간 최소 간격(초)
+TRENDS_MAX_RETRIES = int(os.environ.get("TRENDS_MAX_RETRIES", "3"))
+INTEREST_CACHE_TTL = int(os.environ.get("INTEREST_CACHE_TTL", str(6 * 3600)))
+MAX_KEYWORDS = 50
+
+
+class RateLimitedQueue:
+    """pytrends 호출을 한 번에 하나씩, 최소 간격을 두고 실행 (429 시 지수 백오프 재시도)"""
+
+    def __init__(self, min_interval=TRENDS_MIN_INTERVAL, max_retries=TRENDS_MAX_RETRIES):
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._last_call = 0.0
+
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            for attempt in range(self.max_retries + 1):
+                wait = self.min_interval - (time.monotonic() - self._last_call)
+                if wait > 0:
+                    time.sleep(wait)
+                self._last_call = time.monotonic()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if not _is_rate_limited(e) or attempt == self.max_retries:
+                        raise
+                    backoff = self.min_interval * 2 ** (attempt + 1) * random.uniform(0.8, 1.2)
+                    log("WARN", f"Google Trends 429 — {backoff:.1f}s 후 재시도")
+                    time.sleep(backoff)
+
+
+def _is_rate_limited(e):
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None) == 429 or "429" in str(e)
+
+
+trends_queue = RateLimitedQueue()
+
+
+def make_groups(keywords, anchor):
+    """anchor 를 각 그룹에 포함시켜 최대 5개씩 분할"""
+    others = [k for k in keywords if k != anchor]
+    size = GROUP_SIZE - 1
+    groups = [[anchor] + others[i:i + size] for i in range(0, len(others), size)]
+    return groups or [[anchor]]
+
+
+def fetch_group(group, timeframe, geo):
+    def request():
+        pytrend = get_pytrend()
+        pytrend.build_payload(group, cat=0, timeframe=timeframe, geo=geo)
+        return pytrend.interest_over_time()
+
+    with span("trends_fetch", provider="google_trends"):
+        df = trends_queue.call(request)
+    if df is None or df.empty:
+        return None
+    return df.drop(columns=["isPartial"], errors="ignore")
+
+
+def normalize_to_anchor(frames, anchor):
+    """그룹별 결과를 anchor 평균 = 100 기준으로 맞춰 하나의 DataFrame 으로 합침"""
+    import pandas as pd
+
+    scaled = []
+    for df in frames:
+        anchor_mean = df[anchor].mean()
+        if not anchor_mean:
+            # anchor 관심도가 0 인 그룹은 비교 기준이 없으므로 원 값 그대로 사용
+            scaled.append(df.astype(float))
+        else:
+            scaled.append(df.astype(float) * (100.0 / anchor_mean))
+    combined = pd.concat(scaled, axis=1)
+    return combined.loc[:, ~combined.columns.duplicated()]
+
+
+def compute_metrics(df, window=None):
+    """키워드(열) 전체에 대한 지표를 벡터 연산으로 계산
+
+    - level: anchor 대비 평균 관심도 (anchor = 100)
+    - change_pct: 최근 window 평균 vs 직전 window 평균 변화율(%)
+    - slope_pct: 최소제곱 기울기 × 기간 길이 / 평균 — 기간 전체 추세를 % 로 환산
+    - spike: 마지막 값의 z-score (최근 window 를 제외한 과거 분포 기준)
+    - score: 세 지표를 tanh 로 압축한 가중합 (-1 ~ 1), 주제 순위화용
+    """
+    import numpy as np
+
+    values = df.to_numpy(dtype=float)  # (T, K)
+    n = values.shape[0]
+    window = window or max(1, n // 4)
+
+    level = values.mean(axis=0)
+    recent = values[-window:].mean(axis=0)
+    if n >= 2 * window:
+        prior = values[-2 * window:-window].mean(axis=0)
+    elif n > window:
+        prior = values[:-window].mean(axis=0)
+    else:
+        prior = recent
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = np.where(prior > 0, (recent - prior) / prior * 100.0, np.where(recent > 0, 100.0, 0.0))
+
+        t = np.arange(n, dtype=float)
+        tc = t - t.mean()
+        denom = (tc ** 2).sum() or 1.0
+        slope = tc @ (values - level) / denom
+        slope_pct = np.where(level > 0, slope * n / level * 100.0, 0.0)
+
+        baseline = values[:-window] if n > window else values
+        # 평평한 과거 구간(std=0)에서의 급등도 잡히도록 표준편차 하한을 관심도 1 로 둠
+        std = np.maximum(baseline.std(axis=0), 1.0)
+        spike = (values[-1] - baseline.mean(axis=0)) / std
+
+    score = 0.4 * np.tanh(change_pct / 100.0) + 0.4 * np.tanh(slope_pct / 100.0) + 0.2 * np.tanh(spike / 3.0)
+
+    metrics = {}
+    for i, keyword in enumerate(df.columns):
+        metrics[keyword] = {
+            "level": round(float(level[i]), 2),
+            "change_pct": round(float(change_pct[i]), 2),
+            "slope_pct": round(float(slope_pct[i]), 2),
+            "spike": round(float(spike[i]), 2),
+            "score": round(float(score[i]), 4),
+        }
+    return metrics
+
+
+def _cache_key(keyword, timeframe, geo, anchor):
+    return f"{geo}|{timeframe}|{anchor}|{keyword}"
+
+
+def analyze_keywords(keywords, timeframe="today 3-m", geo="KR", anchor=None):
+    """키워드 목록의 관심도 지표를 계산해 score 내림차순으로 반환"""
+    keywords = list(dict.fromkeys(k.strip() for k in keywords if k and k.strip()))[:MAX_KEYWORDS]
+    if not keywords:
+        return {"anchor": None, "timeframe": timeframe, "geo": geo, "results": []}
+    anchor = (anchor or keywords[0]).strip()
+
+    now = time.time()
+    cache = read_json(INTEREST_CACHE_PATH, {}) or {}
+    results, missing = {}, []
+    for k in keywords:
+        hit = cache.get(_cache_key(k, timeframe, geo, anchor))
+        if hit and now - hit["cached_at"] < INTEREST_CACHE_TTL:
+            results[k] = dict(hit["metrics"], cached=True)
+        else:
+            missing.append(k)
+        record_cache("trend_interest", k not in missing)
+
+    if missing:
+        frames = []
+        for group in make_groups(missing, anchor):
+            df = fetch_group(group, timeframe, geo)
+            if df is not None:
+                frames.append(df)
+        if frames:
+            fresh = compute_metrics(normalize_to_anchor(frames, anchor))
+            fresh = {k: v for k, v in fresh.items() if k in missing}
+
+            def store(data):
+                for k, m in fresh.items():
+                    data[_cache_key(k, timeframe, geo, anchor)] = {"metrics": m, "cached_at": now}
+                # 만료 항목 정리
+                for key in [key for key, v in data.items() if now - v.get("cached_at", 0) >= INTEREST_CACHE_TTL]:
+                    del data[key]
+
+            update_json(INTEREST_CACHE_PATH, store)
+            for k, m in fresh.items():
+                results[k] = dict(m, cached=False)
+
+    ranked = sorted(
+        ({"keyword": k, **m} for k, m in results.items()),
+        key=lambda r: r["score"],
+        reverse=True,
+    )
+    no_data = [k for k in keywords if k not in results]
+    return {"anchor": anchor, "timeframe": timeframe, "geo": geo, "results": ranked, "no_data": no_data}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", nargs="+", required=True)
+    parser.add_argument("--timeframe", default="today 3-m")
+    parser.add_argument("--geo", default="KR")
+    parser.add_argument("--anchor", default=None)
+    args = parser.parse_args()
+
+    report = analyze_keywords(args.keywords, args.timeframe, args.geo, args.anchor)
+    print(f"anchor={report['anchor']} timeframe={report['timeframe']}")
+    for r in report["results"]:
+        print(f"[{r['keyword']}] score={r['score']:+.3f} change={r['change_pct']:+.1f}% "
+              f"slope={r['slope_pct']:+.1f}% spike={r['spike']:+.2f} level={r['level']}")
@@ -0,0 +1,175 @@
+"""
+실시간 트렌드 stale-while-revalidate 캐시
+
+- 백그라운드 refresher 가 주기적으로 Google Trends(RSS → pytrends)를 조회
+- 실패 시 지수 백오프(+지터)로 재시도 — 업스트림 장애가 사용자 요청 지연으로 이어지지 않음
+- 요청은 항상 마지막 성공 스냅샷(디스크에 영구 저장)을 즉시 반환, 나이(age)와 출처(source) 포함
+- worker 가 여러 개면 try_lock 으로 한 프로세스만 조회하고 나머지는 파일 변경을 읽기만 함
+"""
+import os
+import time
+import random
+import asyncio
+import xml.etree.ElementTree as ET
+import httpx
+
+from execution.filestore import atomic_write_json, read_json, try_lock
+from execution.tracing import log
+
+WORKSPACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRENDS_CACHE_PATH = os.path.join(WORKSPACE, ".tmp", "cache", "trends.json")
+
+TRENDS_REFRESH_INTERVAL = int(os.environ.get("TRENDS_REFRESH_INTERVAL", "1800"))  # 초
+TRENDS_RETRY_BASE = int(os.environ.get("TRENDS_RETRY_BASE", "60"))
+TRENDS_MAX_BACKOFF = int(os.environ.get("TRENDS_MAX_BACKOFF", "3600"))
+# 환경변수로 pytrends 사용 여부 제어 (기본은 RSS 사용)
+USE_PYTREND = os.getenv("USE_PYTREND", "false").lower() == "true"
+TRENDS_LIMIT = 15
+
+RSS_URLS = [
+    "https://trends.google.co.kr/trending/rss?geo=KR",
+    "https://trends.google.co.kr/trends/trendingsearches/daily/rss?geo=KR",
+]
+
+FALLBACK_TRENDS = [
+    "비트코인 신고가", "2026 부동산 전망", "AI 자동화 트렌드",
+    "자기계발 루프", "재테크 시작하기", "나스닥 지수 현황",
+    "건강한 식단 관리", "봄 여행지 추천", "인기 카페 투어",
+    "넷플릭스 화제작", "애플 신기술", "전기차 시장 전망"
+]
+
+_pytrend = None
+
+
+def get_pytrend():
+    """pytrends 클라이언트 — 생성 시 Google 쿠키 요청이 발생하므로 실제로 필요할 때만 생성"""
+    global _pytrend
+    if _pytrend is None:
+        from pytrends.request import TrendReq
+        _pytrend = TrendReq(hl='ko-KR', tz=540)
+    return _pytrend
+
+
+async def fetch_rss():
+    async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
+        for url in RSS_URLS:
+            # URL 마다 따로 잡아야 앞 URL 의 연결 오류/깨진 XML 에도 다음 URL 로 넘어감
+            try:
+                resp = await client.get(url)
+                if resp.status_code != 200:
+                    log("WARN", f"Trends RSS {url}: HTTP {resp.status_code}")
+                    continue
+                root = ET.fromstring(resp.text)
+            except (httpx.HTTPError, ET.ParseError) as e:
+                log("WARN", f"Trends RSS {url}: {e}")
+                continue
+            trends = [item.find("title").text for item in root.findall(".//item") if item.find("title") is not None]
+            if trends:
+                return trends[:TRENDS_LIMIT]
+    raise Exception("RSS 피드에서 트렌드를 가져오지 못했습니다")
+
+
+async def fetch_pytrend():
+    # pytrends 는 동기 호출 → 이벤트 루프를 막지 않도록 스레드에서 실행
+    def fetch():
+        df = get_pytrend().trending_searches(pn='south_korea')
+        return df[0].tolist()[:TRENDS_LIMIT]
+    return await asyncio.to_thread(fetch)
+
+
+def default_sources():
+    rss = ("google_trends_rss", fetch_rss)
+    daily = ("google_trends_daily", fetch_pytrend)
+    return [daily, rss] if USE_PYTREND else [rss, daily]
+
+
+class TrendsRefresher:
+    def __init__(self, path=TRENDS_CACHE_PATH, sources=None, interval=TRENDS_REFRESH_INTERVAL):
+        self.path = path
+        self.sources = sources or default_sources()
+        self.interval = interval
+        self.failures = 0
+        self.last_error = None
+        self._lock_file = None
+        self._snapshot = None
+        self._snapshot_mtime = 0.0
+        self._reload()
+
+    def _reload(self):
+        """디스크 스냅샷이 (다른 worker 에 의해) 갱신됐으면 다시 읽음"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._snapshot_mtime:
+            data = read_json(self.path)
+            if data and data.get("trends"):
+                self._snapshot = data
+                self._snapshot_mtime = mtime
+
+    def snapshot(self):
+        """마지막 성공 스냅샷을 즉시 반환 (네트워크 호출 없음)"""
+        self._reload()
+        if not self._snapshot:
+            return {
+                "trends": FALLBACK_TRENDS,
+                "source": "popular_topics_fallback",
+                "fetched_at": None,
+                "age_seconds": None,
+                "stale": True,
+            }
+        age = max(0, int(time.time() - self._snapshot["fetched_at"]))
+        return {
+            "trends": self._snapshot["trends"],
+            "source": self._snapshot["source"],
+            "fetched_at": self._snapshot["fetched_at"],
+            "age_seconds": age,
+            "stale": age > self.interval * 2,
+        }
+
+    async def refresh_once(self):
+        errors = []
+        for source, fetch in self.sources:
+            try:
+                trends = await fetch()
+                if trends:
+                    self._snapshot = {"trends": trends, "source": source, "fetched_at": time.time()}
+                    atomic_write_json(self.path, self._snapshot)
+                    self._snapshot_mtime = os.stat(self.path).st_mtime
+                    return self._snapshot
+            except Exception as e:
+                errors.append(f"{source}: {e}")
+        raise Exception(" | ".join(errors) or "no trend sources")
+
+    def next_delay(self):
+        if self.failures == 0:
+            return self.interval
+        backoff = min(TRENDS_MAX_BACKOFF, TRENDS_RETRY_BASE * 2 ** (self.failures - 1))
+        return backoff * random.uniform(0.8, 1.2)
+
+    async def run(self):
+        """백그라운드 루프 — 락을 잡은 worker 만 조회, 나머지는 주기적으로 리더 자리를 재시도"""
+        while True:
+            if self._lock_file is None:
+                self._lock_file = try_lock(self.path)
+            if self._lock_file is None:
+                await asyncio.sleep(self.interval)
+                continue
+
+            if self._snapshot and self.failures == 0:
+                # 재시작 직후: 아직 신선한 스냅샷이 있으면 남은 시간만큼 대기
+                remaining = self.interval - (time.time() - self._snapshot["fetched_at"])
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+            try:
+                await self.refresh_once()
+                self.failures = 0
+                self.last_error = None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                log("ERROR", f"Trend Error: {e} (retry #{self.failures})")
+            await asyncio.sleep(self.next_delay())
+
+
+trends_refresher = TrendsRefresher()
@@ -31,6 +31,65 @@ const GENERATE_STEPS = [
     { label: '✨ 마무리 중', detail: '최종 품질 검사 중...' },
 ];
 
+// 생성 작업 이벤트 → GENERATE_STEPS 인덱스
+const GENERATE_EVENT_STEP = {
+    research_started: 0,
+    research_finished: 1,
+    provider_attempt: 2,
+    html_parsed: 3,
+    cache_hit: 3,
+};
+
+// 생성 작업 SSE 구독 — 연결이 끊기면 마지막으로 받은 이벤트 ID 부터 이어서 받음
+// (EventSource 는 Authorization 헤더를 못 보내므로 fetch 스트림으로 직접 파싱)
+async function streamJobEvents(jobId, onEvent, maxRetries = 5) {
+    let lastEventId = 0;
+    let retries = 0;
+    let lastError = null;
+    while (true) {
+        try {
+            const token = localStorage.getItem('auth_token');
+            const response = await fetch(`${BACKEND_URL}/api/jobs/${jobId}/events`, {
+                headers: {
+                    'Last-Event-ID': String(lastEventId),
+                    ...(token ? { 'Authorization': `Bearer ${token}` } : {})
+                },
+            });
+            if (!response.ok) throw new Error(`이벤트 스트림 연결 실패 (${response.status})`);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let sep;
+                while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, sep);
+                    buffer = buffer.slice(sep + 2);
+                    const event = { type: 'message', data: '' };
+                    for (const line of block.split('\n')) {
+                        if (line.startsWith('id: ')) event.id = Number(line.slice(4));
+                        else if (line.startsWith('event: ')) event.type = line.slice(7);
+                        else if (line.startsWith('data: ')) event.data += line.slice(6);
+                    }
+                    if (!event.id) continue;  // retry/keep-alive
+                    lastEventId = event.id;
+                    retries = 0;
+                    const data = JSON.parse(event.data || '{}');
+                    onEvent(event.type, data);
+                    if (event.type === 'done' || event.type === 'error') return;
+                }
+            }
+        } catch (err) {
+            lastError = err;
+        }
+        // 오류 또는 종료 이벤트 없이 스트림이 끝남 → 잠시 후 재연결
+        if (++retries > maxRetries) throw lastError || new Error('진행 상황 연결이 끊겼습니다.');
+        await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+    }
+}
+
 export default function App() {
     const [user, setUser] = useState(null);
     const [authChecking, setAuthChecking] = useState(true);
@@ -41,6 +100,7 @@ export default function App() {
     const [generateStep, setGenerateStep] = useState(0);
     const [loading, setLoading] = useState(false);
     const [result, setResult] = useState(null);
+    const [caption, setCaption] = useState(null);
     const [error, setError] = useState(null);
     const [activeStep, setActiveStep] = useState(1);
     const [slideCount, setSlideCount] = useState(5);
@@ -273,11 +333,8 @@ export default function App() {
         setGenerating(true);
         setGenerateStep(0);
         setError(null);
-        const stepTimer = setInterval(() => {
-            setGenerateStep(prev => Math.min(prev + 1, GENERATE_STEPS.length - 1));
-        }, 3000);
         try {
-            const response = await fetch(`${BACKEND_URL}/api/generate_html`, {
+            const response = await fetch(`${BACKEND_URL}/api/generate_html/jobs`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -298,13 +355,21 @@ export default function App() {
                 const errorData = await response.json().catch(() => ({ detail: "서버 오류가 발생했습니다." }));
                 throw new Error(errorData.detail || "생성 실패");
             }
-            const data = await response.json();
-            if (data.html) { setHtmlText(data.html); setActiveStep(2); setEditMode(false); }
+            const { job_id } = await response.json();
+            // 서버가 보내는 실제 단계 이벤트로 진행 표시
+            let html = null;
+            let failure = null;
+            await streamJobEvents(job_id, (type, data) => {
+                if (type in GENERATE_EVENT_STEP) setGenerateStep(prev => Math.max(prev, GENERATE_EVENT_STEP[type]));
+                else if (type === 'done') html = data.html;
+                else if (type === 'error') failure = data.message;
+            });
+            if (failure) throw new Error(failure);
+            if (html) { setHtmlText(html); setActiveStep(2); setEditMode(false); }
         } catch (err) {
             console.error(err);
             setError(err.message || "생성 실패. 다시 시도해주세요.");
         } finally {
-            clearInterval(stepTimer);
             setGenerating(false);
             fetchHistory();
         }
@@ -314,34 +379,56 @@ export default function App() {
         if (!refineText.trim() || !editableHtml) return;
         setRefining(true);
         try {
-            const response = await fetch(`${BACKEND_URL}/api/generate_html`, {
+            // 덱 전체를 재생성하지 않고 요청에 해당하는 슬라이드만 수정 (예: "3번 슬라이드 ...")
+            const response = await fetch(`${BACKEND_URL}/api/refine`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                     'Authorization': `Bearer ${localStorage.getItem('auth_token')}`
                 },
                 body: JSON.stringify({
-                    text: `다음 HTML 카드뉴스를 이렇게 수정해줘: "${refineText}"\n\n현재 HTML:\n${editableHtml.substring(0, 3000)}`,
-                    slide_count: Number(slideCount),
+                    html: editableHtml,
+                    request: refineText,
                     gemini_api_key: geminiApiKey || localStorage.getItem('gemini_api_key') || undefined,
-                    claude_api_key: claudeApiKey || localStorage.getItem('claude_api_key') || undefined,
-                    openai_api_key: openaiApiKey || localStorage.getItem('openai_api_key') || undefined,
                 }),
             });
-            if (response.ok) {
-                const data = await response.json();
-                if (data.html) { setHtmlText(data.html); setRefineText(''); }
+            if (!response.ok) {
+                const errorData = await response.json().catch(() => ({}));
+                throw new Error(errorData.detail || "수정 실패");
             }
-        } catch (err) { setError("수정 실패. 다시 시도해주세요."); }
+            const data = await response.json();
+            if (data.html) { setHtmlText(data.html); setRefineText(''); }
+        } catch (err) { setError(err.message || "수정 실패. 다시 시도해주세요."); }
         finally { setRefining(false); }
     };
 
+    const fetchCaption = async (html) => {
+        setCaption({ loading: true });
+        try {
+            const response = await fetch(`${BACKEND_URL}/api/caption`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${localStorage.getItem('auth_token')}`
+                },
+                body: JSON.stringify({
+                    html,
+                    gemini_api_key: geminiApiKey || localStorage.getItem('gemini_api_key') || undefined,
+                }),
+            });
+            if (!response.ok) throw new Error("캡션 생성 실패");
+            setCaption(await response.json());
+        } catch (err) { setCaption({ error: err.message || "캡션 생성 실패" }); }
+    };
+
     const handleExport = async () => {
         setLoading(true);
         try {
             const currentHtml = editMode && previewRef.current
                 ? previewRef.current.innerHTML
                 : injectStyles(editableHtml);
+            // 캡션은 PNG 변환과 동시에 요청 → 변환이 끝날 때쯤 함께 준비됨
+            fetchCaption(currentHtml);
             const formData = new FormData();
             formData.append('html_content', currentHtml);
             const response = await fetch(`${BACKEND_URL}/api/convert`, { method: 'POST', body: formData });
@@ -1925,6 +2012,32 @@ export default function App() {
                                         </motion.div>
                                     ))}
                                 </div>
+                                {caption && (
+                                    <div className="mt-8 bg-white rounded-xl border border-gray-100 p-5 shadow-sm">
+                                        <div className="flex items-center justify-between mb-3">
+                                            <div className="flex items-center gap-2">
+                                                <Hash size={14} className="text-[#E1306C]" />
+                                                <span className="text-xs font-black text-gray-800">캡션 & 해시태그</span>
+                                            </div>
+                                            {caption.caption && (
+                                                <button onClick={() => navigator.clipboard.writeText(`${caption.caption}\n\n${caption.hashtags}`)}
+                                                    className="text-[10px] font-bold text-gray-500 bg-gray-50 px-3 py-1.5 rounded-lg hover:bg-gray-100 transition-colors">
+                                                    복사
+                                                </button>
+                                            )}
+                                        </div>
+                                        {caption.loading && (
+                                            <p className="text-[11px] text-gray-400 flex items-center gap-2"><RefreshCw size={12} className="animate-spin" /> 캡션 작성 중...</p>
+                                        )}
+                                        {caption.error && <p className="text-[11px] text-red-400">{caption.error}</p>}
+                                        {caption.caption && (
+                                            <>
+                                                <p className="text-xs text-gray-700 whitespace-pre-line leading-relaxed">{caption.caption}</p>
+                                                <p className="mt-3 text-[11px] text-[#833AB4] font-medium break-keep">{caption.hashtags}</p>
+                                            </>
+                                        )}
+                                    </div>
+                                )}
                             </div>
                         </motion.div>
                     </motion.div>
@@ -0,0 +1,94 @@
+"""WorkerPool 의 배정 규칙 — 이벤트 루프 하나에서 acquire/release 순서를 직접 만들어 확인"""
+import asyncio
+
+import pytest
+
+from execution.admission import AdmissionRejected, WorkerPool
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_per_user_limit_and_check():
+    async def scenario():
+        pool = WorkerPool("t", 4, max_queue=10, per_user_limit=2)
+        await pool.acquire("a")
+        await pool.acquire("a")
+        with pytest.raises(AdmissionRejected):
+            await pool.acquire("a")
+        with pytest.raises(AdmissionRejected):
+            pool.check("a")
+        pool.check("b")
+        with pytest.raises(AdmissionRejected):
+            pool.check("b", inflight=2)  # 풀 밖에서 센 진행 중 요청
+        await pool.acquire("a", user_limit=3)  # 호출별 한도
+        assert pool.stats() == {"size": 4, "running": 3, "queued": 0, "users": 1}
+        for _ in range(3):
+            pool.release("a")
+        assert not pool.busy()
+
+    asyncio.run(scenario())
+
+
+def test_queue_is_round_robin_between_users():
+    async def scenario():
+        pool = WorkerPool("t", 1, max_queue=10, per_user_limit=5)
+        order = []
+
+        async def job(user, tag):
+            async with pool.slot(user):
+                order.append(tag)
+                await asyncio.sleep(0)
+
+        await pool.acquire("holder")
+        tasks = [asyncio.create_task(job("a", f"a{i}")) for i in range(3)]
+        await _settle()
+        tasks.append(asyncio.create_task(job("b", "b0")))
+        await _settle()
+        assert pool.queued() == 4
+        assert pool.queue_position("a") == 1 and pool.queue_position("b") == 2
+        pool.release("holder")
+        await asyncio.gather(*tasks)
+        assert order == ["a0", "b0", "a1", "a2"]
+        assert pool.stats()["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_with_position():
+    async def scenario():
+        pool = WorkerPool("t", 1, max_queue=1, per_user_limit=5)
+        await pool.acquire("a")
+        waiter = asyncio.create_task(pool.acquire("b"))
+        await _settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await pool.acquire("c")
+        assert rejected.value.queue_position == 2 and rejected.value.retry_after >= 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert pool.queued() == 0 and pool.stats()["users"] == 1
+        pool.release("a")
+
+    asyncio.run(scenario())
+
+
+def test_low_priority_never_queues():
+    async def scenario():
+        pool = WorkerPool("t", 1, max_queue=5, per_user_limit=5)
+        async with pool.slot("bg", low_priority=True):
+            with pytest.raises(AdmissionRejected):
+                await pool.acquire("bg2", low_priority=True)
+        assert not pool.busy()
+
+    asyncio.run(scenario())
+
+
+def test_run_executes_in_pool_thread():
+    async def scenario():
+        pool = WorkerPool("t", 2, max_queue=5, per_user_limit=2)
+        assert await pool.run("a", lambda x, y=0: x + y, 2, y=3) == 5
+        assert not pool.busy()
+
+    asyncio.run(scenario())
@@ -0,0 +1,68 @@
+"""슬라이드 단위 수정의 기반 — parse_deck 이 찾은 offset 으로 splice 하면 나머지 HTML 은 한 글자도 바뀌지 않아야 함"""
+from execution.deck import is_single_slide, parse_deck, slide_texts, target_slides
+
+DECK = """<html><head>
+<style>.slide { width: 1080px; }</style>
+<style>.title { font-size: 80px; }</style>
+</head><body>
+<div class="slide cover"><div class="inner"><h1>표지</h1></div></div>
+<div class="slide"><p>둘째 <b>강조</b></p><div>중첩</div></div>
+<section class="slide"><p>셋째</p></section>
+</body></html>"""
+
+
+def test_parse_finds_slides_and_styles():
+    deck = parse_deck(DECK)
+    assert len(deck) == 3
+    assert deck.slide(1) == '<div class="slide cover"><div class="inner"><h1>표지</h1></div></div>'
+    assert deck.slide(2) == '<div class="slide"><p>둘째 <b>강조</b></p><div>중첩</div></div>'
+    assert deck.slide(3) == '<section class="slide"><p>셋째</p></section>'
+    assert deck.style == ".slide { width: 1080px; }\n.title { font-size: 80px; }"
+
+
+def test_parse_id_and_top_level_fallbacks():
+    by_id = '<body><div id="slide1"><p>a</p></div><div id="slide-2"><p>b</p></div></body>'
+    assert [parse_deck(by_id).slide(n) for n in (1, 2)] == ['<div id="slide1"><p>a</p></div>',
+                                                           '<div id="slide-2"><p>b</p></div>']
+    top = ('<body><div style="width:1080px"><div style="width:1080px">안쪽</div></div>'
+           '<div style="width: 1080px">둘</div></body>')
+    deck = parse_deck(top)
+    assert len(deck) == 2 and deck.slide(2) == '<div style="width: 1080px">둘</div>'
+    assert len(parse_deck("<p>슬라이드 없음</p>")) == 0
+
+
+def test_splice_replaces_only_given_parts():
+    deck = parse_deck(DECK)
+    new = deck.splice({2: '<div class="slide"><p>바뀜</p></div>'}, styles={1: ".title { font-size: 90px; }"},
+                      extra_css=".x { color: red; }", head_html='<link rel="stylesheet" href="f.css">\n')
+    expected = (DECK
+                .replace(deck.slide(2), '<div class="slide"><p>바뀜</p></div>')
+                .replace(".title { font-size: 80px; }", ".title { font-size: 90px; }\n.x { color: red; }\n")
+                .replace("</head>", '<link rel="stylesheet" href="f.css">\n</head>'))
+    assert new == expected
+    assert deck.splice() == DECK
+
+
+def test_splice_without_style_block_adds_one():
+    html = '<html><head></head><body><div class="slide">a</div></body></html>'
+    new = parse_deck(html).splice(extra_css=".a { color: red; }")
+    assert "<style>\n.a { color: red; }\n</style>\n</head>" in new
+
+
+def test_is_single_slide():
+    assert is_single_slide('  <div class="slide"><p>a</p></div>\n')
+    assert not is_single_slide('<div class="slide">a</div><div class="slide">b</div>')
+    assert not is_single_slide('<p>앞</p><div class="slide">a</div>')
+
+
+def test_target_slides():
+    assert target_slides("3번 슬라이드 배경 바꿔줘", 5) == [3]
+    assert target_slides("2~4장 제목 크게", 5) == [2, 3, 4]
+    assert target_slides("표지랑 마지막 장", 5) == [1, 5]
+    assert target_slides("slide 9 고쳐줘", 5) == []  # 범위 밖
+    assert target_slides("전체 배경 남색으로", 5) == []
+
+
+def test_slide_texts():
+    assert slide_texts(DECK) == ["표지", "둘째 강조\n중첩", "셋째"]
+    assert slide_texts("<p>그냥 문단</p>") == ["그냥 문단"]
@@ -0,0 +1,89 @@
+"""disk_gc — mtime 을 고정해 둔 파일/디렉토리로 쿼터 초과 시 LRU 삭제 순서와 보호 규칙 확인"""
+import os
+import time
+
+from execution import disk_gc
+from execution.disk_gc import Area, DiskGC, active_job_dirs, referenced_uploads, sweep_incoming
+from execution.job_registry import JobRegistry
+
+NOW = time.time()
+HOUR = 3600
+MB = 1024 * 1024
+
+
+def _file(path, size, age):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (NOW - age, NOW - age))
+
+
+def _dir(path, size, age):
+    os.makedirs(path)
+    _file(os.path.join(path, "slide_01.png"), size, age)
+    os.utime(path, (NOW - age, NOW - age))
+
+
+def test_lru_eviction_respects_protection_and_grace(tmp_path):
+    for name, age in [("old.jpg", 5 * HOUR), ("older.jpg", 6 * HOUR), ("kept.jpg", 9 * HOUR), ("new.jpg", 60)]:
+        _file(tmp_path / name, MB, age)
+    area = Area("uploads", str(tmp_path), 2, protected_fn=lambda: {"kept.jpg"})
+
+    stats = area.collect(NOW)
+
+    assert sorted(os.listdir(tmp_path)) == ["kept.jpg", "new.jpg"]  # 보호 항목, 유예 시간 안 항목은 남김
+    assert stats == {"bytes": 2 * MB, "items": 2, "quota_bytes": 2 * MB, "protected": 1,
+                     "evicted": 2, "freed_bytes": 2 * MB}
+
+
+def test_under_quota_keeps_everything(tmp_path):
+    _file(tmp_path / "a.jpg", MB, 10 * HOUR)
+    _file(tmp_path / ".hidden", 5 * MB, 10 * HOUR)
+    stats = Area("uploads", str(tmp_path), 2).collect(NOW)
+    assert stats["evicted"] == 0 and stats["items"] == 1
+    assert sorted(os.listdir(tmp_path)) == [".hidden", "a.jpg"]
+
+
+def test_directory_area_uses_latest_file_access(tmp_path):
+    _dir(tmp_path / "job_a", MB, 10 * HOUR)
+    _dir(tmp_path / "job_b", MB, 8 * HOUR)
+    os.utime(tmp_path / "job_a" / "slide_01.png", (NOW - HOUR, NOW - HOUR))  # touch() 로 최근에 읽힘
+    evicted = []
+    area = Area("renders", str(tmp_path), 1, dirs=True, on_evict=evicted.append)
+    assert area.collect(NOW)["evicted"] == 1
+    assert evicted == ["job_b"]
+
+
+def test_active_job_dirs_protects_running_batches(tmp_path):
+    registry = JobRegistry(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "jobs"))
+    done = registry.create("render", owner="a@x")
+    registry.update(done, status="done")
+    running = registry.create("render", owner="a@x")
+    registry.update(running, status="running")
+    batch = registry.create("batch", owner="a@x")
+    registry.update(batch, status="running", result={"items": [
+        {"job_id": "render-1", "slides": []},
+        {"slides": ["render-2/slide_01.png", "render-2/slide_02.png"]},
+    ]})
+    assert active_job_dirs(registry) == {running, batch, "render-1", "render-2"}
+
+
+def test_referenced_uploads(tmp_path):
+    settings = tmp_path / "user_settings.json"
+    assert referenced_uploads(str(settings)) == set()
+    settings.write_text('{"a": {"history": [{"html": "url(/api/uploads/abc123.jpg)"}]}}', encoding="utf-8")
+    assert referenced_uploads(str(settings)) == {"abc123.jpg"}
+
+
+def test_sweep_incoming_and_run_once(tmp_path, monkeypatch):
+    incoming = tmp_path / "uploads" / ".incoming"
+    incoming.mkdir(parents=True)
+    _file(incoming / "stale.part", 10, 2 * HOUR)
+    _file(incoming / "fresh.part", 10, 60)
+    monkeypatch.setattr(disk_gc, "UPLOADS_DIR", str(tmp_path / "uploads"))
+    assert sweep_incoming(NOW) == 1
+    assert os.listdir(incoming) == ["fresh.part"]
+
+    gc = DiskGC([Area("uploads", str(tmp_path / "uploads"), 1)], stats_path=str(tmp_path / "disk_gc.json"))
+    report = gc.run_once()
+    assert report["areas"]["uploads"]["items"] == 0 and report["incoming_removed"] == 0
+    assert gc.stats()["last_run"]["ran_at"] == report["ran_at"]
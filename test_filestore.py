@@ -0,0 +1,31 @@
+"""
+공유 파일 헬퍼(filestore) 단위 테스트 — update_json 의 기본값 처리
+
+실행: python -m pytest -q test_filestore.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from execution.filestore import read_json, update_json
+
+
+def test_update_json_does_not_mutate_default(tmp_path):
+    path = str(tmp_path / "state.json")
+    default = {"history": []}
+
+    update_json(path, lambda data: data["history"].append(1), default=default)
+    update_json(str(tmp_path / "other.json"), lambda data: data["history"].append(2), default=default)
+
+    assert default == {"history": []}
+    assert read_json(path) == {"history": [1]}
+    assert read_json(str(tmp_path / "other.json")) == {"history": [2]}
+
+
+def test_update_json_replaces_with_returned_value(tmp_path):
+    path = str(tmp_path / "state.json")
+    assert update_json(path, lambda data: None) == {}
+    assert update_json(path, lambda data: {"count": data.get("count", 0) + 1}) == {"count": 1}
+    (tmp_path / "state.json").write_text("{broken", encoding="utf-8")
+    assert update_json(path, lambda data: data.update(count=5), default={}) == {"count": 5}
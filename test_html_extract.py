@@ -0,0 +1,90 @@
+"""
+LLM 응답 추출/복구(html_extract) 단위 테스트 — 잘린 JSON 복구, 잘린 덱 정리, 뒷부분 슬라이드 이어 붙이기
+
+실행: python -m pytest -q test_html_extract.py
+"""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from execution.deck import parse_deck
+from execution.html_extract import (
+    JsonScanner, append_slides, complete_slides, extract_html, extract_slides, load_json, missing_slides,
+    repair_json,
+)
+
+SLIDE = '<div class="slide"><h1>{n}번 제목</h1><p>본문 {n}</p></div>'
+DECK = "<html><head><style>.slide{{width:1080px}}</style></head><body>\n{slides}\n</body></html>"
+
+
+def make_deck(count):
+    return DECK.format(slides="\n".join(SLIDE.format(n=n) for n in range(1, count + 1)))
+
+
+def test_repair_json_closes_truncated_string():
+    assert repair_json('{"html": "<div>abc') == {"html": "<div>abc"}
+    assert repair_json('{"a": [1, 2, {"b": "x\\') == {"a": [1, 2, {"b": "x"}]}  # 잘린 이스케이프 제거
+    assert repair_json('{"a": "\\u12') == {"a": ""}  # 잘린 \u 이스케이프 제거
+
+
+def test_repair_json_drops_incomplete_member():
+    assert repair_json('{"a": 1, "b": ') == {"a": 1}
+    assert repair_json('{"a": 1, "ke') == {"a": 1}  # 잘린 키는 살리지 않음
+    assert repair_json('{"slides": ["one", "tw', partial_strings=False) == {"slides": ["one"]}
+
+
+def test_repair_json_unrecoverable():
+    assert repair_json('{"a": 1}') is None  # 잘린 곳이 없음
+    assert repair_json("plain text") is None
+
+
+def test_scanner_streaming_matches_single_feed():
+    text = '{"html": "<p class=\\"x\\">{}[]</p>", "n": [1, 2'
+    whole = JsonScanner().feed(text)
+    parts = JsonScanner()
+    for i in range(0, len(text), 3):
+        parts.feed(text[i:i + 3])
+    assert (parts.stack, parts.in_string, parts.safe) == (whole.stack, whole.in_string, whole.safe)
+    assert whole.stack == ["{", "["] and not whole.in_string
+
+
+def test_load_json_fence_and_chatter():
+    raw = 'Sure!\n```json\n{"html": "<p>x</p>"}\n```\nDone.'
+    assert load_json(raw) == ({"html": "<p>x</p>"}, False)
+    assert load_json('```json\n{"html": "<p>x') == ({"html": "<p>x"}, True)  # 닫는 펜스 없이 잘림
+
+
+def test_complete_slides_keeps_finished_slides():
+    html = make_deck(3)
+    cut = html[:html.index("본문 3")]
+    fixed = complete_slides(cut)
+    assert len(parse_deck(fixed)) == 2
+    assert fixed.rstrip().endswith("</body></html>")
+    assert complete_slides("<html><body><div class=") == ""
+
+
+def test_extract_html_truncated_response():
+    html = make_deck(3)
+    raw = json.dumps({"html": html}, ensure_ascii=False)
+    assert extract_html(raw) == html
+    truncated = raw[:raw.index("본문 3")]
+    assert len(parse_deck(extract_html(truncated))) == 2
+    assert extract_html("no json here") is None
+
+
+def test_missing_and_append_slides():
+    html = make_deck(2)
+    assert missing_slides(html, 4) == [3, 4]
+    assert missing_slides(html, 2) == []
+    assert missing_slides("<p>no slides</p>", 4) == []
+
+    raw = json.dumps({"slides": [SLIDE.format(n=3), SLIDE.format(n=4), '<div class="slide">잘린']})
+    fragments = extract_slides(raw)
+    assert len(fragments) == 2
+    merged = append_slides(html, fragments)
+    deck = parse_deck(merged)
+    assert len(deck) == 4 and "4번 제목" in deck.slide(4)
+    assert merged.endswith("</body></html>")
+    assert extract_slides('{"slides": ["<p>not a slide</p>"]}') is None
@@ -0,0 +1,72 @@
+"""cached_file_response 를 작은 앱에 올려 실제 HTTP 요청/응답 헤더로 캐시 동작 확인"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from execution.http_cache import IMMUTABLE_CACHE, REVALIDATE_CACHE, cached_file_response, content_addressed
+
+BODY = bytes(range(256)) * 4  # 1024 바이트
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "plain.png").write_bytes(BODY)
+    (tmp_path / "slide_01.png").write_bytes(BODY)
+    hashed = content_addressed(str(tmp_path / "slide_01.png"))
+
+    app = FastAPI()
+
+    @app.get("/files/{name}")
+    def serve(name: str, request: Request):
+        return cached_file_response(request, str(tmp_path / name))
+
+    client = TestClient(app)
+    client.hashed = hashed
+    return client
+
+
+def test_content_addressed_name(client, tmp_path):
+    assert client.hashed.startswith("slide_01.") and client.hashed.endswith(".png")
+    assert not (tmp_path / "slide_01.png").exists()
+    response = client.get(f"/files/{client.hashed}")
+    assert response.content == BODY
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE
+    assert response.headers["etag"] == f'"{client.hashed.split(".")[1]}"'
+
+
+def test_etag_revalidation(client):
+    first = client.get("/files/plain.png")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"') and first.headers["cache-control"] == REVALIDATE_CACHE
+    not_modified = client.get("/files/plain.png", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert client.get("/files/plain.png", headers={"If-None-Match": f'"other", {etag[2:]}'}).status_code == 304
+    assert client.get("/files/plain.png", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+])
+def test_range_requests(client, header, start, end):
+    response = client.get(f"/files/{client.hashed}", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == BODY[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_unsatisfiable_and_ignored_ranges(client):
+    unsatisfiable = client.get("/files/plain.png", headers={"Range": "bytes=2000-"})
+    assert unsatisfiable.status_code == 416 and unsatisfiable.headers["content-range"] == "bytes */1024"
+    assert client.get("/files/plain.png", headers={"Range": "bytes=0-1,5-6"}).status_code == 200  # 다중 범위는 전체 전송
+
+
+def test_if_range(client):
+    etag = client.get(f"/files/{client.hashed}").headers["etag"]
+    matching = client.get(f"/files/{client.hashed}", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert matching.status_code == 206 and matching.content == BODY[:10]
+    stale = client.get(f"/files/{client.hashed}", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200 and stale.content == BODY
@@ -0,0 +1,103 @@
+"""
+여러 worker 프로세스가 동시에 공유 상태를 쓰는 상황을 재현하는 스트레스 테스트
+
+- user_settings.json 과 같은 방식(update_json)으로 N개 프로세스가 동시에 히스토리를 추가
+  → 유실된 쓰기가 없어야 하고, 읽는 쪽은 항상 완전한 JSON 을 봐야 함
+- JobRegistry 에 동시에 작업을 생성/갱신 → 모든 작업이 고유 디렉토리와 최종 상태를 가져야 함
+
+실행: python test_multiworker.py [--workers 8] [--iterations 50]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from execution.filestore import update_json
+from execution.job_registry import JobRegistry
+
+
+def _writer(settings_path, registry_path, jobs_dir, worker_id, iterations):
+    registry = JobRegistry(registry_path, jobs_dir)
+    email = f"user{worker_id % 3}@example.com"
+
+    def add_entry(all_settings):
+        user_data = all_settings.setdefault(email, {})
+        user_data.setdefault("history", []).insert(0, {"worker": worker_id})
+        all_settings["_counter"] = all_settings.get("_counter", 0) + 1
+
+    for i in range(iterations):
+        update_json(settings_path, add_entry)
+        job_id = registry.create("render", owner=email, meta={"worker": worker_id, "i": i})
+        with open(os.path.join(registry.job_dir(job_id), "slide_01.png"), "wb") as f:
+            f.write(job_id.encode())
+        registry.update(job_id, status="done", result={"slides": [f"{job_id}/slide_01.png"]})
+
+
+def _reader(settings_path, stop_at, errors):
+    while time.time() < stop_at:
+        try:
+            with open(settings_path, "r", encoding="utf-8") as f:
+                json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            errors.value += 1
+
+
+def run_stress(workers=8, iterations=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        settings_path = os.path.join(tmp, "user_settings.json")
+        registry_path = os.path.join(tmp, "jobs.sqlite3")
+        jobs_dir = os.path.join(tmp, "jobs")
+        JobRegistry(registry_path, jobs_dir)  # 스키마 미리 생성
+
+        errors = multiprocessing.Value("i", 0)
+        started = time.time()
+        reader = multiprocessing.Process(target=_reader, args=(settings_path, started + 60, errors))
+        reader.start()
+        procs = [
+            multiprocessing.Process(target=_writer, args=(settings_path, registry_path, jobs_dir, w, iterations))
+            for w in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        reader.terminate()
+        reader.join()
+        elapsed = time.time() - started
+
+        with open(settings_path, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        history_total = sum(len(v.get("history", [])) for k, v in settings.items() if k != "_counter")
+        jobs = JobRegistry(registry_path, jobs_dir).list(kind="render", limit=workers * iterations + 10)
+
+        expected = workers * iterations
+        assert all(p.exitcode == 0 for p in procs), "writer process crashed"
+        assert settings["_counter"] == expected, f"lost updates: {settings['_counter']} != {expected}"
+        assert history_total == expected, f"lost history entries: {history_total} != {expected}"
+        assert errors.value == 0, f"reader saw {errors.value} partial writes"
+        assert len(jobs) == expected and all(j["status"] == "done" for j in jobs)
+        assert len(os.listdir(jobs_dir)) == expected, "job directories collided"
+        return elapsed
+
+
+def test_multiworker_shared_state():
+    run_stress(workers=4, iterations=20)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    elapsed = run_stress(args.workers, args.iterations)
+    total = args.workers * args.iterations
+    print(f"OK: {args.workers} processes × {args.iterations} writes = {total} updates, "
+          f"no lost writes ({elapsed:.2f}s, {total / elapsed:.0f} updates/s)")
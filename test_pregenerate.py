@@ -0,0 +1,55 @@
+"""pregenerate — 리서치/생성은 가짜 함수로 바꿔 끼우고 일일 토큰 예산 차감만 확인 (예산 파일은 tmp_path)"""
+import asyncio
+
+import pytest
+
+from execution import generation_cache, pregenerate
+from execution.pregenerate import PregenerateScheduler, tokens_used_today
+
+TOPICS = ["주제 하나", "주제 둘", "주제 셋", "주제 넷", "주제 다섯"]
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    """LLM 풀/유휴 대기 없이 바로 실행하고, 생성 호출을 기록"""
+    monkeypatch.setattr(pregenerate, "BUDGET_PATH", str(tmp_path / "pregenerate_budget.json"))
+    monkeypatch.setattr(pregenerate, "PREGENERATE_TOP_N", len(TOPICS))
+    monkeypatch.setattr(pregenerate, "PREGENERATE_DAILY_TOKENS", 50000)
+    decks = {}
+    monkeypatch.setattr(generation_cache, "get_research", lambda topic: f"{topic} 리서치")
+    monkeypatch.setattr(generation_cache, "has_deck", lambda topic, slides: topic in decks)
+    monkeypatch.setattr(generation_cache, "put_deck", lambda topic, slides, html, **kw: decks.update({topic: kw}))
+
+    sched = PregenerateScheduler(lambda: TOPICS, lambda: False, api_key="test-key")
+    sched.calls = []
+
+    async def run_now(fn, *args, **kwargs):
+        sched.calls.append(kwargs.get("text"))
+        return fn(*args, **kwargs)
+
+    sched._run_idle = run_now
+    sched.decks = decks
+    return sched
+
+
+def test_success_charges_estimated_tokens(scheduler, monkeypatch):
+    monkeypatch.setattr(pregenerate, "generate_html", lambda **kw: "<html>" + "가" * 2500 + "</html>")
+    asyncio.run(scheduler.pregenerate_topic("주제 하나"))
+
+    used = tokens_used_today()
+    assert used > 1000 and scheduler.decks["주제 하나"]["tokens"] == used
+    assert scheduler.generated == 1
+
+
+def test_failing_generation_stops_at_budget(scheduler, monkeypatch):
+    def failing(**kw):
+        raise Exception("모든 AI 서비스 호출에 실패했습니다.")
+    monkeypatch.setattr(pregenerate, "generate_html", failing)
+
+    asyncio.run(scheduler.run_once())
+    # 실패 1건당 덱 1개 예상 비용(20000) 차감 → 50000 예산에서 두 번 시도 후 중단
+    assert scheduler.calls == ["주제 하나 리서치", "주제 둘 리서치"]
+    assert tokens_used_today() == 2 * pregenerate.DEFAULT_DECK_TOKENS
+
+    asyncio.run(scheduler.run_once())  # 다음 주기에도 예산이 없으면 시도하지 않음
+    assert len(scheduler.calls) == 2 and scheduler.generated == 0
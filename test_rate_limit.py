@@ -0,0 +1,95 @@
+"""provider 호출 앞단 rate limit — 가짜 응답/예외로 429 재시도 흐름을 네트워크 없이 재현"""
+import time
+
+import pytest
+
+from execution import rate_limit
+from execution.rate_limit import (
+    ProviderLimiter, RateLimitTimeout, TokenBucket, backoff_delay, call_with_retry, estimate_tokens,
+    is_rate_limited, retry_hint,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, text=""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = text
+
+
+class FakeSdkError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def test_token_bucket_refill():
+    bucket = TokenBucket(60)  # 초당 1
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1000, now + 0.5) == pytest.approx(59.5)  # 용량보다 큰 요청은 가득 찰 때까지만
+
+
+def test_limiter_times_out_before_deadline():
+    limiter = ProviderLimiter("test", rpm=1, tpm=1000)
+    limiter.acquire(10, time.monotonic() + 1)
+    with pytest.raises(RateLimitTimeout) as error:
+        limiter.acquire(10, time.monotonic() + 1)
+    assert error.value.retry_after > 50
+
+
+def test_retry_hint_sources():
+    assert retry_hint(FakeResponse(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_hint(FakeResponse(429, {"retry-after": "7"})) == 7.0
+    assert retry_hint(FakeResponse(429, text='{"retryDelay": "12s"}')) == 12.0
+    assert retry_hint(error=FakeSdkError("429 RESOURCE_EXHAUSTED retryDelay: '3.5s'")) == 3.5
+    assert retry_hint(FakeResponse(429)) is None
+
+
+def test_is_rate_limited():
+    assert is_rate_limited(FakeResponse(429))
+    assert not is_rate_limited(FakeResponse(500))
+    assert is_rate_limited(error=FakeSdkError("quota", code=429))
+    assert is_rate_limited(error=FakeSdkError("RESOURCE_EXHAUSTED: quota"))
+    assert not is_rate_limited(error=FakeSdkError("bad request", code=400))
+
+
+def test_backoff_delay_bounds():
+    assert 5.0 <= backoff_delay(0, hint=5.0) <= 6.0
+    for attempt in range(10):
+        delay = backoff_delay(attempt)
+        assert 0 < delay <= rate_limit.PROVIDER_RETRY_MAX_DELAY
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("가" * 25, None, "a" * 25) == 20
+
+
+def test_call_with_retry_retries_429(monkeypatch):
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, hint=None: 0.0)
+    monkeypatch.setitem(rate_limit.PROVIDER_LIMITS, "fast", (6000, 1000000))  # 429 뒤 버킷이 비어도 0.01초 대기
+    responses = [FakeResponse(429), FakeResponse(429), FakeResponse(200)]
+    result = call_with_retry("fast", "key-retry", lambda: responses.pop(0))
+    assert result.status_code == 200 and not responses
+
+
+def test_call_with_retry_gives_up_at_deadline(monkeypatch):
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, hint=None: 10.0)
+    deadline = time.monotonic() + 1
+    assert call_with_retry("test", "key-rest", lambda: FakeResponse(429), deadline=deadline).status_code == 429
+
+    def sdk_call():
+        raise FakeSdkError("RESOURCE_EXHAUSTED")
+    with pytest.raises(FakeSdkError):
+        call_with_retry("test", "key-sdk", sdk_call, deadline=deadline)
+
+
+def test_call_with_retry_passes_other_errors():
+    def failing():
+        raise ValueError("boom")
+    with pytest.raises(ValueError):
+        call_with_retry("test", "key-error", failing)
+    assert call_with_retry("test", "key-error", lambda: FakeResponse(500)).status_code == 500
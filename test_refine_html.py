@@ -0,0 +1,59 @@
+"""refine_slides — 대상 슬라이드만 LLM 에 보내고, 돌아온 조각만 제자리에 끼워 넣는지 (LLM 호출은 _ask 를 바꿔 끼움)"""
+import json
+
+import pytest
+
+from execution import refine_html
+from execution.refine_html import refine_slides
+
+DECK = """<html><head><style>.slide { width: 1080px; }</style></head><body>
+<div class="slide"><h1>하나</h1></div>
+<div class="slide"><h1>둘</h1></div>
+<div class="slide"><h1>셋</h1></div>
+</body></html>"""
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """_ask 대신 정해 둔 응답을 돌려주고, 받은 프롬프트를 기록"""
+    calls = []
+
+    def respond(answer):
+        def fake_ask(prompt, api_key, num_predict=None):
+            calls.append(prompt)
+            return json.loads(json.dumps(answer))
+        monkeypatch.setattr(refine_html, "_ask", fake_ask)
+        return calls
+    return respond
+
+
+def test_only_target_slide_is_sent_and_replaced(llm):
+    calls = llm({"slides": [{"slide": 2, "html": '<div class="slide"><h1>둘 (수정)</h1></div>'}], "css": ""})
+    result = refine_slides(DECK, "2번 슬라이드 제목을 더 짧게 요약해줘")
+
+    assert result["mode"] == "slides" and result["changed"] == [2]
+    assert "<h1>둘</h1>" in calls[0] and "<h1>하나</h1>" not in calls[0] and "<h1>셋</h1>" not in calls[0]
+    assert result["html"] == DECK.replace("<h1>둘</h1>", "<h1>둘 (수정)</h1>")
+
+
+def test_invalid_fragments_and_unsent_slides_are_ignored(llm):
+    llm({"slides": [
+        {"slide": 1, "html": '<div class="slide">a</div><div class="slide">b</div>'},  # 2장짜리 조각
+        {"slide": 3, "html": '<div class="slide"><h1>셋?</h1></div>'},  # 보내지 않은 슬라이드
+    ], "css": ".slide h1 { letter-spacing: -1px; }"})
+    result = refine_slides(DECK, "1번 슬라이드 문구 다듬어줘")
+
+    assert result["changed"] == []
+    assert result["html"] == DECK.replace("</style>", "\n.slide h1 { letter-spacing: -1px; }\n</style>")
+
+
+def test_no_changes_raises(llm):
+    llm({"slides": [{"slide": 1, "html": '<div class="slide"><h1>하나</h1></div>'}], "css": ""})
+    with pytest.raises(Exception, match="no changes"):
+        refine_slides(DECK, "1번 슬라이드 문구 다듬어줘")
+
+
+def test_style_requests_skip_the_llm(llm):
+    calls = llm({})
+    result = refine_slides(DECK, "배경 남색으로")
+    assert result["mode"] == "rules" and not calls
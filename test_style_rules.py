@@ -0,0 +1,103 @@
+"""
+규칙 엔진(style_rules) 단위 테스트 — 고정된 요청/덱으로 해석 결과와 적용 결과 확인
+
+실행: python -m pytest -q test_style_rules.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from execution.deck import parse_deck
+from execution.style_rules import apply_style_request, parse_request
+
+DECK = """<html><head><style>
+.title { font-size: 80px; color: #111111; }
+.text { font-size: 30px; color: #333; }
+</style></head><body>
+<div class="slide" style="background: #ffffff; padding: 100px; display: flex; flex-direction: column;">
+<h1 style="font-size: 80px; color: #ff0055;">제목 하나</h1>
+<p style="font-size: 30px; color: #333;">본문 하나 <b style="color: #ff0055;">강조</b></p>
+</div>
+<div class="slide" style="background: #ffffff; padding: 100px;">
+<h1 style="font-size: 72px;">제목 둘</h1>
+<p style="font-size: 28px;">본문 둘</p>
+</div>
+</body></html>"""
+
+
+def test_hex_color_before_hangul():
+    assert parse_request("배경을 #ff0000으로") == [("background", "#ff0000")]
+    assert parse_request("제목 색 #0af로 바꿔줘") == [("title_color", "#0af")]
+
+
+def test_hex_color_rejects_longer_hex():
+    # 7자리 이상은 6자리 앞부분만 잘라 쓰지 않음 → 색 이름도 없으니 해석 실패
+    assert parse_request("배경을 #ff00001로") is None
+
+
+def test_title_text_edits_with_color_words_go_to_llm():
+    assert parse_request("제목을 블랙프라이데이 세일로 바꿔줘") is None
+    assert parse_request("3번 슬라이드 제목을 레드와인 추천으로") is None
+    assert parse_request('제목을 "화이트데이 선물"로 바꿔줘') is None
+    assert parse_request("제목을 빨강으로 바꿔줘") is None  # 제목은 "색" 을 말해야 색 변경
+    assert parse_request("제목 색을 빨강으로") == [("title_color", "#e11d48")]
+
+
+def test_color_word_must_be_whole_object():
+    assert parse_request("배경을 남색으로") == [("background", "#1e3a8a")]
+    assert parse_request("배경을 레드와인 느낌으로") is None
+    assert parse_request('배경을 "남색"으로') is None
+
+
+def test_parse_request_clauses():
+    assert parse_request("배경은 남색으로, 제목 더 크게") == [("background", "#1e3a8a"), ("title_size", ("scale", 1.2))]
+    assert parse_request("가운데 정렬 그리고 여백 좁게") == [("align", "center"), ("padding", 0.85)]
+    assert parse_request("폰트 나눔명조로")[0][0] == "font"
+
+
+def test_parse_request_falls_back_to_llm():
+    assert parse_request("제목 문구를 더 재밌게 바꿔줘") is None  # 내용 수정
+    assert parse_request("배경 남색으로, 분위기 더 세련되게") is None  # 해석 못 하는 절이 있음
+
+
+def test_background_only_on_target_slide():
+    result = apply_style_request(DECK, "2번 슬라이드 배경 #000으로")
+    assert result["changed"] == [2]
+    deck = parse_deck(result["html"])
+    assert "background: #000" in deck.slide(2)
+    assert deck.slide(1) == parse_deck(DECK).slide(1)
+    assert deck.style == parse_deck(DECK).style  # 특정 슬라이드 요청은 공유 스타일을 건드리지 않음
+
+
+def test_title_size_scales_titles_only():
+    result = apply_style_request(DECK, "제목 100px로")
+    deck = parse_deck(result["html"])
+    assert 'font-size: 100px; color: #ff0055;">제목 하나' in deck.slide(1)
+    assert 'font-size: 100px;">제목 둘' in deck.slide(2)  # 슬라이드마다 가장 큰 제목이 기준
+    assert 'font-size: 30px; color: #333;">본문 하나' in deck.slide(1)
+    assert ".title { font-size: 100px;" in deck.style
+
+
+def test_accent_replaces_most_used_saturated_color():
+    result = apply_style_request(DECK, "포인트 컬러 초록으로")
+    assert "#ff0055" not in result["html"]
+    assert result["html"].count("#16a34a") == 2
+    assert "#111111" in result["html"] and "#333" in result["html"]
+
+
+def test_font_adds_stylesheet_link():
+    result = apply_style_request(DECK, "폰트 나눔고딕으로")
+    head = result["html"][:result["html"].find("</head>")]
+    assert "Nanum+Gothic" in head
+    assert "font-family: 'Nanum Gothic', sans-serif" in parse_deck(result["html"]).slide(1)
+
+
+def test_align_sets_flex_alignment():
+    deck = parse_deck(apply_style_request(DECK, "가운데 정렬")["html"])
+    assert "text-align: center" in deck.slide(1) and "align-items: center" in deck.slide(1)
+    assert "align-items" not in deck.slide(2)  # flex column 이 아닌 슬라이드
+
+
+def test_deck_without_slides_returns_none():
+    assert apply_style_request("<html><body><p>슬라이드 없음</p></body></html>", "배경 남색으로") is None
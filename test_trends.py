@@ -1,34 +1,137 @@
-import sys
-from pytrends.request import TrendReq
-
-try:
-    print("Testing Google Trends API...")
-    pytrend = TrendReq(hl='ko-KR', tz=540)
-    
-    # 1. '부동산', '비트코인' 검색량 트렌드 조회
-    # (주의: 너무 빈번하게 요청하면 429 Too Many Requests 에러 발생 가능)
-    kw_list = ['부동산', "비트코인"]
-    
-    # 최근 3개월 데이터
-    pytrend.build_payload(kw_list, cat=0, timeframe='today 3-m', geo='KR')
-    data = pytrend.interest_over_time()
-    
-    if not data.empty:
-        # 마지막 주 데이터와 12주 전(첫 주) 데이터 비교
-        first_row = data.iloc[0]
-        last_row = data.iloc[-1]
-        
-        print("\n--- Google Trends Change (%) ---")
-        for kw in kw_list:
-            start_val = first_row[kw]
-            end_val = last_row[kw]
-            if start_val > 0:
-                change = ((end_val - start_val) / start_val) * 100
-            else:
-                change = 0 if end_val == 0 else float('inf')
-                
-            print(f"[{kw}] {start_val} -> {end_val} ({change:+.1f}%)")
-            
-    print("\nAPI is working!")
-except Exception as e:
-    print(f"Error: {e}")
+"""
+트렌드 관심도 분석(trend_interest) 테스트 — pytrends 호출은 가짜 그룹 결과로 바꿔 끼워 네트워크 없이 실행
+
+- 지표 계산(compute_metrics), anchor 정규화, 5개 단위 그룹 분할
+- analyze_keywords 의 공유 캐시(TTL), 데이터 없는 키워드(no_data) 처리, 429 재시도 큐
+"""
+import pandas as pd
+import pytest
+
+from execution import trend_interest
+from execution.trend_interest import (
+    RateLimitedQueue, analyze_keywords, compute_metrics, make_groups, normalize_to_anchor,
+)
+
+# 키워드별 고정 관심도 (anchor 는 모든 그룹에서 평균 50)
+SERIES = {
+    "anchor": [50] * 8,
+    "rising": [10, 10, 20, 20, 30, 30, 40, 40],
+    "falling": [40, 40, 30, 30, 20, 20, 10, 10],
+    "flat": [25] * 8,
+}
+
+
+@pytest.fixture
+def trends(tmp_path, monkeypatch):
+    """fetch_group 을 고정 데이터로 바꾸고 요청된 그룹을 기록. 캐시는 tmp_path 에"""
+    requested = []
+
+    def fake_fetch_group(group, timeframe, geo):
+        requested.append(list(group))
+        known = [k for k in group if k in SERIES]
+        if known == ["anchor"]:
+            return None  # 데이터가 없는 키워드만 있는 그룹
+        return pd.DataFrame({k: SERIES[k] for k in known})
+
+    monkeypatch.setattr(trend_interest, "fetch_group", fake_fetch_group)
+    monkeypatch.setattr(trend_interest, "INTEREST_CACHE_PATH", str(tmp_path / "trend_interest.json"))
+    return requested
+
+
+def test_compute_metrics_fixed_series():
+    df = pd.DataFrame({
+        "flat": [10] * 8,
+        "rising": [1, 2, 3, 4, 5, 6, 7, 8],
+        "spike": [10] * 7 + [40],
+        "zero": [0] * 8,
+    })
+    metrics = compute_metrics(df)  # window = 8 // 4 = 2
+
+    assert metrics["flat"] == {"level": 10.0, "change_pct": 0.0, "slope_pct": 0.0, "spike": 0.0, "score": 0.0}
+
+    rising = metrics["rising"]
+    assert rising["level"] == 4.5
+    assert rising["change_pct"] == pytest.approx((7.5 - 5.5) / 5.5 * 100, abs=0.01)
+    assert rising["slope_pct"] == pytest.approx(1.0 * 8 / 4.5 * 100, abs=0.01)  # 기울기 1/주기
+    assert rising["spike"] == pytest.approx((8 - 3.5) / pd.Series(range(1, 7)).std(ddof=0), abs=0.01)
+
+    spike = metrics["spike"]
+    assert spike["change_pct"] == 150.0
+    assert spike["spike"] == 30.0  # 과거 구간 std 0 → 하한 1
+    assert spike["score"] > rising["score"] > metrics["flat"]["score"]
+
+    assert metrics["zero"] == {"level": 0.0, "change_pct": 0.0, "slope_pct": 0.0, "spike": 0.0, "score": 0.0}
+
+
+def test_compute_metrics_short_series():
+    metrics = compute_metrics(pd.DataFrame({"a": [5, 0]}), window=2)
+    assert metrics["a"]["change_pct"] == 0.0  # 비교할 이전 구간이 없음
+    assert compute_metrics(pd.DataFrame({"a": [0, 0, 3]}), window=1)["a"]["change_pct"] == 100.0
+
+
+def test_normalize_to_anchor():
+    first = pd.DataFrame({"anchor": [50, 50], "a": [25, 75]})
+    second = pd.DataFrame({"anchor": [20, 20], "b": [10, 30]})
+    combined = normalize_to_anchor([first, second], "anchor")
+    assert list(combined.columns) == ["anchor", "a", "b"]
+    assert combined["a"].tolist() == [50.0, 150.0]
+    assert combined["b"].tolist() == [50.0, 150.0]
+    zero = normalize_to_anchor([pd.DataFrame({"anchor": [0, 0], "c": [1, 2]})], "anchor")
+    assert zero["c"].tolist() == [1.0, 2.0]
+
+
+def test_make_groups():
+    keywords = ["anchor", "a", "b", "c", "d", "e"]
+    assert make_groups(keywords, "anchor") == [["anchor", "a", "b", "c", "d"], ["anchor", "e"]]
+    assert make_groups(["anchor"], "anchor") == [["anchor"]]
+
+
+def test_analyze_keywords_ranks_and_caches(trends):
+    report = analyze_keywords(["anchor", "rising", "falling", "flat"])
+    assert [r["keyword"] for r in report["results"]][:1] == ["rising"]
+    assert report["results"][-1]["keyword"] == "falling"
+    assert all(not r["cached"] for r in report["results"]) and report["no_data"] == []
+    assert trends == [["anchor", "rising", "falling", "flat"]]
+
+    again = analyze_keywords(["anchor", "rising", "falling", "flat"])
+    assert all(r["cached"] for r in again["results"])
+    assert len(trends) == 1  # 캐시 적중 → pytrends 호출 없음
+    assert [r["score"] for r in again["results"]] == [r["score"] for r in report["results"]]
+
+
+def test_analyze_keywords_fetches_only_missing_and_expired(trends, monkeypatch):
+    analyze_keywords(["anchor", "rising"])
+    analyze_keywords(["anchor", "rising", "flat"])
+    assert trends[-1] == ["anchor", "flat"]  # 캐시에 없는 키워드만 (anchor 와 함께) 요청
+
+    monkeypatch.setattr(trend_interest, "INTEREST_CACHE_TTL", 0)
+    analyze_keywords(["anchor", "rising"])
+    assert trends[-1] == ["anchor", "rising"]
+
+
+def test_analyze_keywords_reports_keywords_without_data(trends):
+    report = analyze_keywords(["anchor", "unknown", " ", "unknown"])
+    assert report["results"] == [] and report["no_data"] == ["anchor", "unknown"]
+    assert analyze_keywords([" "])["results"] == []
+
+
+def test_rate_limited_queue_retries_429_only():
+    queue = RateLimitedQueue(min_interval=0, max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Exception("The request failed: Google returned a response with code 429")
+        return "ok"
+
+    assert queue.call(flaky) == "ok" and len(attempts) == 3
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad payload")
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        queue.call(broken)
+    assert len(attempts) == 1